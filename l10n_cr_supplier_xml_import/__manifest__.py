@@ -3,13 +3,19 @@
     "version": "19.0.1.0.0",
     "summary": "Import supplier XML invoices and credit notes into vendor bills",
     "author": "FenixCR Solutions",
-    "depends": ["account", "mail"],
+    "depends": ["account", "mail", "product"],
     "data": [
         "security/ir.model.access.csv",
+        "security/supplier_xml_security.xml",
+        "data/ir_cron.xml",
         "wizard/supplier_xml_import_wizard_views.xml",
+        "views/supplier_xml_account_rule_views.xml",
+        "views/supplier_xml_tax_summary_views.xml",
         "views/account_move_views.xml",
         "views/res_config_settings_views.xml",
         "views/supplier_xml_gateway_views.xml",
+        "views/supplier_xml_import_log_views.xml",
+        "views/supplier_xml_menus.xml",
     ],
     "license": "LGPL-3",
     "images": ["static/description/xml_import_banner.svg"],
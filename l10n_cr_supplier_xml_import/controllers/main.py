@@ -0,0 +1,25 @@
+import hmac
+
+from odoo import http
+from odoo.http import request
+
+
+class SupplierXMLMetricsController(http.Controller):
+    @http.route(
+        "/supplier_xml_import/metrics",
+        type="http",
+        auth="public",
+        methods=["GET"],
+        csrf=False,
+        save_session=False,
+    )
+    def supplier_xml_metrics(self, token=None, **kwargs):
+        expected_token = request.env["ir.config_parameter"].sudo().get_param(
+            "l10n_cr_supplier_xml_import.metrics_token"
+        )
+        authorization = request.httprequest.headers.get("Authorization", "")
+        provided_token = token or (authorization[7:] if authorization.startswith("Bearer ") else "")
+        if not expected_token or not hmac.compare_digest(provided_token.encode(), expected_token.encode()):
+            return request.not_found()
+        body = request.env["supplier.xml.metric"].sudo()._render_metrics()
+        return request.make_response(body, headers=[("Content-Type", "text/plain; version=0.0.4; charset=utf-8")])
@@ -1,3 +1,11 @@
 from . import account_move
+from . import ir_attachment
+from . import mail_thread
+from . import product
+from . import res_company
 from . import res_config_settings
+from . import supplier_xml_account_rule
 from . import supplier_xml_gateway
+from . import supplier_xml_import_log
+from . import supplier_xml_metric
+from . import supplier_xml_tax_summary
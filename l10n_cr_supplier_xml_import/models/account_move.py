@@ -1,13 +1,50 @@
 import base64
 import binascii
+import bisect
 import io
+import os
+import re
+import time
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
 from email import policy
 from email.parser import BytesParser
 from lxml import etree
 
 from odoo import _, api, fields, models
 from odoo.exceptions import UserError
+from odoo.tools import float_compare, ormcache, str2bool
+
+from ..tools import safe_xml, xades, xsd
+from ..tools.lru import LRUCache
+
+HACIENDA_CA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "hacienda_ca")
+PRODUCT_CABYS_FIELDS = ("cabys_code", "l10n_cr_cabys_code", "fp_cabys_code", "code_cabys")
+PRODUCT_MATCH_CACHE = LRUCache(20000)
+CENT = Decimal("0.01")
+XML_EXTRACTION_MAX_WORKERS = 4
+CLAVE_HEAD_SCAN_BYTES = 8192
+CLAVE_XML_PATTERN = re.compile(rb"<(?:[\w.-]+:)?Clave>\s*(\d{50})\s*</")
+CLAVE_FILENAME_PATTERN = re.compile(r"(?<!\d)(\d{50})(?!\d)")
+SUPPORTED_XML_ROOTS = {"FacturaElectronica", "NotaCreditoElectronica"}
+
+
+class SupplierXMLRejected(UserError):
+    """The supplier XML was rejected while reading it; ``reason`` labels the rejection metric."""
+
+    reason = "invalid"
+
+    def __init__(self, message, reason=None):
+        super().__init__(message)
+        if reason:
+            self.reason = reason
+
+
+class SupplierXMLLimitError(SupplierXMLRejected):
+    """The supplier XML exceeds the configured size, depth or line limits."""
+
+    reason = "limit_exceeded"
 
 
 class AccountMove(models.Model):
@@ -17,6 +54,41 @@ class AccountMove(models.Model):
     supplier_xml_key = fields.Char(readonly=True, copy=False)
     supplier_xml_gateway_id = fields.Many2one("supplier.xml.gateway", readonly=True, copy=False)
     supplier_xml_message_id = fields.Char(readonly=True, copy=False, index=True)
+    supplier_xml_signature_state = fields.Selection(
+        [
+            ("unsigned", "Sin firma"),
+            ("valid", "Válida"),
+            ("untrusted", "No confiable"),
+            ("invalid", "Inválida"),
+        ],
+        string="Firma del XML",
+        readonly=True,
+        copy=False,
+    )
+    supplier_xml_signature_message = fields.Char(string="Detalle de la firma", readonly=True, copy=False)
+    supplier_xml_signer = fields.Char(string="Firmante del XML", readonly=True, copy=False)
+    supplier_xml_totals_state = fields.Selection(
+        [("matched", "Cuadra"), ("mismatch", "No cuadra")],
+        string="Totales del XML",
+        readonly=True,
+        copy=False,
+    )
+    supplier_xml_totals_message = fields.Text(string="Diferencias de totales", readonly=True, copy=False)
+    supplier_xml_taxes_mapped = fields.Boolean(string="Impuestos mapeados", readonly=True, copy=False)
+    supplier_xml_amount_total = fields.Monetary(string="Total según XML", readonly=True, copy=False)
+    supplier_xml_duplicate_of_id = fields.Many2one(
+        "account.move",
+        string="Posible duplicado de",
+        readonly=True,
+        copy=False,
+        help="Documento existente con el mismo proveedor, referencia, fecha y total.",
+    )
+    supplier_xml_auto_post_pending = fields.Boolean(
+        string="Publicación automática pendiente", readonly=True, copy=False, index=True
+    )
+    supplier_xml_tax_summary_ids = fields.One2many(
+        "supplier.xml.tax.summary", "move_id", string="Resumen de IVA del XML", readonly=True, copy=False
+    )
 
     def init(self):
         """Backward-compatible safety for databases where module wasn't upgraded yet."""
@@ -32,6 +104,13 @@ class AccountMove(models.Model):
             ADD COLUMN IF NOT EXISTS supplier_xml_message_id varchar
             """
         )
+        self.env.cr.execute(
+            """
+            CREATE INDEX IF NOT EXISTS account_move_supplier_xml_fallback_duplicate_idx
+            ON account_move (partner_id, ref, invoice_date, amount_total)
+            WHERE move_type IN ('in_invoice', 'in_refund')
+            """
+        )
 
     @api.model
     def create_from_supplier_xml(
@@ -43,18 +122,279 @@ class AccountMove(models.Model):
         supplier_xml_gateway_id=None,
     ):
         """Create a vendor bill or vendor credit note from Costa Rica supplier XML."""
-        vals = self._parse_supplier_xml(xml_content, journal_id=journal_id, company_id=company_id)
-        existing_move = self._find_existing_supplier_move_by_key(
-            supplier_xml_key=vals.get("supplier_xml_key"),
-            company_id=vals.get("company_id"),
+        result = self._create_from_supplier_xml_documents(
+            [(filename, xml_content)],
+            journal_id=journal_id,
+            company_id=company_id,
+            supplier_xml_gateway_id=supplier_xml_gateway_id,
+        )[0]
+        if result["error"]:
+            raise result["error"]
+        return result["move"]
+
+    @api.model
+    def _create_from_supplier_xml_documents(
+        self,
+        documents,
+        journal_id=None,
+        company_id=None,
+        supplier_xml_gateway_id=None,
+        route_by_receiver=False,
+        defer_name=False,
+    ):
+        """Import a list of ``(filename, xml_content)`` documents in one pass.
+
+        Documents are parsed one by one, checked against existing keys with a single query and created
+        in one batch; if the batch fails, each document is created in its own savepoint so a bad document
+        does not block the others. With ``route_by_receiver`` each document goes to the company (and gateway
+        and journal) of its receiver. With ``defer_name`` drafts are created as ``/`` so the journal sequence
+        is only taken, in posting order, when they are posted.
+
+        Returns one dict per document, in order, with ``filename``, ``move``, ``outcome`` (``imported``,
+        ``duplicate``, ``rejected`` or ``limit_exceeded``), ``reason``, ``error`` and ``rejection``, the
+        metric reason of a rejected document. Rejections are not counted here: the mail gateway counts
+        them, so re-reading XML from a bill does not.
+        """
+        metric_model = self.env["supplier.xml.metric"]
+        gateway_label = supplier_xml_gateway_id or "manual"
+        results = []
+        parsed = []
+        fast_keys = [self._supplier_xml_fast_key(filename, xml_content) for filename, xml_content in documents]
+        known_moves = {}
+        if any(fast_keys):
+            existing_moves = self._find_existing_supplier_moves_by_keys(
+                set(filter(None, fast_keys)),
+                None if route_by_receiver else [company_id or self.env.company.id],
+            )
+            for (key, _company_id), move in existing_moves.items():
+                known_moves.setdefault(key, move)
+        for (filename, xml_content), fast_key in zip(documents, fast_keys):
+            result = {
+                "filename": filename,
+                "move": self.env["account.move"],
+                "outcome": "rejected",
+                "reason": False,
+                "error": False,
+                "rejection": False,
+            }
+            results.append(result)
+            if fast_key in known_moves:
+                result.update(
+                    outcome="duplicate",
+                    move=known_moves[fast_key],
+                    reason=_("Documento ya importado previamente (clave %s).") % fast_key,
+                )
+                metric_model._inc("supplier_xml_documents_duplicate_total", gateway=gateway_label)
+                continue
+            started_at = time.perf_counter()
+            try:
+                vals = self._parse_supplier_xml(
+                    xml_content,
+                    journal_id=journal_id,
+                    company_id=company_id,
+                    route_by_receiver=route_by_receiver,
+                )
+            except UserError as error:
+                result.update(reason=str(error), error=error, rejection=getattr(error, "reason", "invalid"))
+                if isinstance(error, SupplierXMLLimitError):
+                    result["outcome"] = "limit_exceeded"
+                continue
+            metric_model._observe(
+                "supplier_xml_parse_seconds", time.perf_counter() - started_at, gateway=gateway_label
+            )
+            if filename:
+                vals["supplier_xml_filename"] = filename
+            if supplier_xml_gateway_id:
+                vals.setdefault("supplier_xml_gateway_id", supplier_xml_gateway_id)
+            if defer_name:
+                vals["name"] = "/"
+            parsed.append((result, vals))
+
+        existing_moves = self._find_existing_supplier_moves_by_keys(
+            {vals["supplier_xml_key"] for _result, vals in parsed if vals.get("supplier_xml_key")},
+            {vals["company_id"] for _result, vals in parsed},
+        )
+        to_create = []
+        repeated = []
+        seen = {}
+        for result, vals in parsed:
+            key = (vals.get("supplier_xml_key"), vals["company_id"])
+            if key[0] and key in existing_moves:
+                result.update(outcome="duplicate", move=existing_moves[key])
+                result["reason"] = _("Documento ya importado previamente (clave %s).") % key[0]
+                metric_model._inc("supplier_xml_documents_duplicate_total", gateway=gateway_label)
+            elif key[0] and key in seen:
+                result.update(
+                    outcome="duplicate",
+                    reason=_("Documento repetido en el mismo correo (clave %s).") % key[0],
+                )
+                repeated.append((result, seen[key]))
+                metric_model._inc("supplier_xml_documents_duplicate_total", gateway=gateway_label)
+            else:
+                seen[key] = result
+                to_create.append((result, vals))
+
+        fallback_policy = (
+            self.env["ir.config_parameter"].sudo().get_param("l10n_cr_supplier_xml_import.fallback_duplicate_policy")
+            or "flag"
+        )
+        if fallback_policy != "off" and to_create:
+            possible_duplicates = self._find_possible_duplicate_supplier_moves([vals for _result, vals in to_create])
+            if fallback_policy == "skip":
+                for index, (result, vals) in enumerate(to_create):
+                    if index in possible_duplicates:
+                        result.update(
+                            outcome="duplicate",
+                            move=possible_duplicates[index],
+                            reason=_(
+                                "Documento omitido: coincide con %(move)s en proveedor, referencia, fecha y total.",
+                                move=possible_duplicates[index].display_name,
+                            ),
+                        )
+                        metric_model._inc("supplier_xml_documents_duplicate_total", gateway=gateway_label)
+                to_create = [item for index, item in enumerate(to_create) if index not in possible_duplicates]
+            else:
+                for index, duplicate_move in possible_duplicates.items():
+                    to_create[index][1]["supplier_xml_duplicate_of_id"] = duplicate_move.id
+
+        self._apply_supplier_xml_batch_currency_rates([vals for _result, vals in to_create])
+        self._apply_supplier_xml_tax_summary_rates([vals for _result, vals in to_create])
+        self._create_supplier_xml_moves(to_create, gateway_label)
+        for result, first_result in repeated:
+            result["move"] = first_result["move"]
+        return results
+
+    @api.model
+    def _create_supplier_xml_moves(self, to_create, gateway_label):
+        """Create the moves of ``[(result, vals)]`` in batch, falling back to one savepoint per document."""
+        metric_model = self.env["supplier.xml.metric"]
+        batches = {}
+        for result, vals in to_create:
+            batches.setdefault((vals["company_id"], vals["move_type"]), []).append((result, vals))
+
+        for (company_id, move_type), items in batches.items():
+            move_model = self.with_company(company_id).with_context(default_move_type=move_type)
+            started_at = time.perf_counter()
+            try:
+                with self.env.cr.savepoint():
+                    moves = move_model.create([self._supplier_xml_move_create_vals(vals) for _result, vals in items])
+                    self._create_supplier_xml_tax_summaries(moves, [vals for _result, vals in items])
+            except UserError:
+                moves = None
+            if moves is not None:
+                elapsed = (time.perf_counter() - started_at) / len(items)
+                for (result, _vals), move in zip(items, moves):
+                    result.update(outcome="imported", move=move)
+                    metric_model._observe("supplier_xml_create_seconds", elapsed, gateway=gateway_label)
+                    metric_model._inc("supplier_xml_documents_imported_total", gateway=gateway_label)
+                continue
+
+            for result, vals in items:
+                started_at = time.perf_counter()
+                try:
+                    with self.env.cr.savepoint():
+                        move = move_model.create(self._supplier_xml_move_create_vals(vals))
+                        self._create_supplier_xml_tax_summaries(move, [vals])
+                except UserError as error:
+                    result.update(reason=str(error), error=error, rejection="create_error")
+                    continue
+                result.update(outcome="imported", move=move)
+                metric_model._observe(
+                    "supplier_xml_create_seconds", time.perf_counter() - started_at, gateway=gateway_label
+                )
+                metric_model._inc("supplier_xml_documents_imported_total", gateway=gateway_label)
+
+    @api.model
+    def _supplier_xml_move_create_vals(self, vals):
+        return {key: value for key, value in vals.items() if key != "supplier_xml_tax_summary_ids"}
+
+    @api.model
+    def _create_supplier_xml_tax_summaries(self, moves, vals_list, replace=False):
+        """Store the IVA summary rows of ``moves`` from their parsed values.
+
+        The rows are derived fiscal data that users can only read, so they are written as superuser.
+        """
+        summary_model = self.env["supplier.xml.tax.summary"].sudo()
+        if replace:
+            summary_model.search([("move_id", "in", moves.ids)]).unlink()
+        summary_model.create(
+            [
+                {**summary_vals, "move_id": move.id}
+                for move, vals in zip(moves, vals_list)
+                for _command, _id, summary_vals in vals.get("supplier_xml_tax_summary_ids", [])
+            ]
+        )
+
+    @api.model
+    def _find_possible_duplicate_supplier_moves(self, vals_list):
+        """Match ``vals_list`` against existing vendor documents on partner, reference, date and total.
+
+        Used for documents without a usable ``Clave`` or captured by hand before the XML arrived. Runs a
+        single query over the composite index and returns ``{index in vals_list: move}``.
+        """
+        candidates = {}
+        for index, vals in enumerate(vals_list):
+            if vals.get("partner_id") and vals.get("ref") and vals.get("invoice_date"):
+                key = (vals["company_id"], vals["partner_id"], vals["ref"], vals["invoice_date"])
+                candidates.setdefault(key, []).append(index)
+        if not candidates:
+            return {}
+
+        self.flush_model(["company_id", "partner_id", "ref", "invoice_date", "amount_total", "move_type", "state"])
+        self.env.cr.execute(
+            """
+            SELECT id, company_id, partner_id, ref, invoice_date, amount_total
+              FROM account_move
+             WHERE (company_id, partner_id, ref, invoice_date) IN %s
+               AND move_type IN ('in_invoice', 'in_refund')
+               AND state != 'cancel'
+          ORDER BY id
+            """,
+            [tuple(candidates)],
         )
-        if existing_move:
-            return existing_move
-        if filename:
-            vals["supplier_xml_filename"] = filename
-        if supplier_xml_gateway_id:
-            vals["supplier_xml_gateway_id"] = supplier_xml_gateway_id
-        return self.with_context(default_move_type=vals["move_type"]).create(vals)
+        possible_duplicates = {}
+        for move_id, company_id, partner_id, ref, invoice_date, amount_total in self.env.cr.fetchall():
+            for index in candidates.get((company_id, partner_id, ref, invoice_date), []):
+                xml_total = vals_list[index].get("supplier_xml_amount_total")
+                if index in possible_duplicates or (
+                    xml_total and float_compare(amount_total, xml_total, precision_digits=2)
+                ):
+                    continue
+                possible_duplicates[index] = self.browse(move_id)
+        return possible_duplicates
+
+    @api.model
+    def _supplier_xml_fast_key(self, filename, xml_content):
+        """Return the 50-digit ``Clave`` found in the head of the payload or in the file name, without parsing.
+
+        Only used to skip documents already imported; unknown keys are confirmed by the full parse.
+        """
+        head = xml_content[:CLAVE_HEAD_SCAN_BYTES] if isinstance(xml_content, bytes) else b""
+        match = CLAVE_XML_PATTERN.search(head)
+        if match:
+            return match.group(1).decode()
+        match = CLAVE_FILENAME_PATTERN.search(filename or "")
+        return match.group(1) if match else False
+
+    @api.model
+    def _find_existing_supplier_moves_by_keys(self, supplier_xml_keys, company_ids=None):
+        """Return ``{(supplier_xml_key, company_id): move}`` for the keys already imported.
+
+        ``company_ids`` of ``None`` searches every company.
+        """
+        if not supplier_xml_keys:
+            return {}
+        domain = [
+            ("supplier_xml_key", "in", list(supplier_xml_keys)),
+            ("move_type", "in", ["in_invoice", "in_refund"]),
+        ]
+        if company_ids is not None:
+            domain.append(("company_id", "in", list(company_ids)))
+        moves = self.search(domain, order="id")
+        existing_moves = {}
+        for move in moves:
+            existing_moves.setdefault((move.supplier_xml_key, move.company_id.id), move)
+        return existing_moves
 
     @api.model
     def _find_existing_supplier_move_by_key(self, supplier_xml_key, company_id=None):
@@ -69,16 +409,29 @@ class AccountMove(models.Model):
         return self.search(domain, limit=1)
 
     @api.model
-    def _parse_supplier_xml(self, xml_content, journal_id=None, company_id=None):
+    def _parse_supplier_xml(self, xml_content, journal_id=None, company_id=None, route_by_receiver=False):
         try:
-            root = etree.fromstring(xml_content)
+            root = safe_xml.parse(xml_content, **self._supplier_xml_parse_limits())
+        except safe_xml.XMLLimitError as error:
+            raise SupplierXMLLimitError(_("El XML excede los límites de lectura: %s") % error) from error
         except Exception as error:
-            raise UserError(_("No se pudo leer el XML adjunto: %s") % error) from error
+            raise SupplierXMLRejected(_("No se pudo leer el XML adjunto: %s") % error, "parse_error") from error
 
         local_name = etree.QName(root).localname
         move_type = self._get_move_type_from_xml(local_name)
+        self._validate_supplier_xml_schema(root)
+        signature_vals = self._verify_supplier_xml_signature(root)
 
         company = self.env["res.company"].browse(company_id) if company_id else self.env.company
+        routed_gateway_id = False
+        if route_by_receiver:
+            receptor_number = self._normalize_identification(
+                self._xml_text(root, ["Receptor", "Identificacion", "Numero"])
+            )
+            route = self.env["supplier.xml.gateway"]._get_receiver_routing_index().get(receptor_number)
+            if route and route[0] != company.id:
+                company = self.env["res.company"].browse(route[0])
+                routed_gateway_id, journal_id = route[1], route[2] or None
         self._validate_receiver(root, company)
 
         emisor_name = self._xml_text(root, ["Emisor", "Nombre"])
@@ -89,28 +442,429 @@ class AccountMove(models.Model):
         partner = self._find_or_create_supplier(emisor_name, emisor_vat)
         journal = self._get_purchase_journal(journal_id=journal_id, company=company)
 
-        lines = self._build_invoice_lines(root, company)
+        unmapped_taxes = []
+        lines = self._build_invoice_lines(root, company, partner=partner, unmapped_taxes=unmapped_taxes)
         if not lines:
             raise UserError(_("El XML no tiene líneas de detalle para importar."))
+        totals_vals = self._reconcile_supplier_xml_totals(root, lines, unmapped_taxes)
 
+        invoice_date = self._parse_invoice_date(self._xml_text(root, ["FechaEmision"]))
         return {
             "move_type": move_type,
             "company_id": company.id,
             "journal_id": journal.id,
             "partner_id": partner.id,
             "ref": self._xml_text(root, ["NumeroConsecutivo"]) or self._xml_text(root, ["Clave"]),
-            "invoice_date": self._parse_invoice_date(self._xml_text(root, ["FechaEmision"])),
+            "invoice_date": invoice_date,
             "supplier_xml_key": self._xml_text(root, ["Clave"]),
+            "supplier_xml_amount_total": self._xml_float(root, ["ResumenFactura", "TotalComprobante"], default=False),
             "invoice_line_ids": lines,
+            "supplier_xml_tax_summary_ids": self._supplier_xml_tax_summary_commands(root, move_type),
+            **self._supplier_xml_currency_vals(root, company),
+            **signature_vals,
+            **totals_vals,
+            **({"supplier_xml_gateway_id": routed_gateway_id} if routed_gateway_id else {}),
         }
 
+    @api.model
+    def _supplier_xml_parse_limits(self):
+        """Byte, depth and ``LineaDetalle`` limits of the XML parser; ``0`` disables a limit."""
+        icp = self.env["ir.config_parameter"].sudo()
+        limits = {}
+        for key, param, default in (
+            ("max_bytes", "xml_max_size_mb", safe_xml.DEFAULT_MAX_BYTES // (1024 * 1024)),
+            ("max_depth", "xml_max_depth", safe_xml.DEFAULT_MAX_DEPTH),
+            ("max_lines", "xml_max_lines", safe_xml.DEFAULT_MAX_LINES),
+        ):
+            try:
+                limits[key] = int(icp.get_param("l10n_cr_supplier_xml_import.%s" % param, default))
+            except (TypeError, ValueError):
+                limits[key] = default
+        limits["max_bytes"] *= 1024 * 1024
+        return limits
+
+    @api.model
+    def _reconcile_supplier_xml_totals(self, root, line_cmds, unmapped_taxes):
+        """Check the XML summary against its own lines and against the totals the built lines will produce.
+
+        Everything is computed with ``Decimal`` before creating the move. The Odoo side uses the taxes
+        the lines will carry (``compute_all``, so included and fixed taxes count as Odoo computes them).
+        Those taxes are not exonerated, so the exonerated amount of the XML is taken off them first.
+        Depending on the configured policy a mismatch rejects the document or is stored on the move.
+        """
+        icp = self.env["ir.config_parameter"].sudo()
+        policy = icp.get_param("l10n_cr_supplier_xml_import.totals_policy") or "flag"
+        if policy == "accept":
+            return {"supplier_xml_taxes_mapped": not unmapped_taxes}
+        try:
+            tolerance = Decimal(icp.get_param("l10n_cr_supplier_xml_import.totals_tolerance") or "1")
+        except InvalidOperation:
+            tolerance = Decimal("1")
+
+        zero = Decimal("0")
+        xml_sale = xml_discount = xml_tax = xml_exonerated = zero
+        for line_node in root.xpath("//*[local-name()='LineaDetalle']"):
+            quantity = self._xml_decimal(line_node, ["Cantidad"], Decimal("1"))
+            price_unit = self._xml_decimal(line_node, ["PrecioUnitario"], zero)
+            xml_sale += self._xml_decimal(line_node, ["MontoTotal"], quantity * price_unit)
+            xml_discount += sum(
+                (
+                    self._xml_decimal(discount_node, ["MontoDescuento"], zero)
+                    for discount_node in line_node.xpath("./*[local-name()='Descuento']")
+                ),
+                zero,
+            )
+            tax_nodes = line_node.xpath("./*[local-name()='Impuesto']")
+            line_exonerated = sum(
+                (self._xml_decimal(tax_node, ["Exoneracion", "MontoExoneracion"], zero) for tax_node in tax_nodes),
+                zero,
+            )
+            xml_exonerated += line_exonerated
+            line_tax = self._xml_decimal(line_node, ["ImpuestoNeto"])
+            if line_tax is None:
+                line_tax = sum(
+                    (self._xml_decimal(tax_node, ["Monto"], zero) for tax_node in tax_nodes), zero
+                ) - line_exonerated
+            xml_tax += line_tax
+        xml_other_charges = sum(
+            (
+                self._xml_decimal(charge_node, ["MontoCargo"], zero)
+                for charge_node in root.xpath("//*[local-name()='OtrosCargos']")
+            ),
+            zero,
+        )
+
+        expected_untaxed = expected_tax = zero
+        taxes = self.env["account.tax"].browse(
+            {tax_id for _c, _i, vals in line_cmds for command in vals.get("tax_ids", []) for tax_id in command[2]}
+        )
+        for _command, _id, vals in line_cmds:
+            price_unit = vals["price_unit"] * (1 - vals.get("discount", 0.0) / 100)
+            line_tax_ids = [tax_id for command in vals.get("tax_ids", []) for tax_id in command[2]]
+            line_taxes = taxes.filtered(lambda tax: tax.id in line_tax_ids)
+            if not line_taxes:
+                base = Decimal(str(vals["quantity"])) * Decimal(str(price_unit))
+                expected_untaxed += base.quantize(CENT, rounding=ROUND_HALF_UP)
+                continue
+            computed = line_taxes.compute_all(price_unit, quantity=vals["quantity"])
+            untaxed = Decimal(str(computed["total_excluded"])).quantize(CENT, rounding=ROUND_HALF_UP)
+            expected_untaxed += untaxed
+            expected_tax += Decimal(str(computed["total_included"])).quantize(CENT, rounding=ROUND_HALF_UP) - untaxed
+
+        summary = root.xpath("./*[local-name()='ResumenFactura']")
+        summary = summary[0] if summary else root
+        checks = [
+            ("TotalVenta", self._xml_decimal(summary, ["TotalVenta"]), xml_sale),
+            ("TotalDescuentos", self._xml_decimal(summary, ["TotalDescuentos"]), xml_discount),
+            ("TotalImpuesto", self._xml_decimal(summary, ["TotalImpuesto"]), xml_tax),
+            ("TotalOtrosCargos", self._xml_decimal(summary, ["TotalOtrosCargos"]), xml_other_charges),
+            (
+                "TotalComprobante",
+                self._xml_decimal(summary, ["TotalComprobante"]),
+                xml_sale - xml_discount + xml_tax + xml_other_charges
+                - self._xml_decimal(summary, ["TotalIVADevuelto"], zero),
+            ),
+            (_("Impuestos según Odoo"), self._xml_decimal(summary, ["TotalImpuesto"]), expected_tax - xml_exonerated),
+            (
+                _("Total según Odoo"),
+                self._xml_decimal(summary, ["TotalComprobante"]),
+                expected_untaxed + expected_tax - xml_exonerated,
+            ),
+        ]
+        differences = [
+            _("%(label)s: XML %(xml)s, calculado %(computed)s", label=label, xml=xml_value, computed=computed)
+            for label, xml_value, computed in checks
+            if xml_value is not None and abs(xml_value - computed) > tolerance
+        ]
+        if unmapped_taxes:
+            differences.append(_("Impuestos sin mapear: %s") % ", ".join(sorted(set(unmapped_taxes))))
+
+        if differences and policy == "reject":
+            raise SupplierXMLRejected(
+                _("Los totales del XML no cuadran: %s") % "; ".join(differences), "totals_mismatch"
+            )
+        return {
+            "supplier_xml_totals_state": "mismatch" if differences else "matched",
+            "supplier_xml_totals_message": "\n".join(differences) or False,
+            "supplier_xml_taxes_mapped": not unmapped_taxes,
+        }
+
+    @api.model
+    def _supplier_xml_tax_summary_commands(self, root, move_type):
+        """Per tax code summary rows of the document, in document currency and negative for credit notes.
+
+        Amounts are converted to company currency by ``_apply_supplier_xml_tax_summary_rates`` once the
+        document rates are known.
+
+        Lines are grouped by ``(Codigo, CodigoTarifaIVA, Tarifa)`` of each ``Impuesto`` (lines without
+        taxes under an empty code) and ``OtrosCargos`` by document type.
+        """
+        zero = Decimal("0")
+        groups = {}
+
+        def add(key, **amounts):
+            group = groups.setdefault(key, dict.fromkeys(("base", "tax", "exonerated", "other_charges"), zero))
+            for name, amount in amounts.items():
+                group[name] += amount
+
+        for line_node in root.xpath("//*[local-name()='LineaDetalle']"):
+            base = self._xml_decimal(line_node, ["SubTotal"])
+            if base is None:
+                quantity = self._xml_decimal(line_node, ["Cantidad"], Decimal("1"))
+                price_unit = self._xml_decimal(line_node, ["PrecioUnitario"], zero)
+                base = self._xml_decimal(line_node, ["MontoTotal"], quantity * price_unit)
+                base -= sum(
+                    (
+                        self._xml_decimal(discount_node, ["MontoDescuento"], zero)
+                        for discount_node in line_node.xpath("./*[local-name()='Descuento']")
+                    ),
+                    zero,
+                )
+            tax_nodes = line_node.xpath("./*[local-name()='Impuesto']")
+            if not tax_nodes:
+                add(("", "", 0.0, ""), base=base)
+            for tax_node in tax_nodes:
+                exonerated = self._xml_decimal(tax_node, ["Exoneracion", "MontoExoneracion"], zero)
+                key = (
+                    self._xml_text(tax_node, ["Codigo"]) or "",
+                    self._xml_text(tax_node, ["CodigoTarifaIVA"]) or self._xml_text(tax_node, ["CodigoTarifa"]) or "",
+                    self._xml_float(tax_node, ["Tarifa"], default=0.0),
+                    "",
+                )
+                tax = self._xml_decimal(tax_node, ["Monto"], zero) - exonerated
+                add(key, base=base, tax=tax, exonerated=exonerated)
+        for charge_node in root.xpath("//*[local-name()='OtrosCargos']"):
+            charge_type = (
+                self._xml_text(charge_node, ["TipoDocumentoOC"])
+                or self._xml_text(charge_node, ["TipoDocumento"])
+                or self._xml_text(charge_node, ["TipoDocumentoOTROS"])
+                or ""
+            )
+            add(("", "", 0.0, charge_type), other_charges=self._xml_decimal(charge_node, ["MontoCargo"], zero))
+
+        sign = -1 if move_type == "in_refund" else 1
+        commands = []
+        for (tax_code, rate_code, rate, charge_type), amounts in groups.items():
+            summary_vals = {
+                "tax_code": tax_code or False,
+                "rate_code": rate_code or False,
+                "rate": rate,
+                "other_charge_type": charge_type or False,
+            }
+            for name, amount in amounts.items():
+                summary_vals["%s_amount" % name] = float(sign * amount.quantize(CENT, rounding=ROUND_HALF_UP)) or 0.0
+            commands.append((0, 0, summary_vals))
+        return commands
+
+    @api.model
+    def _apply_supplier_xml_tax_summary_rates(self, vals_list):
+        """Convert the summary rows of foreign-currency documents with the rate already set on their values."""
+        for vals in vals_list:
+            rate = vals.get("currency_id") and vals.get("invoice_currency_rate")
+            if not rate:
+                continue
+            factor = 1 / Decimal(str(rate))
+            for _command, _id, summary_vals in vals.get("supplier_xml_tax_summary_ids", []):
+                for name in ("base_amount", "tax_amount", "exonerated_amount", "other_charges_amount"):
+                    amount = (Decimal(str(summary_vals[name])) * factor).quantize(CENT, rounding=ROUND_HALF_UP)
+                    summary_vals[name] = float(amount) or 0.0
+
+    @api.model
+    def _xml_currency_code(self, root):
+        return (
+            self._xml_text(root, ["ResumenFactura", "CodigoTipoMoneda", "CodigoMoneda"])
+            or self._xml_text(root, ["ResumenFactura", "CodigoMoneda"])
+            or ""
+        ).upper()
+
+    @api.model
+    @ormcache("code")
+    def _supplier_xml_currency_id(self, code):
+        """Id of the currency ``code``, archived or not; a missing currency raises, so misses are not cached."""
+        currency_model = self.env["res.currency"].sudo().with_context(active_test=False)
+        currency = currency_model.search([("name", "=", code)], limit=1)
+        if not currency:
+            raise UserError(_("La moneda %s del XML no existe en el sistema.") % code)
+        return currency.id
+
+    @api.model
+    def _supplier_xml_currency_vals(self, root, company):
+        """Currency and rate of the document from ``CodigoMoneda``/``TipoCambio``.
+
+        The XML ``TipoCambio`` (colones per unit) is used when the company currency is CRC; otherwise the
+        rate is filled in batch by ``_apply_supplier_xml_batch_currency_rates`` or left to Odoo.
+        """
+        code = self._xml_currency_code(root)
+        if not code or code == company.currency_id.name:
+            return {}
+        currency_id = self._supplier_xml_currency_id(code)
+        if not self.env["res.currency"].browse(currency_id).active:
+            raise UserError(_("La moneda %s del XML no está activa.") % code)
+
+        vals = {"currency_id": currency_id}
+        if "invoice_currency_rate" not in self._fields:
+            return vals
+        exchange_rate = self._xml_float(
+            root, ["ResumenFactura", "CodigoTipoMoneda", "TipoCambio"], default=0.0
+        ) or self._xml_float(root, ["ResumenFactura", "TipoCambio"], default=0.0)
+        if exchange_rate > 0 and company.currency_id.name == "CRC":
+            vals["invoice_currency_rate"] = 1.0 / exchange_rate
+        return vals
+
+    @api.model
+    def _apply_supplier_xml_batch_currency_rates(self, vals_list):
+        """Fill the rate of foreign-currency documents without ``TipoCambio`` from one rate load per company."""
+        if "invoice_currency_rate" not in self._fields:
+            return
+        vals_by_company = {}
+        for vals in vals_list:
+            if vals.get("currency_id") and "invoice_currency_rate" not in vals and vals.get("invoice_date"):
+                vals_by_company.setdefault(vals["company_id"], []).append(vals)
+        for company_id, company_vals_list in vals_by_company.items():
+            company = self.env["res.company"].browse(company_id)
+            invoice_dates = [vals["invoice_date"] for vals in company_vals_list]
+            currency_rates = self._preload_supplier_xml_currency_rates(
+                company,
+                {vals["currency_id"] for vals in company_vals_list},
+                min(invoice_dates),
+                max(invoice_dates),
+            )
+            for vals in company_vals_list:
+                vals["invoice_currency_rate"] = self._supplier_xml_rate_from_table(
+                    currency_rates, vals["currency_id"], company.currency_id.id, vals["invoice_date"]
+                )
+
+    @api.model
+    def _preload_supplier_xml_currency_rates(self, company, currency_ids, date_from, date_to):
+        """Load in one query the rates of ``currency_ids`` needed for documents dated in ``[date_from, date_to]``.
+
+        For the company's own rates and for the shared ones, it loads the last rate before ``date_from``,
+        the rates of the range and the oldest rate, which is Odoo's fallback. Returns
+        ``{(currency_id, is_company_rate): [(date, rate), ...]}`` sorted by date, for
+        ``_supplier_xml_rate_from_table``.
+        """
+        currency_ids = tuple(set(currency_ids) | {company.currency_id.id})
+        rate_company = company.root_id if "root_id" in company._fields else company
+        self.env["res.currency.rate"].flush_model(["currency_id", "name", "rate", "company_id"])
+        self.env.cr.execute(
+            """
+            SELECT currency_id, company_id IS NOT NULL, name, rate
+              FROM (
+                    SELECT DISTINCT ON (currency_id, company_id) currency_id, company_id, name, rate
+                      FROM res_currency_rate
+                     WHERE currency_id IN %(currency_ids)s
+                       AND name < %(date_from)s
+                       AND (company_id = %(company_id)s OR company_id IS NULL)
+                  ORDER BY currency_id, company_id, name DESC
+                   ) previous_rates
+             UNION
+            SELECT currency_id, company_id IS NOT NULL, name, rate
+              FROM res_currency_rate
+             WHERE currency_id IN %(currency_ids)s
+               AND name BETWEEN %(date_from)s AND %(date_to)s
+               AND (company_id = %(company_id)s OR company_id IS NULL)
+             UNION
+            SELECT currency_id, company_id IS NOT NULL, name, rate
+              FROM (
+                    SELECT DISTINCT ON (currency_id, company_id) currency_id, company_id, name, rate
+                      FROM res_currency_rate
+                     WHERE currency_id IN %(currency_ids)s
+                       AND (company_id = %(company_id)s OR company_id IS NULL)
+                  ORDER BY currency_id, company_id, name
+                   ) oldest_rates
+            """,
+            {
+                "currency_ids": currency_ids,
+                "date_from": date_from,
+                "date_to": date_to,
+                "company_id": rate_company.id,
+            },
+        )
+        currency_rates = {}
+        for currency_id, is_company_rate, rate_date, rate in sorted(self.env.cr.fetchall()):
+            currency_rates.setdefault((currency_id, is_company_rate), []).append((rate_date, rate))
+        return currency_rates
+
+    @api.model
+    def _supplier_xml_rate_from_table(self, currency_rates, currency_id, company_currency_id, rate_date):
+        """Conversion rate from the company currency to ``currency_id`` on ``rate_date``, as Odoo computes it.
+
+        Like ``res.currency._get_rates``: the latest company rate, else the latest shared rate, else the
+        oldest company rate, else the oldest shared rate, else ``1.0``.
+        """
+
+        def rate_at(rate_currency_id):
+            company_entries = currency_rates.get((rate_currency_id, True)) or []
+            shared_entries = currency_rates.get((rate_currency_id, False)) or []
+            for entries in (company_entries, shared_entries):
+                index = bisect.bisect_right([entry_date for entry_date, _rate in entries], rate_date) - 1
+                if index >= 0:
+                    return entries[index][1]
+            for entries in (company_entries, shared_entries):
+                if entries:
+                    return entries[0][1]
+            return 1.0
+
+        return rate_at(currency_id) / (rate_at(company_currency_id) or 1.0)
+
     @api.model
     def _get_move_type_from_xml(self, local_name):
         if local_name == "FacturaElectronica":
             return "in_invoice"
         if local_name == "NotaCreditoElectronica":
             return "in_refund"
-        raise UserError(_("Tipo de XML no soportado: %s") % local_name)
+        raise SupplierXMLRejected(_("Tipo de XML no soportado: %s") % local_name, "unsupported_type")
+
+    @api.model
+    def _validate_supplier_xml_schema(self, root):
+        """In strict mode, validate the parsed document against the cached Hacienda XSD."""
+        icp = self.env["ir.config_parameter"].sudo()
+        if not str2bool(icp.get_param("l10n_cr_supplier_xml_import.xsd_strict_mode") or "False"):
+            return
+        directory = icp.get_param("l10n_cr_supplier_xml_import.xsd_directory") or None
+        try:
+            version, errors = xsd.validate(root, directory=directory)
+        except LookupError as error:
+            raise SupplierXMLRejected(
+                _("No hay un XSD de Hacienda disponible para validar el XML: %s") % error, "schema_missing"
+            ) from error
+        except (etree.XMLSchemaParseError, etree.XMLSyntaxError) as error:
+            raise SupplierXMLRejected(
+                _("No se pudo cargar el XSD de Hacienda: %s") % error, "schema_missing"
+            ) from error
+        if errors:
+            raise SupplierXMLRejected(
+                _(
+                    "El XML no cumple el esquema de Hacienda v%(version)s: %(errors)s",
+                    version=version,
+                    errors="; ".join(errors),
+                ),
+                "schema_invalid",
+            )
+
+    @api.model
+    def _verify_supplier_xml_signature(self, root):
+        """Check the XAdES signature offline against the configured Hacienda CA certificates.
+
+        Returns the signature values to store on the move, or an empty dict when verification is disabled.
+        """
+        icp = self.env["ir.config_parameter"].sudo()
+        policy = icp.get_param("l10n_cr_supplier_xml_import.signature_policy") or "off"
+        if policy == "off":
+            return {}
+        ca_directory = icp.get_param("l10n_cr_supplier_xml_import.signature_ca_directory") or HACIENDA_CA_DIR
+        result = xades.verify(
+            root,
+            xades.load_trust_store(ca_directory),
+            identification=self._xml_text(root, ["Emisor", "Identificacion", "Numero"]) or "",
+        )
+        if policy == "reject" and result["state"] != "valid":
+            raise SupplierXMLRejected(_("La firma digital del XML no es válida: %s") % result["message"], "signature")
+        return {
+            "supplier_xml_signature_state": result["state"],
+            "supplier_xml_signature_message": result["message"],
+            "supplier_xml_signer": result["subject"],
+        }
 
     @api.model
     def _normalize_identification(self, value):
@@ -121,7 +875,9 @@ class AccountMove(models.Model):
         receptor_number = self._normalize_identification(self._xml_text(root, ["Receptor", "Identificacion", "Numero"]))
         company_vat = self._normalize_identification(company.vat)
         if receptor_number and company_vat and receptor_number != company_vat:
-            raise UserError(_("La cédula del receptor no coincide con la del sistema que recibe."))
+            raise SupplierXMLRejected(
+                _("La cédula del receptor no coincide con la del sistema que recibe."), "receiver_mismatch"
+            )
 
     @api.model
     def _find_or_create_supplier(self, name, vat):
@@ -182,24 +938,46 @@ class AccountMove(models.Model):
         return []
 
     @api.model
-    def _build_invoice_lines(self, root, company):
+    def _build_invoice_lines(self, root, company, partner=None, unmapped_taxes=None):
         default_account = self._default_expense_account(company)
+        rule_model = self.env["supplier.xml.account.rule"]
+        account_rules = rule_model._get_compiled_rules(company.id)
+        rule_partner_id = partner.commercial_partner_id.id if partner else 0
         line_cmds = []
         other_charges_tax_ids = self._tax_ids_for_other_charges(company)
-        for line_node in root.xpath("//*[local-name()='LineaDetalle']"):
+        line_nodes = root.xpath("//*[local-name()='LineaDetalle']")
+        product_ids = self._match_supplier_xml_products(line_nodes, company, partner=partner)
+        for line_node, product_id in zip(line_nodes, product_ids):
             detail = self._xml_text(line_node, ["Detalle"])
             quantity = self._xml_float(line_node, ["Cantidad"], default=1.0)
             price_unit = self._xml_float(line_node, ["PrecioUnitario"], default=0.0)
 
-            tax_ids = self._tax_ids_from_line(line_node, company)
+            tax_ids = self._tax_ids_from_line(line_node, company, unmapped_taxes=unmapped_taxes)
+            discount_amount = sum(
+                self._xml_float(discount_node, ["MontoDescuento"], default=0.0)
+                for discount_node in line_node.xpath("./*[local-name()='Descuento']")
+            )
+            account_rule = rule_model._match_account_rule(
+                account_rules,
+                partner_id=rule_partner_id,
+                cabys_code=self._xml_cabys_code(line_node),
+                commercial_codes=self._xml_commercial_codes(line_node),
+                tax_rate=self._xml_float(line_node, ["Impuesto", "Tarifa"], default=None),
+            )
 
             line_vals = {
                 "name": detail or _("Línea importada desde XML"),
                 "quantity": quantity,
                 "price_unit": price_unit,
-                "account_id": default_account.id,
+                "account_id": account_rule[0] if account_rule else default_account.id,
             }
-            if tax_ids:
+            if discount_amount > 0 and quantity * price_unit:
+                line_vals["discount"] = discount_amount * 100.0 / (quantity * price_unit)
+            if account_rule and account_rule[1]:
+                line_vals["analytic_distribution"] = account_rule[1]
+            if product_id:
+                line_vals["product_id"] = product_id
+            if tax_ids or product_id:
                 line_vals["tax_ids"] = [(6, 0, tax_ids)]
             line_cmds.append((0, 0, line_vals))
             line_cmds.extend(
@@ -220,8 +998,116 @@ class AccountMove(models.Model):
         return line_cmds
 
     @api.model
-    def _tax_ids_from_line(self, line_node, company):
-        tax_model = self.env["account.tax"]
+    def _xml_cabys_code(self, line_node):
+        """CABYS code of a line: ``CodigoCABYS`` in v4.4, ``Codigo`` in v4.3."""
+        return self._xml_text(line_node, ["CodigoCABYS"]) or self._xml_text(line_node, ["Codigo"]) or ""
+
+    @api.model
+    def _xml_commercial_codes(self, line_node):
+        return [
+            (node.text or "").strip()
+            for node in line_node.xpath("./*[local-name()='CodigoComercial']/*[local-name()='Codigo']")
+            if (node.text or "").strip()
+        ]
+
+    @api.model
+    def _match_supplier_xml_products(self, line_nodes, company, partner=None):
+        """Return a product id (or False) per line, resolving all codes of the document in bulk.
+
+        Matching order: supplier product code (``CodigoComercial`` in ``product.supplierinfo``),
+        barcode, then CABYS code when the product model has a CABYS char field.
+        """
+        line_codes = [(self._xml_commercial_codes(node), self._xml_cabys_code(node)) for node in line_nodes]
+        commercial_codes = {code for codes, _cabys in line_codes for code in codes}
+        cabys_codes = {cabys for _codes, cabys in line_codes if cabys}
+        partner_id = partner.commercial_partner_id.id if partner else 0
+        version = self.env["product.product"]._supplier_xml_product_match_version() if line_nodes else 0
+        by_supplier_code = (
+            self._lookup_supplier_xml_products("supplier", commercial_codes, company, version, partner_id)
+            if partner_id
+            else {}
+        )
+        by_barcode = self._lookup_supplier_xml_products("barcode", commercial_codes, company, version)
+        by_cabys = self._lookup_supplier_xml_products("cabys", cabys_codes, company, version)
+
+        product_ids = []
+        for codes, cabys in line_codes:
+            product_id = (
+                next((by_supplier_code[code] for code in codes if code in by_supplier_code), False)
+                or next((by_barcode[code] for code in codes if code in by_barcode), False)
+                or by_cabys.get(cabys, False)
+            )
+            product_ids.append(product_id)
+        return product_ids
+
+    @api.model
+    def _lookup_supplier_xml_products(self, kind, codes, company, version, partner_id=0):
+        """Resolve ``codes`` through the per-process LRU cache, querying only the misses at once.
+
+        Cache keys include the product match ``version``, so invalidations committed by other workers apply here
+        too. A ``None`` version (matching fields changed in this transaction) bypasses the cache.
+        """
+        if not codes:
+            return {}
+        if version is None:
+            return self._query_supplier_xml_products(kind, codes, company, partner_id)
+        cache_prefix = (self.env.cr.dbname, version, company.id, kind, partner_id)
+        found = {}
+        missing = set()
+        for code in codes:
+            product_id = PRODUCT_MATCH_CACHE.get(cache_prefix + (code,))
+            if product_id:
+                found[code] = product_id
+            else:
+                missing.add(code)
+        if missing:
+            for code, product_id in self._query_supplier_xml_products(kind, missing, company, partner_id).items():
+                PRODUCT_MATCH_CACHE.set(cache_prefix + (code,), product_id)
+                found[code] = product_id
+        return found
+
+    @api.model
+    def _query_supplier_xml_products(self, kind, codes, company, partner_id=0):
+        product_model = self.env["product.product"]
+        company_domain = [("company_id", "in", [company.id, False])]
+        matches = {}
+        if kind == "supplier":
+            supplier_infos = self.env["product.supplierinfo"].search_fetch(
+                [
+                    ("partner_id.commercial_partner_id", "=", partner_id),
+                    ("product_code", "in", list(codes)),
+                    *company_domain,
+                ],
+                ["product_code", "product_id", "product_tmpl_id"],
+                order="sequence, id",
+            )
+            for supplier_info in supplier_infos:
+                product = supplier_info.product_id or supplier_info.product_tmpl_id.product_variant_id
+                if product and product.active:
+                    matches.setdefault(supplier_info.product_code, product.id)
+        elif kind == "barcode":
+            for product in product_model.search_fetch(
+                [("barcode", "in", list(codes)), *company_domain], ["barcode"], order="id"
+            ):
+                matches.setdefault(product.barcode, product.id)
+        elif kind == "cabys":
+            cabys_field = next(
+                (
+                    field_name
+                    for field_name in PRODUCT_CABYS_FIELDS
+                    if field_name in product_model._fields and product_model._fields[field_name].type == "char"
+                ),
+                False,
+            )
+            if cabys_field:
+                for product in product_model.search_fetch(
+                    [(cabys_field, "in", list(codes)), *company_domain], [cabys_field], order="id"
+                ):
+                    matches.setdefault(product[cabys_field], product.id)
+        return matches
+
+    @api.model
+    def _tax_ids_from_line(self, line_node, company, unmapped_taxes=None):
         tax_ids = []
         for tax_node in line_node.xpath("./*[local-name()='Impuesto']"):
             code = self._xml_text(tax_node, ["CodigoTarifaIVA"])
@@ -229,6 +1115,8 @@ class AccountMove(models.Model):
             tax = self._find_purchase_tax_by_code_or_rate(company=company, code=code, rate=rate)
             if tax and tax.id not in tax_ids:
                 tax_ids.append(tax.id)
+            if not tax and unmapped_taxes is not None and self._xml_float(tax_node, ["Monto"], default=0.0):
+                unmapped_taxes.append(code or (rate is not False and "%s%%" % rate) or "?")
         return tax_ids
 
     @api.model
@@ -307,6 +1195,16 @@ class AccountMove(models.Model):
             return False
         return (result[0].text or "").strip()
 
+    @api.model
+    def _xml_decimal(self, node, path, default=None):
+        value = self._xml_text(node, path)
+        if not value:
+            return default
+        try:
+            return Decimal(value)
+        except InvalidOperation:
+            return default
+
     @api.model
     def _xml_float(self, node, path, default=0.0):
         value = self._xml_text(node, path)
@@ -334,13 +1232,13 @@ class AccountMove(models.Model):
 
     @api.model
     def _is_supported_supplier_xml_payload(self, payload):
+        """Whether the root element is a supported document, reading only up to its start tag.
+
+        Malformed or oversized documents are reported when they are parsed for import.
+        """
         if not payload:
             return False
-        try:
-            xml_root = etree.fromstring(payload)
-        except Exception:
-            return False
-        return etree.QName(xml_root).localname in {"FacturaElectronica", "NotaCreditoElectronica"}
+        return safe_xml.root_name(payload) in SUPPORTED_XML_ROOTS
 
     @api.model
     def _normalize_attachment_payload(self, payload):
@@ -361,10 +1259,18 @@ class AccountMove(models.Model):
         return decoded if self._is_supported_supplier_xml_payload(decoded) else b""
 
     @api.model
-    def _extract_supported_xml_payloads(self, payload, filename=False, allow_email_container=True):
+    def _extract_supported_xml_payloads(self, payload, filename=False, allow_email_container=True, max_bytes=None):
+        """Supported XML payloads of an attachment, as is, base64 encoded, in a ZIP or in an attached email.
+
+        ZIP members are decompressed up to ``max_bytes + 1`` bytes so an oversized member is reported by
+        the parser instead of being expanded. ``max_bytes`` must be given when called outside the request
+        thread.
+        """
         normalized_payload = self._normalize_attachment_payload(payload)
         if not normalized_payload:
             return []
+        if max_bytes is None:
+            max_bytes = self._supplier_xml_parse_limits()["max_bytes"]
 
         xml_payloads = []
         if self._is_supported_supplier_xml_payload(normalized_payload):
@@ -381,7 +1287,8 @@ class AccountMove(models.Model):
                     for xml_name in zip_file.namelist():
                         if not xml_name.lower().endswith(".xml"):
                             continue
-                        xml_payload = zip_file.read(xml_name)
+                        with zip_file.open(xml_name) as member:
+                            xml_payload = member.read(max_bytes + 1) if max_bytes else member.read()
                         if self._is_supported_supplier_xml_payload(xml_payload):
                             xml_payloads.append((xml_name, xml_payload))
             except (zipfile.BadZipFile, RuntimeError, ValueError):
@@ -389,7 +1296,9 @@ class AccountMove(models.Model):
 
         if allow_email_container and self._looks_like_email_container(normalized_payload, filename=filename):
             xml_payloads.extend(
-                self._extract_xml_payloads_from_email_container(normalized_payload, filename=filename)
+                self._extract_xml_payloads_from_email_container(
+                    normalized_payload, filename=filename, max_bytes=max_bytes
+                )
             )
 
         return xml_payloads
@@ -402,7 +1311,7 @@ class AccountMove(models.Model):
         return payload.lstrip().startswith(b"Return-Path:") or payload.lstrip().startswith(b"Received:")
 
     @api.model
-    def _extract_xml_payloads_from_email_container(self, payload, filename=False):
+    def _extract_xml_payloads_from_email_container(self, payload, filename=False, max_bytes=None):
         try:
             email_message = BytesParser(policy=policy.default).parsebytes(payload)
         except Exception:
@@ -421,6 +1330,7 @@ class AccountMove(models.Model):
                     part_payload,
                     filename=part_filename,
                     allow_email_container=False,
+                    max_bytes=max_bytes,
                 )
             )
         return xml_payloads
@@ -443,6 +1353,20 @@ class AccountMove(models.Model):
         )
         return (move_attachments | message_attachments).sorted(key=lambda a: a.id, reverse=True)
 
+    @api.model
+    def _supplier_xml_write_vals(self, vals, filename):
+        """Values to refill an existing draft from parsed XML values, replacing its lines."""
+        self._apply_supplier_xml_batch_currency_rates([vals])
+        self._apply_supplier_xml_tax_summary_rates([vals])
+        write_vals = {
+            key: value
+            for key, value in vals.items()
+            if key not in ("invoice_line_ids", "supplier_xml_tax_summary_ids")
+        }
+        write_vals["supplier_xml_filename"] = filename
+        write_vals["invoice_line_ids"] = [(5, 0, 0)] + vals["invoice_line_ids"]
+        return write_vals
+
     def action_read_supplier_xml_attachment(self):
         self.ensure_one()
         if self.move_type not in ("in_invoice", "in_refund"):
@@ -467,19 +1391,8 @@ class AccountMove(models.Model):
                 except UserError:
                     continue
 
-                self.write(
-                    {
-                        "move_type": vals["move_type"],
-                        "partner_id": vals["partner_id"],
-                        "company_id": vals["company_id"],
-                        "journal_id": vals["journal_id"],
-                        "ref": vals["ref"],
-                        "invoice_date": vals["invoice_date"],
-                        "supplier_xml_key": vals["supplier_xml_key"],
-                        "supplier_xml_filename": extracted_name or attachment.name,
-                        "invoice_line_ids": [(5, 0, 0)] + vals["invoice_line_ids"],
-                    }
-                )
+                self.write(self._supplier_xml_write_vals(vals, extracted_name or attachment.name))
+                self._create_supplier_xml_tax_summaries(self, [vals], replace=True)
                 self.message_post(body=_("XML leído manualmente desde el adjunto: %s") % (extracted_name or ""))
                 return True
 
@@ -487,8 +1400,15 @@ class AccountMove(models.Model):
 
     @api.model
     def _extract_xml_attachments_from_message(self, msg_dict):
-        xml_candidates = []
-        for attachment in msg_dict.get("attachments", []):
+        return self._extract_xml_payloads_from_candidates(
+            self._supplier_xml_candidate_attachments(msg_dict.get("attachments", []))
+        )
+
+    @api.model
+    def _supplier_xml_candidate_attachments(self, attachments):
+        """Return ``[(filename, payload)]`` for the mail attachments that may hold supplier XML (XML or ZIP)."""
+        candidates = []
+        for attachment in attachments or []:
             filename = False
             payload = b""
             mimetype = False
@@ -521,8 +1441,34 @@ class AccountMove(models.Model):
             is_zip_mimetype = mimetype in {"application/zip", "application/x-zip-compressed"}
             if not is_xml_name and not is_xml_mimetype and not is_zip_name and not is_zip_mimetype:
                 continue
-            xml_candidates.extend(self._extract_supported_xml_payloads(payload, filename=filename))
-        return xml_candidates
+            candidates.append((filename, payload))
+        return candidates
+
+    @api.model
+    def _extract_xml_payloads_from_candidates(self, candidates):
+        """Extract the supported XML payloads of ``candidates``, keeping their order.
+
+        Several candidates are extracted on a bounded thread pool (zlib and lxml release the GIL). The
+        extraction helpers only work on bytes and must not use the environment or the cursor.
+        """
+        max_bytes = self._supplier_xml_parse_limits()["max_bytes"]
+        if len(candidates) > 1:
+            workers = min(len(candidates), XML_EXTRACTION_MAX_WORKERS)
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="supplier_xml_extract") as executor:
+                extracted = list(
+                    executor.map(
+                        lambda candidate: self._extract_supported_xml_payloads(
+                            candidate[1], filename=candidate[0], max_bytes=max_bytes
+                        ),
+                        candidates,
+                    )
+                )
+        else:
+            extracted = [
+                self._extract_supported_xml_payloads(payload, filename=filename, max_bytes=max_bytes)
+                for filename, payload in candidates
+            ]
+        return [xml_payload for xml_payloads in extracted for xml_payload in xml_payloads]
 
     @api.model
     def _gateway_from_email_message(self, msg_dict):
@@ -552,20 +1498,11 @@ class AccountMove(models.Model):
                 continue
 
             gateway = self._gateway_from_email_message(msg_dict)
-            write_vals = {
-                "move_type": vals["move_type"],
-                "partner_id": vals["partner_id"],
-                "company_id": vals["company_id"],
-                "journal_id": vals["journal_id"],
-                "ref": vals["ref"],
-                "invoice_date": vals["invoice_date"],
-                "supplier_xml_key": vals["supplier_xml_key"],
-                "supplier_xml_filename": filename,
-                "invoice_line_ids": [(5, 0, 0)] + vals["invoice_line_ids"],
-            }
+            write_vals = self._supplier_xml_write_vals(vals, filename)
             if gateway:
                 write_vals["supplier_xml_gateway_id"] = gateway.id
             self.write(write_vals)
+            self._create_supplier_xml_tax_summaries(self, [vals], replace=True)
             self.message_post(body=_("XML de proveedor leído automáticamente desde los adjuntos del correo."))
             return
 
@@ -0,0 +1,14 @@
+from odoo import fields, models
+
+
+class IrAttachment(models.Model):
+    _inherit = "ir.attachment"
+
+    supplier_xml_gateway_id = fields.Many2one(
+        "supplier.xml.gateway",
+        string="Buzón XML de origen",
+        index="btree_not_null",
+        readonly=True,
+        ondelete="set null",
+        help="Adjunto del correo original guardado por el buzón; solo estos adjuntos siguen la política de retención.",
+    )
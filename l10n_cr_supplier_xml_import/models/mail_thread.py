@@ -0,0 +1,13 @@
+from odoo import api, models
+
+
+class MailThread(models.AbstractModel):
+    _inherit = "mail.thread"
+
+    @api.model
+    def _message_route_process(self, message, message_dict, routes):
+        if routes:
+            routes = self.env["supplier.xml.gateway"]._filter_supplier_xml_routes(message_dict, routes)
+            if not routes:
+                return False
+        return super()._message_route_process(message, message_dict, routes)
@@ -0,0 +1,79 @@
+from odoo import api, models
+
+from ..tools import cache_version
+from .account_move import PRODUCT_CABYS_FIELDS
+
+PRODUCT_MATCH_FIELDS = {"barcode", "active", "company_id", "product_tmpl_id", *PRODUCT_CABYS_FIELDS}
+SUPPLIERINFO_MATCH_FIELDS = {"product_code", "partner_id", "product_id", "product_tmpl_id", "company_id", "sequence"}
+PRODUCT_MATCH_CACHE_VERSION = "product_matches"
+
+
+class ProductProduct(models.Model):
+    _inherit = "product.product"
+
+    def init(self):
+        cache_version.create_table(self.env.cr)
+
+    @api.model
+    def _supplier_xml_product_match_version(self):
+        """Version of the product matches in the current snapshot, ``None`` when this transaction changed them."""
+        return cache_version.get(self.env.cr, PRODUCT_MATCH_CACHE_VERSION)
+
+    @api.model
+    def _invalidate_supplier_xml_product_matches(self):
+        """Expire the cached matches of every worker together with the product changes of this transaction."""
+        cache_version.bump(self.env.cr, PRODUCT_MATCH_CACHE_VERSION)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        products = super().create(vals_list)
+        if any(PRODUCT_MATCH_FIELDS.intersection(vals) for vals in vals_list):
+            self._invalidate_supplier_xml_product_matches()
+        return products
+
+    def write(self, vals):
+        result = super().write(vals)
+        if PRODUCT_MATCH_FIELDS.intersection(vals):
+            self._invalidate_supplier_xml_product_matches()
+        return result
+
+    def unlink(self):
+        result = super().unlink()
+        self.env["product.product"]._invalidate_supplier_xml_product_matches()
+        return result
+
+
+class ProductTemplate(models.Model):
+    _inherit = "product.template"
+
+    def write(self, vals):
+        result = super().write(vals)
+        if PRODUCT_MATCH_FIELDS.intersection(vals):
+            self.env["product.product"]._invalidate_supplier_xml_product_matches()
+        return result
+
+    def unlink(self):
+        result = super().unlink()
+        self.env["product.product"]._invalidate_supplier_xml_product_matches()
+        return result
+
+
+class ProductSupplierinfo(models.Model):
+    _inherit = "product.supplierinfo"
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env["product.product"]._invalidate_supplier_xml_product_matches()
+        return records
+
+    def write(self, vals):
+        result = super().write(vals)
+        if SUPPLIERINFO_MATCH_FIELDS.intersection(vals):
+            self.env["product.product"]._invalidate_supplier_xml_product_matches()
+        return result
+
+    def unlink(self):
+        result = super().unlink()
+        self.env["product.product"]._invalidate_supplier_xml_product_matches()
+        return result
@@ -0,0 +1,15 @@
+from odoo import models
+
+
+class ResCompany(models.Model):
+    _inherit = "res.company"
+
+    def write(self, vals):
+        if "vat" not in vals:
+            return super().write(vals)
+        normalize = self.env["account.move"]._normalize_identification
+        old_vats = {company.id: normalize(company.vat) for company in self}
+        result = super().write(vals)
+        if any(normalize(company.vat) != old_vats[company.id] for company in self):
+            self.env["supplier.xml.gateway"]._invalidate_receiver_routing_index()
+        return result
@@ -25,6 +25,86 @@ class ResConfigSettings(models.TransientModel):
         config_parameter="l10n_cr_supplier_xml_import.process_emails_to_date",
         help="Ignora correos posteriores a esta fecha al procesar XML de facturas por correo.",
     )
+    supplier_xml_xsd_strict_mode = fields.Boolean(
+        string="Validar XSD de Hacienda",
+        config_parameter="l10n_cr_supplier_xml_import.xsd_strict_mode",
+        help="Valida cada XML contra el XSD oficial de su versión (4.3/4.4) antes de crear proveedores o facturas.",
+    )
+    supplier_xml_xsd_directory = fields.Char(
+        string="Directorio de XSD",
+        config_parameter="l10n_cr_supplier_xml_import.xsd_directory",
+        help="Directorio con los XSD de Hacienda (p. ej. FacturaElectronica_V4.4.xsd). "
+        "Si está vacío se usa data/xsd del módulo.",
+    )
+    supplier_xml_signature_policy = fields.Selection(
+        [
+            ("off", "No verificar"),
+            ("flag", "Verificar y marcar la factura"),
+            ("reject", "Rechazar XML sin firma válida"),
+        ],
+        string="Firma digital del XML",
+        default="off",
+        config_parameter="l10n_cr_supplier_xml_import.signature_policy",
+        help="Verifica la firma XAdES-EPES de cada XML contra los certificados de CA configurados, sin conexión.",
+    )
+    supplier_xml_signature_ca_directory = fields.Char(
+        string="Directorio de certificados CA",
+        config_parameter="l10n_cr_supplier_xml_import.signature_ca_directory",
+        help="Directorio con los certificados raíz e intermedios (PEM/DER) de confianza. "
+        "Si está vacío se usa data/hacienda_ca del módulo.",
+    )
+    supplier_xml_totals_policy = fields.Selection(
+        [
+            ("accept", "Aceptar sin verificar"),
+            ("flag", "Marcar la factura"),
+            ("reject", "Rechazar el XML"),
+        ],
+        string="Totales que no cuadran",
+        default="flag",
+        config_parameter="l10n_cr_supplier_xml_import.totals_policy",
+        help="Qué hacer cuando los totales calculados desde el XML no coinciden con ResumenFactura "
+        "o con los impuestos mapeados en Odoo.",
+    )
+    supplier_xml_totals_tolerance = fields.Float(
+        string="Tolerancia de totales",
+        default=1.0,
+        config_parameter="l10n_cr_supplier_xml_import.totals_tolerance",
+        help="Diferencia máxima aceptada, en unidades de la moneda del documento.",
+    )
+    supplier_xml_fallback_duplicate_policy = fields.Selection(
+        [
+            ("off", "No verificar"),
+            ("flag", "Crear y marcar como posible duplicado"),
+            ("skip", "Omitir el documento"),
+        ],
+        string="Duplicados sin clave",
+        default="flag",
+        config_parameter="l10n_cr_supplier_xml_import.fallback_duplicate_policy",
+        help="Busca documentos existentes con el mismo proveedor, referencia (NumeroConsecutivo), fecha y total, "
+        "además de la clave del XML.",
+    )
+    supplier_xml_max_size_mb = fields.Integer(
+        string="Tamaño máximo del XML (MB)",
+        default=5,
+        config_parameter="l10n_cr_supplier_xml_import.xml_max_size_mb",
+        help="Los XML más grandes se rechazan antes de leerlos.",
+    )
+    supplier_xml_max_depth = fields.Integer(
+        string="Profundidad máxima del XML",
+        default=64,
+        config_parameter="l10n_cr_supplier_xml_import.xml_max_depth",
+    )
+    supplier_xml_max_lines = fields.Integer(
+        string="Máximo de líneas de detalle",
+        default=1000,
+        config_parameter="l10n_cr_supplier_xml_import.xml_max_lines",
+        help="Cantidad máxima de LineaDetalle por documento.",
+    )
+    supplier_xml_metrics_token = fields.Char(
+        string="Token de métricas",
+        config_parameter="l10n_cr_supplier_xml_import.metrics_token",
+        help="Token requerido por /supplier_xml_import/metrics. Si está vacío, el endpoint de métricas queda deshabilitado.",
+    )
     supplier_xml_mail_server_ref = fields.Reference(
         selection="_selection_supplier_xml_mail_servers",
         string="Servidor de correo",
@@ -90,8 +170,23 @@ class ResConfigSettings(models.TransientModel):
     def action_supplier_xml_search_emails(self):
         self.ensure_one()
 
+        imap_gateways = self.env["supplier.xml.gateway"].search(
+            [("imap_host", "!=", False), ("company_id", "=", self.env.company.id)]
+        )
+        imap_message = ""
+        if imap_gateways:
+            processed = sum(gateway._poll_imap() for gateway in imap_gateways)
+            imap_message = _(
+                "Se procesaron %(count)s correos nuevos de %(gateways)s buzones IMAP de %(company)s.",
+                count=processed,
+                gateways=len(imap_gateways),
+                company=self.env.company.display_name,
+            )
+
         server = self._get_supplier_xml_mail_server()
         if not server:
+            if imap_gateways:
+                return self._supplier_xml_search_notification(imap_message)
             raise UserError(_("Seleccione un servidor de correo en la configuración general."))
 
         if server._name == "fetchmail.server":
@@ -118,20 +213,11 @@ class ResConfigSettings(models.TransientModel):
                     process_from_datetime,
                     process_to_datetime,
                 )
-            return {
-                "type": "ir.actions.client",
-                "tag": "display_notification",
-                "params": {
-                    "title": _("Búsqueda completada"),
-                    "message": _(
-                        "Se ejecutó la búsqueda manual de correos en el servidor %s "
-                        "(incluye correos leídos)."
-                    )
-                    % server.display_name,
-                    "type": "success",
-                    "sticky": False,
-                },
-            }
+            return self._supplier_xml_search_notification(
+                _("Se ejecutó la búsqueda manual de correos en el servidor %s (incluye correos leídos).")
+                % server.display_name,
+                imap_message,
+            )
 
         server_action = self.env["ir.actions.server"].search(
             [
@@ -142,19 +228,12 @@ class ResConfigSettings(models.TransientModel):
         )
         if server_action:
             server_action.with_context(active_model="fetchmail.server", active_ids=[], active_id=False).run()
-            return {
-                "type": "ir.actions.client",
-                "tag": "display_notification",
-                "params": {
-                    "title": _("Búsqueda completada"),
-                    "message": _(
-                        "Se ejecutó la acción de servidor para revisar correos entrantes."
-                    ),
-                    "type": "success",
-                    "sticky": False,
-                },
-            }
+            return self._supplier_xml_search_notification(
+                _("Se ejecutó la acción de servidor para revisar correos entrantes."), imap_message
+            )
 
+        if imap_gateways:
+            return self._supplier_xml_search_notification(imap_message)
         raise UserError(
             _(
                 "No se encontró un mecanismo para revisar correos entrantes. "
@@ -162,6 +241,19 @@ class ResConfigSettings(models.TransientModel):
             )
         )
 
+    @api.model
+    def _supplier_xml_search_notification(self, *messages):
+        return {
+            "type": "ir.actions.client",
+            "tag": "display_notification",
+            "params": {
+                "title": _("Búsqueda completada"),
+                "message": " ".join(message for message in messages if message),
+                "type": "success",
+                "sticky": False,
+            },
+        }
+
     @api.model
     def _call_fetchmail_method(self, server, method_name, process_from_datetime=False, process_to_datetime=False):
         """Execute fetchmail methods with optional filters when supported.
@@ -0,0 +1,129 @@
+from odoo import api, fields, models
+
+from ..tools import cache_version
+from ..tools.lru import LRUCache
+
+RULE_KEY = None
+RULES_CACHE = LRUCache(512)
+RULES_CACHE_VERSION = "account_rules"
+
+
+class SupplierXMLAccountRule(models.Model):
+    _name = "supplier.xml.account.rule"
+    _description = "Regla de cuenta para XML de proveedor"
+    _inherit = ["analytic.mixin"]
+    _order = "sequence, id"
+    _check_company_auto = True
+
+    sequence = fields.Integer(default=10)
+    active = fields.Boolean(default=True)
+    company_id = fields.Many2one("res.company", required=True, default=lambda self: self.env.company, index=True)
+    partner_id = fields.Many2one("res.partner", string="Proveedor", help="Vacío aplica a todos los proveedores.")
+    cabys_code = fields.Char(
+        string="Código CABYS",
+        help="Prefijo del código CABYS (Codigo/CodigoCABYS). Un prefijo más largo es más específico.",
+    )
+    commercial_code = fields.Char(string="Código comercial", help="Valor exacto de CodigoComercial/Codigo.")
+    match_tax_rate = fields.Boolean(string="Filtrar por tarifa")
+    tax_rate = fields.Float(string="Tarifa IVA (%)", digits=(16, 4))
+    account_id = fields.Many2one(
+        "account.account",
+        string="Cuenta",
+        required=True,
+        check_company=True,
+        domain="[('account_type', 'not in', ('asset_receivable', 'liability_payable', 'off_balance'))]",
+    )
+
+    def init(self):
+        cache_version.create_table(self.env.cr)
+
+    @api.model
+    def _tax_rate_key(self, rate):
+        return round(rate, 2) if rate is not False and rate is not None else None
+
+    @api.model
+    def _get_compiled_rules(self, company_id):
+        """Compiled rules of a company, cached per process under the version of the rules."""
+        version = cache_version.get(self.env.cr, RULES_CACHE_VERSION)
+        if version is None:
+            return self._compile_rules(company_id)
+        key = (self.env.cr.dbname, version, company_id)
+        buckets = RULES_CACHE.get(key)
+        if buckets is None:
+            buckets = self._compile_rules(company_id)
+            RULES_CACHE.set(key, buckets)
+        return buckets
+
+    @api.model
+    def _compile_rules(self, company_id):
+        """Compile the active rules of a company into exact-match buckets of CABYS prefix tries.
+
+        Buckets are keyed by ``(commercial partner id, commercial_code, tax_rate)`` (``0``, ``""`` and
+        ``None`` meaning "any"); each trie node keeps the first rule by sequence under ``RULE_KEY``.
+        """
+        buckets = {}
+        rules = self.sudo().search([("company_id", "=", company_id)])
+        for rule in rules:
+            key = (
+                rule.partner_id.commercial_partner_id.id or 0,
+                (rule.commercial_code or "").strip(),
+                self._tax_rate_key(rule.tax_rate) if rule.match_tax_rate else None,
+            )
+            node = buckets.setdefault(key, {})
+            for char in (rule.cabys_code or "").strip():
+                node = node.setdefault(char, {})
+            node.setdefault(RULE_KEY, (rule.account_id.id, dict(rule.analytic_distribution or {}), rule.sequence))
+        return buckets
+
+    @api.model
+    def _match_account_rule(self, buckets, partner_id=0, cabys_code="", commercial_codes=(), tax_rate=None):
+        """Return ``(account_id, analytic_distribution)`` of the most specific matching rule, or ``None``.
+
+        ``buckets`` are the compiled rules of the company (``_get_compiled_rules``). Specificity is the
+        number of matched criteria, then the CABYS prefix length, then the sequence.
+        """
+        if not buckets:
+            return None
+        rate_key = self._tax_rate_key(tax_rate)
+        best_score, best_rule = None, None
+        for bucket_partner in {partner_id or 0, 0}:
+            for bucket_code in {*(code for code in commercial_codes if code), ""}:
+                for bucket_rate in {rate_key, None}:
+                    node = buckets.get((bucket_partner, bucket_code, bucket_rate))
+                    if node is None:
+                        continue
+                    criteria = bool(bucket_partner) + bool(bucket_code) + (bucket_rate is not None)
+                    depth = 0
+                    candidate = node.get(RULE_KEY)
+                    candidate_depth = 0
+                    for char in cabys_code or "":
+                        node = node.get(char)
+                        if node is None:
+                            break
+                        depth += 1
+                        if RULE_KEY in node:
+                            candidate, candidate_depth = node[RULE_KEY], depth
+                    if candidate is None:
+                        continue
+                    score = (criteria + bool(candidate_depth), candidate_depth, -candidate[2])
+                    if best_score is None or score > best_score:
+                        best_score, best_rule = score, candidate
+        if not best_rule:
+            return None
+        return best_rule[0], dict(best_rule[1])
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        cache_version.bump(self.env.cr, RULES_CACHE_VERSION)
+        return records
+
+    def write(self, vals):
+        result = super().write(vals)
+        cache_version.bump(self.env.cr, RULES_CACHE_VERSION)
+        return result
+
+    def unlink(self):
+        result = super().unlink()
+        cache_version.bump(self.env.cr, RULES_CACHE_VERSION)
+        return result
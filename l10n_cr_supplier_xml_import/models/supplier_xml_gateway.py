@@ -1,10 +1,33 @@
 import base64
+import contextlib
+import imaplib
+import logging
+import time
+from datetime import timedelta, timezone
 from email.utils import getaddresses, parsedate_to_datetime
-from email import message_from_string
+from email import message_from_string, policy
+from email.parser import BytesHeaderParser
 
 from odoo import _, api, fields, models
 from odoo.exceptions import UserError
 
+from ..tools import cache_version, imap
+from ..tools.lru import LRUCache
+
+_logger = logging.getLogger(__name__)
+
+
+RETENTION_BATCH_SIZE = 1000
+AUTO_POST_BATCH_SIZE = 100
+IMAP_POLL_BATCH_SIZE = 200
+IMAP_TIMEOUT = 60
+IMAP_IDLE_BUDGET = 50
+IMAP_ERRORS = (imaplib.IMAP4.error, imap.IMAPError, OSError)
+IMAP_POOL = imap.ConnectionPool(max_per_server=4)
+RETAINED_ATTACHMENT_MIMETYPES = ["application/xml", "text/xml", "application/pdf"]
+ROUTING_CACHE = LRUCache(64)
+ROUTING_CACHE_VERSION = "receiver_routing"
+
 
 class SupplierXMLGateway(models.Model):
     _name = "supplier.xml.gateway"
@@ -33,6 +56,78 @@ class SupplierXMLGateway(models.Model):
     )
     move_ids = fields.One2many("account.move", "supplier_xml_gateway_id", string="Facturas recibidas")
     move_count = fields.Integer(compute="_compute_move_count", string="Facturas recibidas")
+    log_count = fields.Integer(compute="_compute_log_count", string="Registros de importación")
+    route_by_receiver = fields.Boolean(
+        string="Enrutar por cédula del receptor",
+        help="Crea cada documento en la compañía cuya cédula coincide con el receptor del XML, con el buzón y "
+        "el diario de esa compañía. Permite compartir un solo buzón entre varias compañías.",
+    )
+    defer_move_name = fields.Boolean(
+        string="Numerar al publicar",
+        help="Crea los borradores sin número (\"/\") y deja la numeración del diario para la publicación. Evita "
+        "que varios procesos de correo se bloqueen en la secuencia del diario al importar en paralelo.",
+    )
+    post_outcomes_in_chatter = fields.Boolean(
+        string="Publicar resultados en el chatter",
+        help="Además del registro de importación, publica en el chatter del buzón los correos omitidos o ignorados.",
+    )
+    auto_post_policy = fields.Selection(
+        [("never", "Nunca"), ("criteria", "Si cumple los criterios")],
+        string="Publicación automática",
+        default="never",
+        required=True,
+        help="Las facturas que cumplen los criterios quedan pendientes y una acción planificada las publica en lotes.",
+    )
+    auto_post_require_totals = fields.Boolean(string="Exigir totales cuadrados", default=True)
+    auto_post_require_taxes = fields.Boolean(string="Exigir impuestos mapeados", default=True)
+    auto_post_require_signature = fields.Boolean(string="Exigir firma válida")
+    auto_post_partner_ids = fields.Many2many(
+        "res.partner",
+        string="Proveedores de confianza",
+        help="Solo se publican automáticamente las facturas de estos proveedores. Vacío aplica a todos.",
+    )
+    imap_host = fields.Char(string="Servidor IMAP", help="Si se indica, el buzón lee el correo directamente por IMAP.")
+    imap_port = fields.Integer(string="Puerto IMAP", default=993)
+    imap_ssl = fields.Boolean(string="IMAP con SSL", default=True)
+    imap_user = fields.Char(string="Usuario IMAP")
+    imap_password = fields.Char(string="Contraseña IMAP", groups="base.group_system")
+    imap_folder = fields.Char(string="Carpeta IMAP", default="INBOX")
+    imap_use_idle = fields.Boolean(
+        string="Recepción inmediata (IDLE)",
+        help="Mantiene la sesión IMAP abierta y espera correo nuevo con IDLE para importarlo en cuanto llega, "
+        "en lugar de revisar el buzón cada pocos minutos.",
+    )
+    imap_uidvalidity = fields.Char(string="UIDVALIDITY", readonly=True, copy=False)
+    imap_last_uid = fields.Char(string="Último UID leído", readonly=True, copy=False)
+    imap_last_poll = fields.Datetime(string="Última lectura IMAP", readonly=True, copy=False)
+    sender_allowlist = fields.Text(
+        string="Remitentes permitidos",
+        help="Una dirección o dominio (@dominio.com) por línea. Si se indica, se descarta el correo de otros "
+        "remitentes.",
+    )
+    sender_denylist = fields.Text(
+        string="Remitentes bloqueados",
+        help="Una dirección o dominio (@dominio.com) por línea. Su correo se descarta sin procesarlo.",
+    )
+    max_attachment_size_mb = fields.Integer(
+        string="Tamaño máximo de adjunto (MB)",
+        default=10,
+        help="Los adjuntos XML o ZIP más grandes se ignoran. 0 desactiva el límite.",
+    )
+    chatter_retention_days = fields.Integer(
+        string="Conservar chatter (días)",
+        help="Elimina los mensajes del chatter del buzón con más antigüedad que estos días. 0 desactiva la limpieza.",
+    )
+    attachment_retention_days = fields.Integer(
+        string="Conservar adjuntos de correo (días)",
+        help="Elimina los adjuntos del correo guardados por el buzón que no son XML ni PDF con más antigüedad "
+        "que estos días, cuando todas las facturas que los comparten están publicadas. Los adjuntos subidos "
+        "a mano no se eliminan. 0 desactiva la limpieza.",
+    )
+    log_retention_days = fields.Integer(
+        string="Conservar registro de importación (días)",
+        help="Elimina los registros de importación con más antigüedad que estos días. 0 desactiva la limpieza.",
+    )
 
     @api.model
     def _normalize_config_datetime(self, value):
@@ -57,6 +152,73 @@ class SupplierXMLGateway(models.Model):
         for record in self:
             record.move_count = len(record.move_ids)
 
+    def _compute_log_count(self):
+        counts = dict(
+            self.env["supplier.xml.import.log"]._read_group(
+                [("gateway_id", "in", self.ids)], ["gateway_id"], ["__count"]
+            )
+        )
+        for record in self:
+            record.log_count = counts.get(record, 0)
+
+    def init(self):
+        cache_version.create_table(self.env.cr)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self._invalidate_receiver_routing_index()
+        return records
+
+    def write(self, vals):
+        result = super().write(vals)
+        if {"company_id", "journal_id"} & set(vals):
+            self._invalidate_receiver_routing_index()
+        return result
+
+    def unlink(self):
+        result = super().unlink()
+        self._invalidate_receiver_routing_index()
+        return result
+
+    @api.model
+    def _invalidate_receiver_routing_index(self):
+        cache_version.bump(self.env.cr, ROUTING_CACHE_VERSION)
+
+    @api.model
+    def _get_receiver_routing_index(self):
+        """Receiver routing index, cached per process under the version of the gateways and company VATs."""
+        version = cache_version.get(self.env.cr, ROUTING_CACHE_VERSION)
+        if version is None:
+            return self._compute_receiver_routing_index()
+        key = (self.env.cr.dbname, version)
+        index = ROUTING_CACHE.get(key)
+        if index is None:
+            index = self._compute_receiver_routing_index()
+            ROUTING_CACHE.set(key, index)
+        return index
+
+    @api.model
+    def _compute_receiver_routing_index(self):
+        """Map each normalized company VAT to ``(company_id, gateway_id, journal_id)`` of its gateway.
+
+        Only companies with a gateway are routed; a gateway with a journal is preferred.
+        """
+        gateway_by_company = {}
+        for gateway in self.sudo().search([], order="id"):
+            current = gateway_by_company.get(gateway.company_id.id)
+            if not current or (not current.journal_id and gateway.journal_id):
+                gateway_by_company[gateway.company_id.id] = gateway
+
+        move_model = self.env["account.move"]
+        index = {}
+        for company in self.env["res.company"].sudo().browse(list(gateway_by_company)):
+            vat = move_model._normalize_identification(company.vat)
+            if vat:
+                gateway = gateway_by_company[company.id]
+                index.setdefault(vat, (company.id, gateway.id, gateway.journal_id.id or False))
+        return index
+
     @api.model
     def _email_recipients_from_message(self, msg_dict):
         recipient_headers = []
@@ -78,7 +240,7 @@ class SupplierXMLGateway(models.Model):
         gateways = self.search([("company_id", "=", self.env.company.id)])
 
         if recipients:
-            for gateway in gateways:
+            for gateway in self.search([("alias_id", "!=", False)]):
                 alias_contact = (gateway.alias_id.alias_full_name or "").strip().lower() if gateway.alias_id else ""
                 if alias_contact and alias_contact in recipients:
                     return gateway
@@ -123,35 +285,21 @@ class SupplierXMLGateway(models.Model):
         message_id = self._extract_message_id_from_message(msg_dict)
         if not message_id:
             return False, ""
-        duplicate_move = self.env["account.move"].search(
-            [
-                ("supplier_xml_message_id", "=", message_id),
-                ("company_id", "=", company_id),
-                ("move_type", "in", ["in_invoice", "in_refund"]),
-            ],
-            limit=1,
-        )
+        domain = [
+            ("supplier_xml_message_id", "=", message_id),
+            ("move_type", "in", ["in_invoice", "in_refund"]),
+        ]
+        if company_id:
+            domain.append(("company_id", "=", company_id))
+        duplicate_move = self.env["account.move"].search(domain, limit=1)
         return bool(duplicate_move), message_id
 
     @api.model
     def _get_invoice_xml_attachments(self, attachments):
-        xml_candidates = []
         move_model = self.env["account.move"]
-
-        for attachment in attachments or []:
-            if len(attachment) < 2:
-                continue
-            filename, payload = attachment[0], attachment[1]
-            mimetype = attachment[2] if len(attachment) > 2 else False
-            is_xml_name = bool(filename and filename.lower().endswith(".xml"))
-            is_xml_mimetype = mimetype in {"text/xml", "application/xml"}
-            is_zip_name = bool(filename and filename.lower().endswith(".zip"))
-            is_zip_mimetype = mimetype in {"application/zip", "application/x-zip-compressed"}
-            if not is_xml_name and not is_xml_mimetype and not is_zip_name and not is_zip_mimetype:
-                continue
-            xml_candidates.extend(move_model._extract_supported_xml_payloads(payload, filename=filename))
-
-        return xml_candidates
+        return move_model._extract_xml_payloads_from_candidates(
+            move_model._supplier_xml_candidate_attachments(attachments)
+        )
 
     @api.model
     def _attachment_datas(self, payload):
@@ -161,7 +309,10 @@ class SupplierXMLGateway(models.Model):
             return payload.encode()
         return payload
 
-    def _keep_mail_attachments_on_move(self, move, msg_dict):
+    def _keep_mail_attachments_on_move(self, moves, msg_dict):
+        """Store the original mail attachments once, on the first move, and link them to the others."""
+        if not moves:
+            return
         attachment_ids = []
         for attachment in msg_dict.get("attachments", []):
             filename, payload = attachment[0], attachment[1]
@@ -172,17 +323,19 @@ class SupplierXMLGateway(models.Model):
                     "name": filename,
                     "datas": self._attachment_datas(payload),
                     "res_model": "account.move",
-                    "res_id": move.id,
+                    "res_id": moves[0].id,
                     "type": "binary",
+                    "supplier_xml_gateway_id": self.id,
                 }
             )
             attachment_ids.append(ir_attachment.id)
 
         if attachment_ids:
-            move.message_post(
-                body=_("Adjuntos del correo original guardados en la factura."),
-                attachment_ids=attachment_ids,
-            )
+            for move in moves:
+                move.message_post(
+                    body=_("Adjuntos del correo original guardados en la factura."),
+                    attachment_ids=attachment_ids,
+                )
 
     @api.model
     def _parse_email_datetime(self, msg_dict):
@@ -202,13 +355,122 @@ class SupplierXMLGateway(models.Model):
                     continue
         return False
 
+    @api.model
+    def _utc_naive_datetime(self, value):
+        if value and value.tzinfo:
+            return value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+    def _log_import_outcome(self, msg_dict, outcome, reason=False, move=False, filename=False):
+        """Record an incoming email outcome; posting it in the gateway chatter is optional."""
+        self.ensure_one()
+        if outcome == "ignored_date":
+            self.env["supplier.xml.metric"]._inc("supplier_xml_emails_ignored_date_total", gateway=self.id)
+        log = self.env["supplier.xml.import.log"].sudo().create(
+            {
+                "gateway_id": self.id,
+                "company_id": move.company_id.id if move else self.company_id.id,
+                "message_id": self._extract_message_id_from_message(msg_dict) or False,
+                "email_from": msg_dict.get("email_from") or msg_dict.get("from") or False,
+                "email_date": self._utc_naive_datetime(self._parse_email_datetime(msg_dict)),
+                "subject": msg_dict.get("subject") or False,
+                "filename": filename,
+                "outcome": outcome,
+                "reason": reason,
+                "move_id": move.id if move else False,
+            }
+        )
+        if reason and self.post_outcomes_in_chatter and outcome != "discarded":
+            self.message_post(body=reason)
+        return log
+
+    @api.model
+    def _filter_supplier_xml_routes(self, message_dict, routes):
+        """Drop the gateway routes of mail that cannot hold supplier XML before any record or chatter is touched.
+
+        Discarded mail only leaves an import log entry.
+        """
+        kept_routes = []
+        for route in routes:
+            model, thread_id, alias = route[0], route[1], route[4] if len(route) > 4 else False
+            gateway = self.browse()
+            if model == self._name:
+                gateway_id = thread_id or (alias and alias.alias_force_thread_id)
+                if gateway_id:
+                    gateway = self.sudo().browse(gateway_id).exists()
+            reason = gateway._pre_route_rejection(message_dict) if gateway else False
+            if reason:
+                gateway._log_import_outcome(message_dict, "discarded", reason=reason)
+                continue
+            kept_routes.append(route)
+        return kept_routes
+
+    def _pre_route_rejection(self, message_dict):
+        """Cheap checks on sender and attachments; return the discard reason or ``False``.
+
+        Oversized XML/ZIP attachments are removed from ``message_dict``.
+        """
+        self.ensure_one()
+        senders = [address.strip().lower() for _name, address in getaddresses([message_dict.get("email_from") or ""])]
+        sender = next((address for address in senders if address), "")
+        if self._sender_in_list(sender, self.sender_denylist):
+            return _("Correo descartado: remitente bloqueado (%s).") % sender
+        if self.sender_allowlist and not self._sender_in_list(sender, self.sender_allowlist):
+            return _("Correo descartado: remitente no permitido (%s).") % sender
+
+        attachments = message_dict.get("attachments") or []
+        candidates = self.env["account.move"]._supplier_xml_candidate_attachments(attachments)
+        if not candidates:
+            return _("Correo descartado: no contiene adjuntos XML o ZIP.")
+        if self.max_attachment_size_mb > 0:
+            max_size = self.max_attachment_size_mb * 1024 * 1024
+            oversized = {
+                filename for filename, payload in candidates if payload is not None and len(payload) > max_size
+            }
+            if len(oversized) == len(candidates):
+                return _("Correo descartado: los adjuntos XML o ZIP superan %s MB.") % self.max_attachment_size_mb
+            if oversized:
+                message_dict["attachments"] = [
+                    attachment
+                    for attachment in attachments
+                    if not (
+                        isinstance(attachment, (list, tuple))
+                        and attachment[0] in oversized
+                        and len(attachment[1] or b"") > max_size
+                    )
+                ]
+        return False
+
+    @api.model
+    def _sender_in_list(self, sender, entries):
+        if not sender:
+            return False
+        for entry in (entries or "").replace(",", "\n").splitlines():
+            entry = entry.strip().lower()
+            if not entry:
+                continue
+            if "@" not in entry:
+                entry = "@" + entry
+            if sender == entry or (entry.startswith("@") and sender.endswith(entry)):
+                return True
+        return False
+
     def _process_supplier_email(self, msg_dict):
+        """Import the supplier XML of an email and record every outcome in the import log.
+
+        Rejections are logged instead of raised, so the mail gateway keeps the log rows.
+        """
         self.ensure_one()
 
-        is_duplicate_message, message_id = self._is_duplicate_supplier_email(msg_dict, self.company_id.id)
+        is_duplicate_message, message_id = self._is_duplicate_supplier_email(
+            msg_dict, False if self.route_by_receiver else self.company_id.id
+        )
         if is_duplicate_message:
-            self.message_post(
-                body=_("Correo omitido: Message-ID ya procesado previamente (%s).") % message_id
+            self.env["supplier.xml.metric"]._inc("supplier_xml_documents_duplicate_total", gateway=self.id)
+            self._log_import_outcome(
+                msg_dict,
+                "duplicate",
+                _("Correo omitido: Message-ID ya procesado previamente (%s).") % message_id,
             )
             return
 
@@ -216,23 +478,25 @@ class SupplierXMLGateway(models.Model):
         if process_from_datetime or process_to_datetime:
             email_datetime = self._parse_email_datetime(msg_dict)
             if email_datetime and process_from_datetime and email_datetime < process_from_datetime:
-                self.message_post(
-                    body=_(
-                        "Correo ignorado por fecha (%s). Solo se procesan correos desde %s."
-                    )
+                self._log_import_outcome(
+                    msg_dict,
+                    "ignored_date",
+                    _("Correo ignorado por fecha (%s). Solo se procesan correos desde %s.")
                     % (
                         fields.Datetime.to_string(email_datetime),
                         fields.Datetime.to_string(process_from_datetime),
-                    )
+                    ),
                 )
                 return
             if email_datetime and process_to_datetime and email_datetime > process_to_datetime:
-                self.message_post(
-                    body=_("Correo ignorado por fecha (%s). Solo se procesan correos hasta %s.")
+                self._log_import_outcome(
+                    msg_dict,
+                    "ignored_date",
+                    _("Correo ignorado por fecha (%s). Solo se procesan correos hasta %s.")
                     % (
                         fields.Datetime.to_string(email_datetime),
                         fields.Datetime.to_string(process_to_datetime),
-                    )
+                    ),
                 )
                 return
             if not email_datetime:
@@ -241,41 +505,60 @@ class SupplierXMLGateway(models.Model):
                     configured_range.append(_("desde %s") % fields.Datetime.to_string(process_from_datetime))
                 if process_to_datetime:
                     configured_range.append(_("hasta %s") % fields.Datetime.to_string(process_to_datetime))
-                self.message_post(
-                    body=_(
+                self._log_import_outcome(
+                    msg_dict,
+                    "ignored_date",
+                    _(
                         "Correo ignorado: no se pudo determinar la fecha del mensaje y existe una fecha "
                         "de procesamiento configurada (%s)."
                     )
-                    % " ".join(configured_range)
+                    % " ".join(configured_range),
                 )
                 return
 
         xml_attachments = self._get_invoice_xml_attachments(msg_dict.get("attachments", []))
         if not xml_attachments:
-            raise UserError(_("El correo no contiene XML de factura o nota de crédito para procesar."))
+            self._log_import_outcome(
+                msg_dict,
+                "rejected",
+                _("El correo no contiene XML de factura o nota de crédito para procesar."),
+            )
+            return
 
-        move = False
-        for filename, payload in xml_attachments:
-            try:
-                move = self.env["account.move"].create_from_supplier_xml(
-                    xml_content=payload,
-                    journal_id=self.journal_id.id or None,
-                    company_id=self.company_id.id,
-                    filename=filename,
-                    supplier_xml_gateway_id=self.id,
+        results = self.env["account.move"]._create_from_supplier_xml_documents(
+            xml_attachments,
+            journal_id=self.journal_id.id or None,
+            company_id=self.company_id.id,
+            supplier_xml_gateway_id=self.id,
+            route_by_receiver=self.route_by_receiver,
+            defer_name=self.defer_move_name,
+        )
+        moves = self.env["account.move"].browse(
+            [result["move"].id for result in results if result["outcome"] == "imported"]
+        )
+        for result in results:
+            if result["rejection"]:
+                self.env["supplier.xml.metric"]._inc(
+                    "supplier_xml_documents_rejected_total", gateway=self.id, reason=result["rejection"]
                 )
-                break
-            except UserError:
-                continue
-
-        if not move:
-            raise UserError(_("No se encontró un XML de factura o nota de crédito válido en el correo."))
-
-        if message_id:
-            move.write({"supplier_xml_message_id": message_id})
-
-        self._keep_mail_attachments_on_move(move, msg_dict)
-        move.message_post(body=_("Factura creada automáticamente desde correo: %s") % (msg_dict.get("subject") or ""))
+        if moves:
+            if message_id:
+                moves.write({"supplier_xml_message_id": message_id})
+            for gateway, gateway_moves in moves.grouped("supplier_xml_gateway_id").items():
+                gateway._filter_auto_post_moves(gateway_moves).write({"supplier_xml_auto_post_pending": True})
+            self._keep_mail_attachments_on_move(moves, msg_dict)
+            for move in moves:
+                move.message_post(
+                    body=_("Factura creada automáticamente desde correo: %s") % (msg_dict.get("subject") or "")
+                )
+        for result in results:
+            self._log_import_outcome(
+                msg_dict,
+                result["outcome"],
+                reason=result["reason"],
+                move=result["move"],
+                filename=result["filename"],
+            )
 
     @api.model
     def message_new(self, msg_dict, custom_values=None):
@@ -291,15 +574,334 @@ class SupplierXMLGateway(models.Model):
             gateway._process_supplier_email(msg_dict)
         return result
 
-    def action_process_incoming_emails(self):
+    @api.model
+    def _cron_apply_retention_policies(self):
+        gateways = self.search(
+            [
+                "|",
+                "|",
+                ("chatter_retention_days", ">", 0),
+                ("attachment_retention_days", ">", 0),
+                ("log_retention_days", ">", 0),
+            ]
+        )
+        for gateway in gateways:
+            if not gateway._apply_retention_policies():
+                break
+
+    def _apply_retention_policies(self):
+        """Purge old gateway chatter, mail attachments and import logs.
+
+        Returns False when the cron time budget is exhausted so the caller stops.
+        """
         self.ensure_one()
-        raise UserError(
-            _(
-                "Odoo 19 ya no incluye el recolector fetchmail para ejecutar una revisión manual. "
-                "Use el alias del buzón y el enrutamiento de correo entrante configurado en Ajustes > Técnico > Correo."
+        now = fields.Datetime.now()
+        if self.chatter_retention_days > 0:
+            domain = [
+                ("model", "=", self._name),
+                ("res_id", "=", self.id),
+                ("date", "<", now - timedelta(days=self.chatter_retention_days)),
+            ]
+            if not self._unlink_in_batches("mail.message", domain):
+                return False
+        if self.attachment_retention_days > 0:
+            posted_moves = self.env["account.move"].sudo()._search([("state", "=", "posted")])
+            domain = [
+                ("supplier_xml_gateway_id", "=", self.id),
+                ("id", "not in", self._attachments_linked_to_unposted_moves()),
+                ("res_model", "=", "account.move"),
+                ("res_id", "in", posted_moves),
+                ("create_date", "<", now - timedelta(days=self.attachment_retention_days)),
+                ("mimetype", "not in", RETAINED_ATTACHMENT_MIMETYPES),
+                "!",
+                ("name", "=ilike", "%.xml"),
+                "!",
+                ("name", "=ilike", "%.pdf"),
+            ]
+            if not self._unlink_in_batches("ir.attachment", domain):
+                return False
+        if self.log_retention_days > 0:
+            domain = [
+                ("gateway_id", "=", self.id),
+                ("create_date", "<", now - timedelta(days=self.log_retention_days)),
+            ]
+            if not self._unlink_in_batches("supplier.xml.import.log", domain):
+                return False
+        return True
+
+    def _attachments_linked_to_unposted_moves(self):
+        """Ids of this gateway's mail attachments still shared with a move that is not posted."""
+        self.ensure_one()
+        self.env["ir.attachment"].flush_model(["supplier_xml_gateway_id"])
+        self.env["mail.message"].flush_model(["model", "res_id", "attachment_ids"])
+        self.env["account.move"].flush_model(["state"])
+        self.env.cr.execute(
+            """
+            SELECT DISTINCT rel.attachment_id
+              FROM message_attachment_rel rel
+              JOIN ir_attachment attachment ON attachment.id = rel.attachment_id
+              JOIN mail_message message ON message.id = rel.message_id AND message.model = 'account.move'
+              JOIN account_move move ON move.id = message.res_id
+             WHERE attachment.supplier_xml_gateway_id = %s
+               AND move.state != 'posted'
+            """,
+            [self.id],
+        )
+        return [row[0] for row in self.env.cr.fetchall()]
+
+    def _filter_auto_post_moves(self, moves):
+        """Return the imported ``moves`` that meet this gateway's auto-post criteria."""
+        self.ensure_one()
+        if self.auto_post_policy != "criteria":
+            return moves.browse()
+        return moves.filtered(
+            lambda move: move.state == "draft"
+            and not move.supplier_xml_duplicate_of_id
+            and (not self.auto_post_require_totals or move.supplier_xml_totals_state == "matched")
+            and (not self.auto_post_require_taxes or move.supplier_xml_taxes_mapped)
+            and (not self.auto_post_require_signature or move.supplier_xml_signature_state == "valid")
+            and (
+                not self.auto_post_partner_ids
+                or move.partner_id.commercial_partner_id in self.auto_post_partner_ids
+                or move.partner_id in self.auto_post_partner_ids
             )
         )
 
+    @api.model
+    def _cron_auto_post_supplier_moves(self):
+        """Post the pending imported moves in chunks; a failed chunk is retried one move at a time."""
+        move_model = self.env["account.move"].sudo()
+        move_model.search(
+            [("supplier_xml_auto_post_pending", "=", True), ("state", "!=", "draft")]
+        ).write({"supplier_xml_auto_post_pending": False})
+        while True:
+            moves = move_model.search(
+                [("supplier_xml_auto_post_pending", "=", True), ("state", "=", "draft")],
+                limit=AUTO_POST_BATCH_SIZE,
+                order="id",
+            )
+            if not moves:
+                return
+            try:
+                with self.env.cr.savepoint():
+                    moves.action_post()
+            except UserError:
+                for move in moves:
+                    try:
+                        with self.env.cr.savepoint():
+                            move.action_post()
+                    except UserError as error:
+                        move.message_post(body=_("No se pudo publicar automáticamente: %s") % error)
+            moves.write({"supplier_xml_auto_post_pending": False})
+            if not self._cron_checkpoint(len(moves)):
+                return
+
+    @api.model
+    def _cron_poll_imap(self):
+        for gateway in self.search([("imap_host", "!=", False), ("imap_use_idle", "=", False)]):
+            try:
+                gateway._poll_imap(checkpoint=True)
+            except UserError as error:
+                _logger.warning("Supplier XML gateway %s: IMAP poll failed: %s", gateway.id, error)
+            except Exception:
+                self.env.cr.rollback()
+                _logger.exception("Supplier XML gateway %s: IMAP poll failed", gateway.id)
+
+    @api.model
+    def _cron_idle_imap(self):
+        """Import new mail of the IDLE gateways as soon as the server announces it, within the cron budget."""
+        gateways = self.search([("imap_host", "!=", False), ("imap_use_idle", "=", True)])
+        deadline = time.monotonic() + IMAP_IDLE_BUDGET
+        pending = gateways
+        while gateways:
+            for gateway in pending:
+                try:
+                    gateway._poll_imap(checkpoint=True)
+                except UserError as error:
+                    _logger.warning("Supplier XML gateway %s: IMAP poll failed: %s", gateway.id, error)
+                    gateways -= gateway
+                except Exception:
+                    self.env.cr.rollback()
+                    _logger.exception("Supplier XML gateway %s: IMAP poll failed", gateway.id)
+                    gateways -= gateway
+            remaining = deadline - time.monotonic()
+            if not gateways or remaining < 1 or not self._cron_checkpoint(0):
+                return
+            try:
+                pending = gateways._imap_idle(remaining)
+            except UserError as error:
+                _logger.warning("Supplier XML gateways %s: IMAP IDLE failed: %s", gateways.ids, error)
+                return
+
+    def _imap_connect(self):
+        self.ensure_one()
+        gateway = self.sudo()
+        if gateway.imap_ssl:
+            connection = imaplib.IMAP4_SSL(gateway.imap_host, gateway.imap_port or 993, timeout=IMAP_TIMEOUT)
+        else:
+            connection = imaplib.IMAP4(gateway.imap_host, gateway.imap_port or 143, timeout=IMAP_TIMEOUT)
+        connection.login(gateway.imap_user or "", gateway.imap_password or "")
+        return connection
+
+    def _imap_session(self, connection_factory=None):
+        """Context manager yielding an authenticated connection, reused from the process pool.
+
+        ``connection_factory`` takes the gateway and returns an ``imaplib.IMAP4``-like connection (a local
+        stand-in in tests); such connections are not pooled.
+        """
+        self.ensure_one()
+        if connection_factory:
+            return imap.single_session(lambda: connection_factory(self))
+        return IMAP_POOL.session(
+            (self.env.cr.dbname, self.id, self.imap_host, self.imap_port, self.imap_user),
+            (self.imap_host, self.imap_port),
+            self._imap_connect,
+        )
+
+    def _poll_imap(self, connection_factory=None, checkpoint=False):
+        """Import the messages received in the IMAP folder since the stored UID watermark.
+
+        The server filters by UID and by the configured date range (``SEARCH SINCE/BEFORE``) and only
+        the XML/ZIP parts listed in ``BODYSTRUCTURE`` are downloaded. Returns the number of messages
+        processed.
+        """
+        self.ensure_one()
+        try:
+            with self._imap_session(connection_factory) as connection:
+                return self._poll_imap_connection(connection, checkpoint=checkpoint)
+        except IMAP_ERRORS as error:
+            raise UserError(_("Error al leer el buzón IMAP %s: %s") % (self.imap_host, error)) from error
+
+    def _poll_imap_connection(self, connection, checkpoint=False):
+        processed = 0
+        uidvalidity = str(imap.select_folder(connection, self.imap_folder or "INBOX"))
+        last_uid = int(self.imap_last_uid or 0) if self.imap_uidvalidity == uidvalidity else 0
+        process_from_datetime, process_to_datetime = self._get_global_process_emails_date_range()
+        uids = imap.search_new_uids(
+            connection,
+            last_uid,
+            since=process_from_datetime and process_from_datetime.date(),
+            before=process_to_datetime and (process_to_datetime + timedelta(days=1)).date(),
+        )
+        for uid in uids[:IMAP_POLL_BATCH_SIZE]:
+            header, attachments = imap.fetch_message(connection, uid)
+            msg_dict = {}
+            try:
+                with self.env["supplier.xml.metric"]._savepoint():
+                    msg_dict = self._imap_msg_dict(header, attachments)
+                    discard_reason = self._pre_route_rejection(msg_dict)
+                    if discard_reason:
+                        self._log_import_outcome(msg_dict, "discarded", reason=discard_reason)
+                    else:
+                        self._process_supplier_email(msg_dict)
+            except UserError as error:
+                self._log_import_outcome(msg_dict, "rejected", reason=str(error))
+            except Exception as error:
+                # A message that cannot be imported must not block the mailbox: log it and move past its UID.
+                _logger.exception("Supplier XML gateway %s: IMAP message UID %s failed", self.id, uid)
+                self._log_import_outcome(msg_dict, "rejected", reason=_("Error inesperado: %s") % error)
+            self.write({"imap_uidvalidity": uidvalidity, "imap_last_uid": str(uid)})
+            processed += 1
+            if checkpoint and not self._cron_checkpoint(1):
+                break
+        self.imap_last_poll = fields.Datetime.now()
+        return processed
+
+    def _imap_idle(self, timeout):
+        """Wait in IDLE on the pooled sessions of these gateways; return the gateways that received mail."""
+        try:
+            with contextlib.ExitStack() as stack:
+                connections = {}
+                for gateway in self:
+                    try:
+                        connections[gateway.id] = stack.enter_context(gateway._imap_session())
+                    except imap.IMAPUnavailable as error:
+                        _logger.info("Supplier XML gateway %s: no IMAP session for IDLE: %s", gateway.id, error)
+                for gateway in self.filtered(lambda gateway: gateway.id in connections):
+                    imap.select_folder(connections[gateway.id], gateway.imap_folder or "INBOX")
+                changed = imap.idle_wait(connections, timeout)
+        except IMAP_ERRORS as error:
+            raise UserError(_("Error en IMAP IDLE: %s") % error) from error
+        return self.browse(changed)
+
+    @api.model
+    def _imap_msg_dict(self, header, attachments):
+        headers = BytesHeaderParser(policy=policy.default).parsebytes(header)
+        email_date = False
+        if headers.get("Date"):
+            try:
+                email_date = fields.Datetime.to_string(
+                    self._utc_naive_datetime(parsedate_to_datetime(str(headers["Date"])))
+                )
+            except (TypeError, ValueError):
+                email_date = False
+        return {
+            "message_id": str(headers.get("Message-ID") or "").strip(),
+            "subject": str(headers.get("Subject") or ""),
+            "email_from": str(headers.get("From") or ""),
+            "to": str(headers.get("To") or ""),
+            "cc": str(headers.get("Cc") or ""),
+            "date": email_date,
+            "attachments": attachments,
+        }
+
+    @api.model
+    def _unlink_in_batches(self, model_name, domain):
+        """Delete matching records in small committed batches to avoid long locks."""
+        model = self.env[model_name].sudo()
+        while True:
+            records = model.search(domain, limit=RETENTION_BATCH_SIZE, order="id")
+            if not records:
+                return True
+            records.unlink()
+            if not self._cron_checkpoint(len(records)):
+                return False
+
+    @api.model
+    def _cron_checkpoint(self, processed):
+        cron = self.env["ir.cron"]
+        if hasattr(cron, "_commit_progress"):
+            return bool(cron._commit_progress(processed))
+        if hasattr(cron, "_notify_progress"):
+            cron._notify_progress(done=processed, remaining=0)
+        self.env.cr.commit()
+        return True
+
+    def action_process_incoming_emails(self):
+        self.ensure_one()
+        if not self.imap_host:
+            raise UserError(
+                _(
+                    "Odoo 19 ya no incluye el recolector fetchmail para ejecutar una revisión manual. "
+                    "Configure el servidor IMAP del buzón o use el alias del buzón y el enrutamiento de correo "
+                    "entrante configurado en Ajustes > Técnico > Correo."
+                )
+            )
+        processed = self._poll_imap()
+        return {
+            "type": "ir.actions.client",
+            "tag": "display_notification",
+            "params": {
+                "title": _("Búsqueda completada"),
+                "message": _(
+                    "Se procesaron %(count)s correos nuevos del buzón %(name)s.", count=processed, name=self.name
+                ),
+                "type": "success",
+                "sticky": False,
+            },
+        }
+
+    def action_view_import_logs(self):
+        self.ensure_one()
+        return {
+            "name": _("Registro de importación"),
+            "type": "ir.actions.act_window",
+            "res_model": "supplier.xml.import.log",
+            "view_mode": "list,form",
+            "domain": [("gateway_id", "=", self.id)],
+            "context": {"search_default_group_outcome": 1},
+        }
+
     def action_view_received_moves(self):
         self.ensure_one()
         return {
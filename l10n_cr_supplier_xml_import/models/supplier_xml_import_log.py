@@ -0,0 +1,32 @@
+from odoo import fields, models
+
+
+class SupplierXMLImportLog(models.Model):
+    _name = "supplier.xml.import.log"
+    _description = "Registro de importación de XML de proveedor"
+    _order = "id desc"
+    _rec_name = "message_id"
+
+    gateway_id = fields.Many2one("supplier.xml.gateway", string="Buzón", ondelete="cascade", index=True, readonly=True)
+    company_id = fields.Many2one("res.company", string="Compañía", index=True, readonly=True)
+    message_id = fields.Char(string="Message-ID", index=True, readonly=True)
+    email_from = fields.Char(string="Remitente", index=True, readonly=True)
+    email_date = fields.Datetime(string="Fecha del correo", index=True, readonly=True)
+    subject = fields.Char(string="Asunto", readonly=True)
+    filename = fields.Char(string="Archivo", readonly=True)
+    outcome = fields.Selection(
+        [
+            ("imported", "Importado"),
+            ("duplicate", "Duplicado"),
+            ("ignored_date", "Ignorado por fecha"),
+            ("rejected", "Rechazado"),
+            ("discarded", "Descartado"),
+            ("limit_exceeded", "Límite de XML excedido"),
+        ],
+        string="Resultado",
+        required=True,
+        index=True,
+        readonly=True,
+    )
+    reason = fields.Char(string="Motivo", readonly=True)
+    move_id = fields.Many2one("account.move", string="Factura", ondelete="set null", index=True, readonly=True)
@@ -0,0 +1,87 @@
+import contextlib
+import logging
+
+from odoo import api, fields, models
+
+from ..tools import metrics
+
+_logger = logging.getLogger(__name__)
+
+METRICS_BUFFER = "supplier_xml_metrics"
+
+
+class SupplierXMLMetric(models.Model):
+    _name = "supplier.xml.metric"
+    _description = "Métrica de importación de XML de proveedor"
+    _log_access = False
+
+    name = fields.Char(required=True)
+    labels = fields.Char(required=True, default="")
+    value = fields.Float(required=True, default=0.0)
+
+    _name_labels_uniq = models.Constraint("UNIQUE(name, labels)", "Cada serie de métricas debe ser única.")
+
+    @api.model
+    def _inc(self, name, value=1.0, **labels):
+        self._transaction_metrics().append((metrics.inc, name, value, labels))
+
+    @api.model
+    def _observe(self, name, seconds, **labels):
+        self._transaction_metrics().append((metrics.observe, name, seconds, labels))
+
+    @api.model
+    def _transaction_metrics(self):
+        """Metrics recorded in the current transaction; they are counted and flushed only once it commits."""
+        data = self.env.cr.postcommit.data
+        if METRICS_BUFFER not in data:
+            recorded = data[METRICS_BUFFER] = []
+            dbname = self.env.cr.dbname
+
+            def count():
+                for record, name, value, labels in recorded:
+                    record(dbname, name, value, **labels)
+                self._flush_pending_metrics()
+
+            self.env.cr.postcommit.add(count)
+        return data[METRICS_BUFFER]
+
+    @contextlib.contextmanager
+    def _savepoint(self):
+        """Savepoint that also discards the metrics recorded inside it when it rolls back."""
+        recorded = self._transaction_metrics()
+        mark = len(recorded)
+        try:
+            with self.env.cr.savepoint():
+                yield
+        except BaseException:
+            del recorded[mark:]
+            raise
+
+    @api.model
+    def _flush_pending_metrics(self):
+        """Add this worker's pending deltas to the shared table in an independent transaction."""
+        dbname = self.env.cr.dbname
+        deltas = metrics.drain(dbname)
+        if not deltas:
+            return
+        params = [param for delta in deltas for param in delta]
+        try:
+            with self.env.registry.cursor() as cr:
+                cr.execute(
+                    """
+                    INSERT INTO supplier_xml_metric (name, labels, value)
+                    VALUES {}
+                    ON CONFLICT (name, labels)
+                    DO UPDATE SET value = supplier_xml_metric.value + EXCLUDED.value
+                    """.format(", ".join(["(%s, %s, %s)"] * len(deltas))),
+                    params,
+                )
+        except Exception:
+            _logger.warning("No se pudieron guardar las métricas de importación XML.", exc_info=True)
+            metrics.restore(dbname, deltas)
+
+    @api.model
+    def _render_metrics(self):
+        self._flush_pending_metrics()
+        self.env.cr.execute("SELECT name, labels, value FROM supplier_xml_metric")
+        return metrics.render(self.env.cr.fetchall())
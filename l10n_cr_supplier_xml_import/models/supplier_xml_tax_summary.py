@@ -0,0 +1,27 @@
+from odoo import fields, models
+
+
+class SupplierXMLTaxSummary(models.Model):
+    _name = "supplier.xml.tax.summary"
+    _description = "Resumen de IVA de XML de proveedor"
+    _order = "date desc, move_id, id"
+
+    move_id = fields.Many2one("account.move", string="Factura", required=True, ondelete="cascade", index=True)
+    company_id = fields.Many2one(related="move_id.company_id", store=True, string="Compañía")
+    partner_id = fields.Many2one(related="move_id.partner_id", store=True, string="Proveedor")
+    move_type = fields.Selection(related="move_id.move_type", store=True, string="Tipo")
+    state = fields.Selection(related="move_id.state", store=True, string="Estado")
+    date = fields.Date(related="move_id.invoice_date", store=True, string="Fecha")
+    currency_id = fields.Many2one(related="company_id.currency_id", store=True, string="Moneda")
+    tax_code = fields.Char(
+        string="Código de impuesto", help="Impuesto/Codigo del XML; vacío en líneas sin impuesto."
+    )
+    rate_code = fields.Char(string="Código de tarifa IVA", help="Impuesto/CodigoTarifaIVA del XML.")
+    rate = fields.Float(string="Tarifa (%)", digits=(16, 4), aggregator=False)
+    other_charge_type = fields.Char(string="Tipo de otro cargo", help="OtrosCargos/TipoDocumentoOC del XML.")
+    base_amount = fields.Monetary(string="Base")
+    tax_amount = fields.Monetary(string="Impuesto", help="Monto del impuesto menos la exoneración.")
+    exonerated_amount = fields.Monetary(string="Exonerado")
+    other_charges_amount = fields.Monetary(string="Otros cargos")
+
+    _company_date_idx = models.Index("(company_id, date)")
@@ -0,0 +1,21 @@
+from . import test_account_rules
+from . import test_attachment_extraction
+from . import test_auto_post
+from . import test_currency_rates
+from . import test_deferred_naming
+from . import test_fallback_duplicates
+from . import test_fast_path
+from . import test_imap_idle
+from . import test_imap_poll
+from . import test_import_log
+from . import test_metrics
+from . import test_multi_document
+from . import test_pre_route_filter
+from . import test_product_match
+from . import test_receiver_routing
+from . import test_retention
+from . import test_safe_xml
+from . import test_tax_summary
+from . import test_totals
+from . import test_xades
+from . import test_xsd
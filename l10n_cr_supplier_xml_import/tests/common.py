@@ -0,0 +1,144 @@
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+
+RECEIVER_VAT = "3101999999"
+ISSUER_VAT = "3101123456"
+NAMESPACE = "https://cdn.comprobanteselectronicos.go.cr/xml-schemas/v4.4/%s"
+
+
+def _amount(value):
+    return "%.5f" % value
+
+
+def supplier_xml(
+    number=1,
+    lines=None,
+    root="FacturaElectronica",
+    issuer=ISSUER_VAT,
+    receiver=RECEIVER_VAT,
+    currency=None,
+    exchange_rate=None,
+    date="2024-07-01",
+    total_tax=None,
+    issuer_name="Proveedor XML S.A.",
+):
+    """Return a supplier document as bytes.
+
+    ``lines`` are dicts with ``quantity``, ``price``, ``rate`` (``None`` for a line without tax),
+    ``exonerated`` and ``code`` (``CodigoComercial``). The summary totals are computed from the lines;
+    ``total_tax`` overrides ``TotalImpuesto`` and ``TotalComprobante`` follows it.
+    """
+    lines = lines if lines is not None else [{"quantity": 1, "price": 100.0, "rate": 13.0}]
+    line_xml = []
+    total_sale = total_net_tax = 0.0
+    for index, line in enumerate(lines, start=1):
+        subtotal = line.get("quantity", 1) * line["price"]
+        total_sale += subtotal
+        tax_xml = ""
+        net_tax = 0.0
+        if line.get("rate") is not None:
+            tax = round(subtotal * line["rate"] / 100, 5)
+            exonerated = line.get("exonerated", 0.0)
+            net_tax = tax - exonerated
+            tax_xml = (
+                "<Impuesto><Codigo>01</Codigo><CodigoTarifaIVA>08</CodigoTarifaIVA><Tarifa>%s</Tarifa>"
+                "<Monto>%s</Monto>%s</Impuesto><ImpuestoNeto>%s</ImpuestoNeto>"
+                % (
+                    _amount(line["rate"]),
+                    _amount(tax),
+                    "<Exoneracion><MontoExoneracion>%s</MontoExoneracion></Exoneracion>" % _amount(exonerated)
+                    if exonerated
+                    else "",
+                    _amount(net_tax),
+                )
+            )
+        total_net_tax += net_tax
+        code_xml = (
+            "<CodigoComercial><Tipo>01</Tipo><Codigo>%s</Codigo></CodigoComercial>" % line["code"]
+            if line.get("code")
+            else ""
+        )
+        line_xml.append(
+            "<LineaDetalle><NumeroLinea>%d</NumeroLinea>%s<Cantidad>%s</Cantidad><Detalle>Servicio %d</Detalle>"
+            "<PrecioUnitario>%s</PrecioUnitario><MontoTotal>%s</MontoTotal><SubTotal>%s</SubTotal>%s"
+            "<MontoTotalLinea>%s</MontoTotalLinea></LineaDetalle>"
+            % (
+                index,
+                code_xml,
+                _amount(line.get("quantity", 1)),
+                index,
+                _amount(line["price"]),
+                _amount(subtotal),
+                _amount(subtotal),
+                tax_xml,
+                _amount(subtotal + net_tax),
+            )
+        )
+    total_tax = total_net_tax if total_tax is None else total_tax
+    currency_xml = ""
+    if currency:
+        currency_xml = "<CodigoTipoMoneda><CodigoMoneda>%s</CodigoMoneda>%s</CodigoTipoMoneda>" % (
+            currency,
+            "<TipoCambio>%s</TipoCambio>" % _amount(exchange_rate) if exchange_rate else "",
+        )
+    document = (
+        '<?xml version="1.0" encoding="utf-8"?>'
+        '<{root} xmlns="{namespace}">'
+        "<Clave>506{key:047d}</Clave>"
+        "<NumeroConsecutivo>0010000101{number:010d}</NumeroConsecutivo>"
+        "<FechaEmision>{date}T10:00:00-06:00</FechaEmision>"
+        "<Emisor><Nombre>{issuer_name}</Nombre><Identificacion><Tipo>02</Tipo><Numero>{issuer}</Numero>"
+        "</Identificacion></Emisor>"
+        "<Receptor><Nombre>Receptor</Nombre><Identificacion><Tipo>02</Tipo><Numero>{receiver}</Numero>"
+        "</Identificacion></Receptor>"
+        "<DetalleServicio>{lines}</DetalleServicio>"
+        "<ResumenFactura>{currency}<TotalVenta>{sale}</TotalVenta><TotalDescuentos>0.00000</TotalDescuentos>"
+        "<TotalImpuesto>{tax}</TotalImpuesto><TotalComprobante>{total}</TotalComprobante></ResumenFactura>"
+        "</{root}>"
+    ).format(
+        root=root,
+        namespace=NAMESPACE % (root[0].lower() + root[1:]),
+        key=int(issuer) * 10**9 + number,
+        number=number,
+        date=date,
+        issuer_name=issuer_name,
+        issuer=issuer,
+        receiver=receiver,
+        lines="".join(line_xml),
+        currency=currency_xml,
+        sale=_amount(total_sale),
+        tax=_amount(total_tax),
+        total=_amount(total_sale + total_tax),
+    )
+    return document.encode()
+
+
+class SupplierXMLCommon(AccountTestInvoicingCommon):
+    """Company with the receiver VAT, a purchase journal and a 13% purchase tax to import supplier XML."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.company = cls.company_data["company"]
+        cls.company.vat = RECEIVER_VAT
+        cls.purchase_journal = cls.company_data["default_journal_purchase"]
+        cls.iva_13 = cls.env["account.tax"].create(
+            {
+                "name": "IVA 13% compras",
+                "amount_type": "percent",
+                "amount": 13.0,
+                "type_tax_use": "purchase",
+                "company_id": cls.company.id,
+            }
+        )
+
+    def set_param(self, name, value):
+        self.env["ir.config_parameter"].sudo().set_param("l10n_cr_supplier_xml_import.%s" % name, value)
+
+    def import_xml(self, xml_content, **kwargs):
+        kwargs.setdefault("company_id", self.company.id)
+        kwargs.setdefault("journal_id", self.purchase_journal.id)
+        return self.env["account.move"].create_from_supplier_xml(xml_content, **kwargs)
+
+    def import_documents(self, documents, **kwargs):
+        kwargs.setdefault("company_id", self.company.id)
+        return self.env["account.move"]._create_from_supplier_xml_documents(documents, **kwargs)
@@ -0,0 +1,51 @@
+from lxml import etree
+
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+
+from .common import ISSUER_VAT, SupplierXMLCommon, supplier_xml
+
+
+@tagged("post_install", "-at_install")
+class TestSupplierXMLAccountRules(SupplierXMLCommon):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.supplier = cls.env["res.partner"].create(
+            {"name": "Proveedor XML S.A.", "vat": ISSUER_VAT, "is_company": True}
+        )
+        cls.contact = cls.env["res.partner"].create({"name": "Facturación", "parent_id": cls.supplier.id})
+        cls.rule_account = cls.env["account.account"].create(
+            {"name": "Gasto por regla XML", "code": "600901", "account_type": "expense", "company_ids": cls.company.ids}
+        )
+        cls.other_rule_account = cls.env["account.account"].create(
+            {"name": "Otro gasto XML", "code": "600902", "account_type": "expense", "company_ids": cls.company.ids}
+        )
+
+    def _line_accounts(self, partner):
+        root = etree.fromstring(supplier_xml())
+        lines = self.env["account.move"]._build_invoice_lines(root, self.company, partner=partner)
+        return [vals["account_id"] for _command, _id, vals in lines]
+
+    def _create_rule(self, **vals):
+        return self.env["supplier.xml.account.rule"].create(
+            {"company_id": self.company.id, "account_id": self.rule_account.id, **vals}
+        )
+
+    def test_supplier_rule_applies_to_its_contacts(self):
+        self._create_rule(partner_id=self.supplier.id)
+        self.assertEqual(self._line_accounts(self.contact), [self.rule_account.id])
+        self.assertEqual(self._line_accounts(self.supplier), [self.rule_account.id])
+
+    def test_rule_changes_apply_at_once(self):
+        rule = self._create_rule()
+        self.assertEqual(self._line_accounts(self.supplier), [self.rule_account.id])
+        rule.account_id = self.other_rule_account
+        self.assertEqual(self._line_accounts(self.supplier), [self.other_rule_account.id])
+        rule.unlink()
+        self.assertNotIn(self.other_rule_account.id, self._line_accounts(self.supplier))
+
+    def test_rule_account_must_belong_to_the_company(self):
+        other_company_data = self.setup_other_company()
+        with self.assertRaises(UserError):
+            self._create_rule(account_id=other_company_data["default_account_expense"].id)
@@ -0,0 +1,59 @@
+import base64
+import io
+import zipfile
+
+from odoo.tests import tagged
+
+from .common import SupplierXMLCommon, supplier_xml
+
+MB = 1024 * 1024
+
+
+def _zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as zip_file:
+        for name, content in members:
+            zip_file.writestr(name, content)
+    return buffer.getvalue()
+
+
+def _padded_xml(number, size):
+    document = supplier_xml(number=number)
+    return document.replace(b"<Clave>", b" " * size + b"<Clave>", 1)
+
+
+@tagged("post_install", "-at_install")
+class TestSupplierXMLAttachmentExtraction(SupplierXMLCommon):
+    def test_several_attachments_keep_their_order(self):
+        candidates = [
+            ("factura-1.xml", supplier_xml(number=1)),
+            (
+                "facturas.zip",
+                _zip([("factura-2.xml", supplier_xml(number=2)), ("factura-3.xml", supplier_xml(number=3))]),
+            ),
+            ("factura-4.xml", base64.b64encode(supplier_xml(number=4))),
+            ("respuesta.xml", b'<MensajeHacienda xmlns="x"><Clave>1</Clave></MensajeHacienda>'),
+            ("factura-5.xml", supplier_xml(number=5)),
+        ]
+        move_model = self.env["account.move"]
+        payloads = move_model._extract_xml_payloads_from_candidates(candidates)
+        self.assertEqual(
+            [filename for filename, _payload in payloads],
+            ["factura-1.xml", "factura-2.xml", "factura-3.xml", "factura-4.xml", "factura-5.xml"],
+        )
+        self.assertEqual(payloads[3][1], supplier_xml(number=4))
+        sequential = [
+            payload
+            for filename, content in candidates
+            for payload in move_model._extract_supported_xml_payloads(content, filename=filename)
+        ]
+        self.assertEqual(payloads, sequential)
+
+    def test_oversized_zip_member_is_not_expanded(self):
+        self.set_param("xml_max_size_mb", 1)
+        members = [("grande.xml", _padded_xml(1, 2 * MB)), ("factura-2.xml", supplier_xml(number=2))]
+        payloads = self.env["account.move"]._extract_xml_payloads_from_candidates([("facturas.zip", _zip(members))])
+        self.assertEqual([len(payload) for _filename, payload in payloads], [MB + 1, len(supplier_xml(number=2))])
+
+        results = self.import_documents(payloads, journal_id=self.purchase_journal.id)
+        self.assertEqual([result["outcome"] for result in results], ["limit_exceeded", "imported"])
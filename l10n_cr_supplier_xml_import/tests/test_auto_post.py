@@ -0,0 +1,65 @@
+from unittest.mock import patch
+
+from odoo.tests import tagged
+
+from .common import SupplierXMLCommon, supplier_xml
+
+
+@tagged("post_install", "-at_install")
+class TestSupplierXMLAutoPost(SupplierXMLCommon):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.gateway = cls.env["supplier.xml.gateway"].create(
+            {
+                "name": "Buzón con publicación automática",
+                "company_id": cls.company.id,
+                "journal_id": cls.purchase_journal.id,
+                "auto_post_policy": "criteria",
+            }
+        )
+
+    def _process(self, number, **xml_kwargs):
+        self.gateway._process_supplier_email(
+            {
+                "message_id": "<%d@proveedor.example>" % number,
+                "attachments": [("factura-%d.xml" % number, supplier_xml(number=number, **xml_kwargs))],
+            }
+        )
+        return self.gateway.move_ids.filtered(lambda move: move.ref and move.ref.endswith("%010d" % number))
+
+    def _run_cron(self):
+        with patch.object(type(self.gateway), "_cron_checkpoint", return_value=True):
+            self.env["supplier.xml.gateway"]._cron_auto_post_supplier_moves()
+
+    def test_moves_meeting_the_criteria_are_posted_by_the_cron(self):
+        move = self._process(1)
+        self.assertTrue(move.supplier_xml_auto_post_pending)
+        self.assertEqual(move.state, "draft")
+        self._run_cron()
+        self.assertEqual(move.state, "posted")
+        self.assertFalse(move.supplier_xml_auto_post_pending)
+
+    def test_moves_failing_the_criteria_stay_in_draft(self):
+        mismatched = self._process(1, total_tax=20.0)
+        self.assertEqual(mismatched.supplier_xml_totals_state, "mismatch")
+        self.assertFalse(mismatched.supplier_xml_auto_post_pending)
+
+        self.gateway.auto_post_partner_ids = self.env["res.partner"].create({"name": "Otro proveedor"})
+        untrusted = self._process(2)
+        self.assertFalse(untrusted.supplier_xml_auto_post_pending)
+
+        self.gateway.auto_post_policy = "never"
+        self.gateway.auto_post_partner_ids = False
+        self.assertFalse(self._process(3).supplier_xml_auto_post_pending)
+
+        self._run_cron()
+        self.assertEqual(set(self.gateway.move_ids.mapped("state")), {"draft"})
+
+    def test_a_move_that_cannot_be_posted_does_not_block_the_chunk(self):
+        failing, posted = self._process(1), self._process(2)
+        failing.invoice_line_ids.unlink()
+        self._run_cron()
+        self.assertEqual((failing.state, posted.state), ("draft", "posted"))
+        self.assertFalse(failing.supplier_xml_auto_post_pending)
+        self.assertIn("No se pudo publicar automáticamente", failing.message_ids[0].body)
@@ -0,0 +1,56 @@
+from datetime import date
+
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+
+from .common import SupplierXMLCommon, supplier_xml
+
+RATE_DATES = (date(2023, 6, 1), date(2024, 1, 1), date(2024, 2, 15), date(2024, 3, 1), date(2024, 6, 1))
+
+
+@tagged("post_install", "-at_install")
+class TestSupplierXMLCurrencyRates(SupplierXMLCommon):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.xml_currency = cls.env["res.currency"].create({"name": "XCR", "symbol": "X", "rounding": 0.01})
+        cls.env["res.currency.rate"].create(
+            [
+                {"currency_id": cls.xml_currency.id, "name": "2024-01-01", "rate": 2.0, "company_id": False},
+                {"currency_id": cls.xml_currency.id, "name": "2024-03-01", "rate": 5.0, "company_id": False},
+                {"currency_id": cls.xml_currency.id, "name": "2024-03-01", "rate": 3.0, "company_id": cls.company.id},
+                {"currency_id": cls.xml_currency.id, "name": "2024-05-01", "rate": 4.0, "company_id": False},
+            ]
+        )
+
+    def test_rates_match_odoo(self):
+        move_model = self.env["account.move"]
+        for date_from, date_to in ((date(2023, 6, 1), date(2024, 6, 1)), (date(2024, 6, 1), date(2024, 6, 1))):
+            currency_rates = move_model._preload_supplier_xml_currency_rates(
+                self.company, {self.xml_currency.id}, date_from, date_to
+            )
+            for rate_date in RATE_DATES:
+                if not date_from <= rate_date <= date_to:
+                    continue
+                expected = self.env["res.currency"]._get_conversion_rate(
+                    self.company.currency_id, self.xml_currency, self.company, rate_date
+                )
+                rate = move_model._supplier_xml_rate_from_table(
+                    currency_rates, self.xml_currency.id, self.company.currency_id.id, rate_date
+                )
+                self.assertAlmostEqual(rate, expected, places=6, msg=str(rate_date))
+
+    def test_imported_document_uses_the_company_rate(self):
+        move = self.import_xml(supplier_xml(currency="XCR", date="2024-03-15"))
+        expected = self.env["res.currency"]._get_conversion_rate(
+            self.company.currency_id, self.xml_currency, self.company, date(2024, 3, 15)
+        )
+        self.assertEqual(move.currency_id, self.xml_currency)
+        self.assertAlmostEqual(move.invoice_currency_rate, expected, places=6)
+
+    def test_missing_currency_is_not_cached(self):
+        with self.assertRaisesRegex(UserError, "no existe"):
+            self.import_xml(supplier_xml(number=1, currency="XCS"))
+        currency = self.env["res.currency"].create({"name": "XCS", "symbol": "Y", "rounding": 0.01})
+        move = self.import_xml(supplier_xml(number=2, currency="XCS"))
+        self.assertEqual(move.currency_id, currency)
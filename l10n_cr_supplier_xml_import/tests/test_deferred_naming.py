@@ -0,0 +1,38 @@
+from odoo.tests import tagged
+
+from .common import SupplierXMLCommon, supplier_xml
+
+
+@tagged("post_install", "-at_install")
+class TestSupplierXMLDeferredNaming(SupplierXMLCommon):
+    def test_drafts_are_numbered_when_posted(self):
+        results = self.import_documents(
+            [("factura-1.xml", supplier_xml(number=1)), ("factura-2.xml", supplier_xml(number=2))],
+            journal_id=self.purchase_journal.id,
+            defer_name=True,
+        )
+        first, second = (result["move"] for result in results)
+        self.assertEqual((first.name, second.name), ("/", "/"))
+
+        second.action_post()
+        first.action_post()
+        self.assertNotEqual(second.name, "/")
+        self.assertNotEqual(first.name, "/")
+        self.assertEqual(first.sequence_number, second.sequence_number + 1, "Numbers follow the posting order.")
+
+    def test_gateway_option(self):
+        gateway = self.env["supplier.xml.gateway"].create(
+            {
+                "name": "Buzón sin numeración",
+                "company_id": self.company.id,
+                "journal_id": self.purchase_journal.id,
+                "defer_move_name": True,
+            }
+        )
+        gateway._process_supplier_email(
+            {
+                "message_id": "<sin-numero@proveedor.example>",
+                "attachments": [("factura.xml", supplier_xml(number=3))],
+            }
+        )
+        self.assertEqual(gateway.move_ids.name, "/")
@@ -0,0 +1,52 @@
+from odoo.tests import tagged
+
+from .common import ISSUER_VAT, SupplierXMLCommon, supplier_xml
+
+
+@tagged("post_install", "-at_install")
+class TestSupplierXMLFallbackDuplicates(SupplierXMLCommon):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.supplier = cls.env["res.partner"].create(
+            {"name": "Proveedor XML S.A.", "vat": ISSUER_VAT, "is_company": True}
+        )
+        cls.manual_bill = cls.env["account.move"].create(
+            {
+                "move_type": "in_invoice",
+                "company_id": cls.company.id,
+                "journal_id": cls.purchase_journal.id,
+                "partner_id": cls.supplier.id,
+                "ref": "00100001010000000001",
+                "invoice_date": "2024-07-01",
+                "invoice_line_ids": [
+                    (0, 0, {"name": "Captura manual", "price_unit": 100.0, "tax_ids": [(6, 0, cls.iva_13.ids)]})
+                ],
+            }
+        )
+
+    def _import(self, number=1, **xml_kwargs):
+        return self.import_documents(
+            [("factura.xml", supplier_xml(number=number, **xml_kwargs))], journal_id=self.purchase_journal.id
+        )[0]
+
+    def test_flag_policy(self):
+        result = self._import()
+        self.assertEqual(result["outcome"], "imported")
+        self.assertEqual(result["move"].supplier_xml_duplicate_of_id, self.manual_bill)
+
+    def test_skip_policy(self):
+        self.set_param("fallback_duplicate_policy", "skip")
+        result = self._import()
+        self.assertEqual(result["outcome"], "duplicate")
+        self.assertEqual(result["move"], self.manual_bill)
+
+    def test_off_policy(self):
+        self.set_param("fallback_duplicate_policy", "off")
+        result = self._import()
+        self.assertFalse(result["move"].supplier_xml_duplicate_of_id)
+
+    def test_different_total_or_reference_is_not_a_duplicate(self):
+        self.set_param("fallback_duplicate_policy", "skip")
+        self.assertEqual(self._import(total_tax=20.0)["outcome"], "imported")
+        self.assertEqual(self._import(number=2)["outcome"], "imported")
@@ -0,0 +1,33 @@
+from unittest.mock import patch
+
+from odoo.tests import tagged
+
+from .common import ISSUER_VAT, SupplierXMLCommon, supplier_xml
+
+CLAVE = "506%047d" % (int(ISSUER_VAT) * 10**9 + 1)
+
+
+@tagged("post_install", "-at_install")
+class TestSupplierXMLFastPath(SupplierXMLCommon):
+    def test_fast_key(self):
+        move_model = self.env["account.move"]
+        self.assertEqual(move_model._supplier_xml_fast_key("factura.xml", supplier_xml(number=1)), CLAVE)
+        prefixed = b'<fe:FacturaElectronica xmlns:fe="x"><fe:Clave> %s </fe:Clave></fe:FacturaElectronica>' % (
+            CLAVE.encode()
+        )
+        self.assertEqual(move_model._supplier_xml_fast_key(False, prefixed), CLAVE)
+        self.assertEqual(move_model._supplier_xml_fast_key("FE-%s.xml" % CLAVE, b"PK\x03\x04"), CLAVE)
+        self.assertFalse(move_model._supplier_xml_fast_key("factura-%s1.xml" % CLAVE, b"<Factura/>"))
+
+    def test_known_documents_are_not_parsed(self):
+        move = self.import_xml(supplier_xml(number=1))
+        self.assertEqual(move.supplier_xml_key, CLAVE)
+        move_class = type(self.env["account.move"])
+        with patch.object(move_class, "_parse_supplier_xml", autospec=True) as parse:
+            results = self.import_documents(
+                [("factura.xml", supplier_xml(number=1)), ("%s.zip" % CLAVE, b"")],
+                journal_id=self.purchase_journal.id,
+            )
+        parse.assert_not_called()
+        self.assertEqual([result["outcome"] for result in results], ["duplicate", "duplicate"])
+        self.assertEqual([result["move"] for result in results], [move, move])
@@ -0,0 +1,50 @@
+import socket
+import threading
+
+from odoo.tests import tagged
+from odoo.tests.common import BaseCase
+
+from ..tools import imap
+
+
+class SocketConnection:
+    """Client side of a socket pair, reading through a buffered file like ``imaplib.IMAP4``."""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.file = sock.makefile("rb")
+
+    def send(self, data):
+        self.sock.sendall(data)
+
+    def readline(self):
+        return self.file.readline()
+
+
+@tagged("post_install", "-at_install")
+class TestIMAPIdle(BaseCase):
+    def _idle(self, untagged, timeout):
+        client, server = socket.socketpair()
+        self.addCleanup(client.close)
+        self.addCleanup(server.close)
+
+        def serve():
+            reader = server.makefile("rb")
+            tag = reader.readline().split()[0]
+            # The continuation and the untagged data arrive together and end up in the client buffer.
+            server.sendall(b"+ idling\r\n" + untagged)
+            reader.readline()
+            server.sendall(tag + b" OK IDLE terminated\r\n")
+
+        thread = threading.Thread(target=serve, daemon=True)
+        thread.start()
+        changed = imap.idle_wait({"inbox": SocketConnection(client)}, timeout)
+        thread.join(5)
+        self.assertIsNone(client.gettimeout())
+        return changed
+
+    def test_buffered_exists_is_reported(self):
+        self.assertEqual(self._idle(b"* 5 EXISTS\r\n", 30), {"inbox"})
+
+    def test_quiet_mailbox_times_out(self):
+        self.assertEqual(self._idle(b"", 0.2), set())
@@ -0,0 +1,112 @@
+import base64
+from unittest.mock import patch
+
+from odoo.tests import TransactionCase, tagged
+
+XML = b'<FacturaElectronica xmlns="x"><Clave>1</Clave></FacturaElectronica>'
+TEXT_PART = b'("TEXT" "PLAIN" ("CHARSET" "utf-8") NIL NIL "7BIT" 10 1 NIL NIL NIL NIL)'
+XML_MULTIPART = (
+    b'(%s("APPLICATION" "XML" ("NAME" "factura.xml") NIL NIL "BASE64" %d NIL '
+    b'("ATTACHMENT" ("FILENAME" "factura.xml")) NIL NIL) "MIXED" ("BOUNDARY" "x") NIL NIL NIL)'
+)
+
+
+class IMAPStandIn:
+    """Local stand-in for an ``imaplib.IMAP4`` connection serving ``{uid: (header, xml_or_None)}``."""
+
+    def __init__(self, uidvalidity, messages):
+        self.uidvalidity = uidvalidity
+        self.messages = messages
+        self.fetched = []
+
+    def select(self, folder, readonly=False):
+        return "OK", [str(len(self.messages)).encode()]
+
+    def response(self, name):
+        return name, [str(self.uidvalidity).encode()]
+
+    def uid(self, command, *args):
+        if command == "SEARCH":
+            first_uid = int(args[2].split(":")[0])
+            return "OK", [" ".join(str(uid) for uid in sorted(self.messages) if uid >= first_uid).encode()]
+        uid, spec = int(args[0]), args[1]
+        header, xml = self.messages[uid]
+        self.fetched.append((uid, spec))
+        if spec == "(UID BODYSTRUCTURE)":
+            structure = TEXT_PART
+            if xml:
+                structure = XML_MULTIPART % (TEXT_PART, len(base64.b64encode(xml)))
+            return "OK", [b"1 (UID %d BODYSTRUCTURE %s)" % (uid, structure)]
+        if spec == "(UID BODY.PEEK[HEADER])":
+            return "OK", [(b"1 (UID %d BODY[HEADER] {%d}" % (uid, len(header)), header), b")"]
+        if spec == "(UID BODY.PEEK[2])":
+            payload = base64.b64encode(xml)
+            return "OK", [(b"1 (UID %d BODY[2] {%d}" % (uid, len(payload)), payload), b")"]
+        raise AssertionError("Unexpected FETCH %s" % spec)
+
+    def logout(self):
+        return "BYE", [b""]
+
+
+def _header(uid):
+    return (
+        b"Message-ID: <%d@proveedor.example>\r\nFrom: facturas@proveedor.example\r\n"
+        b"Subject: Factura %d\r\nDate: Mon, 1 Jul 2024 10:00:00 -0600\r\n\r\n" % (uid, uid)
+    )
+
+
+@tagged("post_install", "-at_install")
+class TestIMAPPoll(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.gateway = cls.env["supplier.xml.gateway"].create(
+            {"name": "Buzón IMAP de prueba", "imap_host": "imap.example", "imap_user": "facturas"}
+        )
+
+    def _poll(self, server):
+        return self.gateway._poll_imap(connection_factory=lambda gateway: server)
+
+    def _logs(self):
+        return self.env["supplier.xml.import.log"].search([("gateway_id", "=", self.gateway.id)], order="id")
+
+    def test_watermark_advances(self):
+        server = IMAPStandIn(7, {1: (_header(1), None), 2: (_header(2), None)})
+        self.assertEqual(self._poll(server), 2)
+        self.assertEqual((self.gateway.imap_uidvalidity, self.gateway.imap_last_uid), ("7", "2"))
+        self.assertEqual(self._logs().mapped("outcome"), ["discarded", "discarded"])
+
+        server.messages[3] = (_header(3), None)
+        server.fetched.clear()
+        self.assertEqual(self._poll(server), 1)
+        self.assertEqual(self.gateway.imap_last_uid, "3")
+        self.assertEqual({uid for uid, _spec in server.fetched}, {3})
+
+    def test_uidvalidity_reset_reads_the_folder_again(self):
+        self._poll(IMAPStandIn(7, {5: (_header(5), None)}))
+        self.assertEqual(self.gateway.imap_last_uid, "5")
+
+        server = IMAPStandIn(8, {1: (_header(1), None), 2: (_header(2), None)})
+        self.assertEqual(self._poll(server), 2)
+        self.assertEqual((self.gateway.imap_uidvalidity, self.gateway.imap_last_uid), ("8", "2"))
+
+    def test_poison_message_does_not_block_the_mailbox(self):
+        gateway_class = type(self.gateway)
+        processed = []
+
+        def process(gateway, msg_dict):
+            if msg_dict["message_id"] == "<1@proveedor.example>":
+                raise ValueError("boom")
+            processed.append(msg_dict["message_id"])
+
+        server = IMAPStandIn(7, {1: (_header(1), XML), 2: (_header(2), XML)})
+        with (
+            patch.object(gateway_class, "_process_supplier_email", autospec=True, side_effect=process),
+            self.assertLogs("odoo.addons.l10n_cr_supplier_xml_import.models.supplier_xml_gateway", "ERROR"),
+        ):
+            self.assertEqual(self._poll(server), 2)
+        self.assertEqual(self.gateway.imap_last_uid, "2")
+        self.assertEqual(processed, ["<2@proveedor.example>"])
+        poison_log = self._logs().filtered(lambda log: log.message_id == "<1@proveedor.example>")
+        self.assertEqual(poison_log.outcome, "rejected")
+        self.assertIn("boom", poison_log.reason)
@@ -0,0 +1,90 @@
+from odoo.tests import new_test_user, tagged
+
+from .common import SupplierXMLCommon, supplier_xml
+
+
+@tagged("post_install", "-at_install")
+class TestSupplierXMLImportLog(SupplierXMLCommon):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.gateway = cls.env["supplier.xml.gateway"].create(
+            {"name": "Buzón de registro", "company_id": cls.company.id, "journal_id": cls.purchase_journal.id}
+        )
+
+    def _message(self, attachments=None, message_id="<1@proveedor.example>"):
+        return {
+            "message_id": message_id,
+            "email_from": "facturas@proveedor.example",
+            "subject": "Factura electrónica",
+            "date": "2024-07-01 10:00:00",
+            "attachments": attachments if attachments is not None else [("factura.xml", supplier_xml())],
+        }
+
+    def _logs(self):
+        return self.env["supplier.xml.import.log"].search([("gateway_id", "=", self.gateway.id)], order="id")
+
+    def test_imported(self):
+        self.gateway._process_supplier_email(self._message())
+        log = self._logs()
+        self.assertEqual(log.outcome, "imported")
+        self.assertEqual(log.filename, "factura.xml")
+        self.assertEqual(log.company_id, self.company)
+        self.assertEqual(log.move_id.supplier_xml_gateway_id, self.gateway)
+
+    def test_duplicate_message(self):
+        self.gateway._process_supplier_email(self._message())
+        self.gateway._process_supplier_email(self._message())
+        self.assertEqual(self._logs().mapped("outcome"), ["imported", "duplicate"])
+
+    def test_ignored_date(self):
+        self.set_param("process_emails_from_date", "2024-08-01 00:00:00")
+        self.gateway._process_supplier_email(self._message())
+        log = self._logs()
+        self.assertEqual(log.outcome, "ignored_date")
+        self.assertFalse(log.move_id)
+
+    def test_rejections_are_logged_without_raising(self):
+        self.gateway._process_supplier_email(self._message([("nota.txt", b"Sin factura")]))
+        self.gateway._process_supplier_email(
+            self._message([("factura.xml", supplier_xml(receiver="3101000000"))], message_id="<2@proveedor.example>")
+        )
+        logs = self._logs()
+        self.assertEqual(logs.mapped("outcome"), ["rejected", "rejected"])
+        self.assertTrue(all(logs.mapped("reason")))
+        self.assertFalse(logs.move_id)
+
+    def test_limit_exceeded(self):
+        self.set_param("xml_max_lines", 1)
+        lines = [{"quantity": 1, "price": 100.0, "rate": 13.0}] * 2
+        self.gateway._process_supplier_email(self._message([("factura.xml", supplier_xml(lines=lines))]))
+        self.assertEqual(self._logs().outcome, "limit_exceeded")
+
+    def test_discarded_before_routing(self):
+        self.gateway.sender_denylist = "proveedor.example"
+        route = (self.gateway._name, self.gateway.id, {}, self.env.uid, None)
+        routes = self.gateway._filter_supplier_xml_routes(self._message(), [route])
+        self.assertEqual(routes, [])
+        self.assertEqual(self._logs().outcome, "discarded")
+
+    def test_company_rule(self):
+        other_company = self.setup_other_company()["company"]
+        log_model = self.env["supplier.xml.import.log"].sudo()
+        own_log, shared_log, other_log = log_model.create(
+            [
+                {"outcome": "imported", "company_id": self.company.id},
+                {"outcome": "discarded", "company_id": False},
+                {"outcome": "imported", "company_id": other_company.id},
+            ]
+        )
+        user = new_test_user(
+            self.env,
+            login="supplier_xml_log_user",
+            groups="account.group_account_invoice",
+            company_id=self.company.id,
+            company_ids=[(6, 0, self.company.ids)],
+        )
+        visible = self.env["supplier.xml.import.log"].with_user(user).search(
+            [("id", "in", (own_log | shared_log | other_log).ids)]
+        )
+        self.assertEqual(visible, own_log | shared_log)
@@ -0,0 +1,75 @@
+from unittest.mock import patch
+
+from odoo.tests import TransactionCase, tagged
+
+from ..models.account_move import SupplierXMLRejected
+from ..tools import metrics
+
+XML = b'<FacturaElectronica xmlns="x"><Clave>1</Clave></FacturaElectronica>'
+
+
+@tagged("post_install", "-at_install")
+class TestSupplierXMLMetrics(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.gateway = cls.env["supplier.xml.gateway"].create({"name": "Buzón de métricas"})
+        cls.metric_model = cls.env["supplier.xml.metric"]
+
+    def setUp(self):
+        super().setUp()
+        self.metric_model._transaction_metrics().clear()
+
+    def _recorded(self, name):
+        return [
+            labels
+            for _record, metric_name, _value, labels in self.metric_model._transaction_metrics()
+            if metric_name == name
+        ]
+
+    def test_each_rejected_document_is_counted_with_its_reason(self):
+        msg_dict = {
+            "message_id": "<rechazos@proveedor.example>",
+            "subject": "Facturas",
+            "attachments": [("factura-%d.xml" % index, XML) for index in range(3)],
+        }
+        rejections = [
+            SupplierXMLRejected("Firma inválida", "signature"),
+            SupplierXMLRejected("Otro receptor", "receiver_mismatch"),
+            SupplierXMLRejected("Firma inválida", "signature"),
+        ]
+        with patch.object(
+            type(self.env["account.move"]), "_parse_supplier_xml", autospec=True, side_effect=rejections
+        ):
+            self.gateway._process_supplier_email(msg_dict)
+        self.assertEqual(
+            sorted(labels["reason"] for labels in self._recorded("supplier_xml_documents_rejected_total")),
+            ["receiver_mismatch", "signature", "signature"],
+        )
+        self.assertEqual(
+            {labels["gateway"] for labels in self._recorded("supplier_xml_documents_rejected_total")},
+            {self.gateway.id},
+        )
+
+    def test_reading_xml_from_a_bill_is_not_counted(self):
+        rejection = SupplierXMLRejected("Firma inválida", "signature")
+        with patch.object(
+            type(self.env["account.move"]), "_parse_supplier_xml", autospec=True, side_effect=rejection
+        ):
+            results = self.env["account.move"]._create_from_supplier_xml_documents([("factura.xml", XML)])
+        self.assertEqual(results[0]["rejection"], "signature")
+        self.assertFalse(self._recorded("supplier_xml_documents_rejected_total"))
+
+    def test_metrics_wait_for_the_commit(self):
+        metrics.drain(self.env.cr.dbname)
+        self.metric_model._inc("supplier_xml_documents_imported_total", gateway=self.gateway.id)
+        self.assertEqual(self._recorded("supplier_xml_documents_imported_total"), [{"gateway": self.gateway.id}])
+        self.assertFalse(metrics.drain(self.env.cr.dbname))
+
+    def test_rolled_back_savepoint_discards_its_metrics(self):
+        with self.assertRaises(ValueError), self.metric_model._savepoint():
+            self.metric_model._inc("supplier_xml_documents_imported_total", gateway=self.gateway.id)
+            raise ValueError("boom")
+        self.metric_model._inc("supplier_xml_documents_duplicate_total", gateway=self.gateway.id)
+        self.assertFalse(self._recorded("supplier_xml_documents_imported_total"))
+        self.assertEqual(self._recorded("supplier_xml_documents_duplicate_total"), [{"gateway": self.gateway.id}])
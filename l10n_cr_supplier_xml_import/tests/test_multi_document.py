@@ -0,0 +1,52 @@
+import io
+import zipfile
+
+from odoo.tests import tagged
+
+from .common import SupplierXMLCommon, supplier_xml
+
+
+def _zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zip_file:
+        for name, content in members:
+            zip_file.writestr(name, content)
+    return buffer.getvalue()
+
+
+@tagged("post_install", "-at_install")
+class TestSupplierXMLMultiDocument(SupplierXMLCommon):
+    def test_every_document_of_an_email_is_imported(self):
+        gateway = self.env["supplier.xml.gateway"].create(
+            {"name": "Buzón de varias facturas", "company_id": self.company.id, "journal_id": self.purchase_journal.id}
+        )
+        gateway._process_supplier_email(
+            {
+                "message_id": "<varias@proveedor.example>",
+                "email_from": "facturas@proveedor.example",
+                "subject": "Facturas de julio",
+                "attachments": [
+                    ("factura-1.xml", supplier_xml(number=1)),
+                    ("factura-2.xml", supplier_xml(number=2)),
+                    ("facturas.zip", _zip([("factura-3.xml", supplier_xml(number=3)), ("leame.txt", b"")])),
+                ],
+            }
+        )
+        logs = self.env["supplier.xml.import.log"].search([("gateway_id", "=", gateway.id)], order="id")
+        self.assertEqual(logs.mapped("outcome"), ["imported"] * 3)
+        self.assertEqual(logs.mapped("filename"), ["factura-1.xml", "factura-2.xml", "factura-3.xml"])
+        self.assertEqual(len(logs.move_id), 3)
+        self.assertEqual(set(logs.move_id.mapped("supplier_xml_message_id")), {"<varias@proveedor.example>"})
+
+    def test_bad_or_repeated_documents_do_not_block_the_others(self):
+        results = self.import_documents(
+            [
+                ("factura-1.xml", supplier_xml(number=1)),
+                ("otro-receptor.xml", supplier_xml(number=2, receiver="3101000000")),
+                ("factura-1-copia.xml", supplier_xml(number=1)),
+                ("factura-3.xml", supplier_xml(number=3)),
+            ]
+        )
+        self.assertEqual([result["outcome"] for result in results], ["imported", "rejected", "duplicate", "imported"])
+        self.assertEqual(results[1]["rejection"], "receiver_mismatch")
+        self.assertEqual(len({result["move"].id for result in results if result["outcome"] == "imported"}), 2)
@@ -0,0 +1,67 @@
+from odoo.tests import tagged
+
+from .common import SupplierXMLCommon, supplier_xml
+
+MB = 1024 * 1024
+
+
+@tagged("post_install", "-at_install")
+class TestSupplierXMLPreRouteFilter(SupplierXMLCommon):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.gateway = cls.env["supplier.xml.gateway"].create(
+            {"name": "Buzón filtrado", "company_id": cls.company.id, "journal_id": cls.purchase_journal.id}
+        )
+
+    def _message_dict(self, email_from="facturas@proveedor.example", attachments=None):
+        return {
+            "message_id": "<filtro@proveedor.example>",
+            "email_from": email_from,
+            "subject": "Factura",
+            "attachments": attachments if attachments is not None else [("factura.xml", supplier_xml())],
+        }
+
+    def _route(self):
+        return (self.gateway._name, self.gateway.id, {}, self.env.uid, None)
+
+    def _logs(self):
+        return self.env["supplier.xml.import.log"].search([("gateway_id", "=", self.gateway.id)])
+
+    def test_discarded_mail_is_not_routed(self):
+        self.gateway.sender_denylist = "spam@proveedor.example"
+        message_count = len(self.gateway.message_ids)
+        routed = self.env["mail.thread"]._message_route_process(
+            None, self._message_dict("Spam <spam@proveedor.example>"), [self._route()]
+        )
+        self.assertFalse(routed)
+        self.assertEqual(len(self.gateway.message_ids), message_count)
+        self.assertFalse(self.gateway.move_ids)
+        self.assertEqual(self._logs().outcome, "discarded")
+        self.assertIn("remitente bloqueado", self._logs().reason)
+
+    def test_rejection_reasons(self):
+        self.assertFalse(self.gateway._pre_route_rejection(self._message_dict()))
+        for attachments in ([], [("factura.pdf", b"%PDF-1.4")]):
+            reason = self.gateway._pre_route_rejection(self._message_dict(attachments=attachments))
+            self.assertIn("no contiene adjuntos XML o ZIP", reason)
+
+        self.gateway.sender_allowlist = "@otro-proveedor.example"
+        self.assertIn("no permitido", self.gateway._pre_route_rejection(self._message_dict()))
+        self.assertFalse(self.gateway._pre_route_rejection(self._message_dict("x@otro-proveedor.example")))
+
+    def test_oversized_attachments_are_dropped(self):
+        self.gateway.max_attachment_size_mb = 1
+        oversized = ("grande.xml", b" " * (2 * MB))
+        reason = self.gateway._pre_route_rejection(self._message_dict(attachments=[oversized]))
+        self.assertIn("superan 1 MB", reason)
+
+        message_dict = self._message_dict(attachments=[oversized, ("factura.xml", supplier_xml())])
+        self.assertFalse(self.gateway._pre_route_rejection(message_dict))
+        self.assertEqual([attachment[0] for attachment in message_dict["attachments"]], ["factura.xml"])
+
+    def test_other_routes_are_kept(self):
+        self.gateway.sender_denylist = "proveedor.example"
+        partner_route = ("res.partner", self.env.user.partner_id.id, {}, self.env.uid, None)
+        routes = self.gateway._filter_supplier_xml_routes(self._message_dict(), [partner_route, self._route()])
+        self.assertEqual(routes, [partner_route])
@@ -0,0 +1,42 @@
+from odoo.tests import TransactionCase, tagged
+
+from ..models.account_move import PRODUCT_MATCH_CACHE
+from ..models.product import PRODUCT_MATCH_CACHE_VERSION
+from ..tools import cache_version
+
+
+@tagged("post_install", "-at_install")
+class TestSupplierXMLProductMatch(TransactionCase):
+    def _lookup_barcode(self, barcode):
+        version = self.env["product.product"]._supplier_xml_product_match_version()
+        return self.env["account.move"]._lookup_supplier_xml_products("barcode", {barcode}, self.env.company, version)
+
+    def _stored_version(self):
+        self.env.cr.execute(
+            "SELECT version FROM %s WHERE name = %%s" % cache_version.TABLE, [PRODUCT_MATCH_CACHE_VERSION]
+        )
+        row = self.env.cr.fetchone()
+        return row[0] if row else 0
+
+    def test_product_write_bumps_the_version_in_the_transaction(self):
+        self.env.cr.postcommit.data.pop((cache_version.TABLE, PRODUCT_MATCH_CACHE_VERSION), None)
+        product_model = self.env["product.product"]
+        version = product_model._supplier_xml_product_match_version()
+        self.assertEqual(version, self._stored_version())
+
+        product_model.create({"name": "Producto XML", "barcode": "7441000000017"})
+        self.assertEqual(self._stored_version(), version + 1)
+        self.assertIsNone(product_model._supplier_xml_product_match_version())
+
+        product_model.create({"name": "Otro producto XML", "barcode": "7441000000024"})
+        self.assertEqual(self._stored_version(), version + 1, "The version is bumped once per transaction.")
+
+    def test_uncommitted_matches_are_not_cached(self):
+        product = self.env["product.product"].create({"name": "Producto XML", "barcode": "7441000000031"})
+        cache_size = len(PRODUCT_MATCH_CACHE)
+        self.assertEqual(self._lookup_barcode("7441000000031"), {"7441000000031": product.id})
+        self.assertEqual(len(PRODUCT_MATCH_CACHE), cache_size)
+
+        product.barcode = "7441000000048"
+        other = self.env["product.product"].create({"name": "Producto nuevo", "barcode": "7441000000031"})
+        self.assertEqual(self._lookup_barcode("7441000000031"), {"7441000000031": other.id})
@@ -0,0 +1,89 @@
+from odoo.tests import tagged
+
+from ..models.supplier_xml_gateway import ROUTING_CACHE_VERSION
+from ..tools import cache_version
+from .common import RECEIVER_VAT, SupplierXMLCommon, supplier_xml
+
+OTHER_RECEIVER_VAT = "3101777777"
+
+
+@tagged("post_install", "-at_install")
+class TestSupplierXMLReceiverRouting(SupplierXMLCommon):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.gateway = cls.env["supplier.xml.gateway"].create(
+            {
+                "name": "Buzón compartido",
+                "company_id": cls.company.id,
+                "journal_id": cls.purchase_journal.id,
+                "route_by_receiver": True,
+            }
+        )
+        other_company_data = cls.setup_other_company()
+        cls.other_company = other_company_data["company"]
+        cls.other_company.vat = OTHER_RECEIVER_VAT
+        cls.other_journal = other_company_data["default_journal_purchase"]
+        cls.other_gateway = cls.env["supplier.xml.gateway"].create(
+            {
+                "name": "Buzón de la otra compañía",
+                "company_id": cls.other_company.id,
+                "journal_id": cls.other_journal.id,
+            }
+        )
+
+    def _process(self, number, receiver):
+        self.gateway._process_supplier_email(
+            {
+                "message_id": "<%d@proveedor.example>" % number,
+                "email_from": "facturas@proveedor.example",
+                "subject": "Factura %d" % number,
+                "attachments": [("factura-%d.xml" % number, supplier_xml(number=number, receiver=receiver))],
+            }
+        )
+        return self.env["supplier.xml.import.log"].search(
+            [("message_id", "=", "<%d@proveedor.example>" % number)], order="id desc", limit=1
+        )
+
+    def test_documents_go_to_the_receiver_company(self):
+        log = self._process(1, OTHER_RECEIVER_VAT)
+        self.assertEqual(log.outcome, "imported")
+        self.assertEqual(log.company_id, self.other_company)
+        self.assertEqual(log.move_id.company_id, self.other_company)
+        self.assertEqual(log.move_id.journal_id, self.other_journal)
+        self.assertEqual(log.move_id.supplier_xml_gateway_id, self.other_gateway)
+
+        log = self._process(2, RECEIVER_VAT)
+        self.assertEqual(log.move_id.company_id, self.company)
+        self.assertEqual(log.move_id.supplier_xml_gateway_id, self.gateway)
+
+    def test_unknown_receiver_is_rejected(self):
+        log = self._process(3, "3101000000")
+        self.assertEqual(log.outcome, "rejected")
+        self.assertFalse(log.move_id)
+
+    def test_company_without_gateway_is_not_routed(self):
+        self.other_gateway.unlink()
+        self.assertNotIn(OTHER_RECEIVER_VAT, self.env["supplier.xml.gateway"]._get_receiver_routing_index())
+        self.assertEqual(self._process(4, OTHER_RECEIVER_VAT).outcome, "rejected")
+
+    def _routing_bumped(self):
+        return bool(self.env.cr.postcommit.data.get((cache_version.TABLE, ROUTING_CACHE_VERSION)))
+
+    def test_unchanged_vat_keeps_the_routing_index(self):
+        self.env.cr.postcommit.data.pop((cache_version.TABLE, ROUTING_CACHE_VERSION), None)
+        self.addCleanup(self.env.cr.postcommit.data.__setitem__, (cache_version.TABLE, ROUTING_CACHE_VERSION), True)
+        self.company.write({"vat": "3-101-999999"})
+        self.assertFalse(self._routing_bumped(), "The normalized VAT did not change.")
+
+    def test_changed_vat_updates_the_routing_index(self):
+        gateway_model = self.env["supplier.xml.gateway"]
+        self.assertEqual(
+            gateway_model._get_receiver_routing_index()[RECEIVER_VAT],
+            (self.company.id, self.gateway.id, self.purchase_journal.id),
+        )
+        self.company.write({"vat": "3101888888"})
+        self.assertTrue(self._routing_bumped())
+        index = gateway_model._get_receiver_routing_index()
+        self.assertNotIn(RECEIVER_VAT, index)
+        self.assertEqual(index["3101888888"][0], self.company.id)
@@ -0,0 +1,82 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from odoo import fields
+from odoo.tests import tagged
+
+from .common import SupplierXMLCommon, supplier_xml
+
+
+@tagged("post_install", "-at_install")
+class TestSupplierXMLRetention(SupplierXMLCommon):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.gateway = cls.env["supplier.xml.gateway"].create(
+            {
+                "name": "Buzón con retención",
+                "company_id": cls.company.id,
+                "journal_id": cls.purchase_journal.id,
+                "chatter_retention_days": 30,
+                "attachment_retention_days": 30,
+                "log_retention_days": 30,
+            }
+        )
+
+    def _age(self, records, column, days=60):
+        records.flush_recordset()
+        self.env.cr.execute(
+            "UPDATE %s SET %s = %%s WHERE id IN %%s" % (records._table, column),
+            [fields.Datetime.now() - timedelta(days=days), tuple(records.ids)],
+        )
+        records.invalidate_recordset()
+        return records
+
+    def _attachment(self, move, name, mimetype, gateway=True):
+        return self.env["ir.attachment"].create(
+            {
+                "name": name,
+                "raw": b"contenido",
+                "mimetype": mimetype,
+                "res_model": "account.move",
+                "res_id": move.id,
+                "supplier_xml_gateway_id": self.gateway.id if gateway else False,
+            }
+        )
+
+    def _apply(self):
+        with patch.object(type(self.gateway), "_cron_checkpoint", return_value=True):
+            self.assertTrue(self.gateway._apply_retention_policies())
+
+    def test_old_chatter_and_logs_are_purged(self):
+        old_message = self._age(self.gateway.message_post(body="Correo antiguo"), "date")
+        new_message = self.gateway.message_post(body="Correo reciente")
+        log_model = self.env["supplier.xml.import.log"]
+        old_log = self._age(log_model.create({"gateway_id": self.gateway.id, "outcome": "discarded"}), "create_date")
+        new_log = log_model.create({"gateway_id": self.gateway.id, "outcome": "discarded"})
+        self._apply()
+        self.assertFalse(old_message.exists())
+        self.assertTrue(new_message.exists())
+        self.assertFalse(old_log.exists())
+        self.assertTrue(new_log.exists())
+
+    def test_only_old_gateway_attachments_of_posted_moves_are_purged(self):
+        posted_move = self.import_xml(supplier_xml(number=1))
+        posted_move.action_post()
+        draft_move = self.import_xml(supplier_xml(number=2))
+        purged = self._attachment(posted_move, "detalle.txt", "text/plain")
+        kept = (
+            self._attachment(posted_move, "factura.xml", "application/xml")
+            | self._attachment(posted_move, "factura.pdf", "application/pdf")
+            | self._attachment(posted_move, "manual.txt", "text/plain", gateway=False)
+            | self._attachment(draft_move, "borrador.txt", "text/plain")
+        )
+        shared = self._attachment(posted_move, "compartido.txt", "text/plain")
+        draft_move.message_post(body="Adjuntos del correo", attachment_ids=shared.ids)
+        kept |= shared
+        self._age(purged | kept, "create_date")
+        recent = self._attachment(posted_move, "reciente.txt", "text/plain")
+        self._apply()
+        self.assertFalse(purged.exists())
+        self.assertEqual(kept.exists(), kept)
+        self.assertTrue(recent.exists())
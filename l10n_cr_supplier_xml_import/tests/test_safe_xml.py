@@ -0,0 +1,85 @@
+import threading
+
+from lxml import etree
+
+from odoo.tests import tagged
+from odoo.tests.common import BaseCase
+
+from ..tools import safe_xml
+
+
+def _document(lines=1, depth=1, padding=0):
+    nested = "<Detalle>" * depth + "</Detalle>" * depth
+    return (
+        '<FacturaElectronica xmlns="x"><Clave>1</Clave>%s<DetalleServicio>%s</DetalleServicio></FacturaElectronica>'
+        % (" " * padding, "<LineaDetalle>%s</LineaDetalle>" % nested * lines)
+    ).encode()
+
+
+@tagged("post_install", "-at_install")
+class TestSafeXML(BaseCase):
+    def test_parse(self):
+        root = safe_xml.parse(_document(lines=3))
+        self.assertEqual(etree.QName(root).localname, "FacturaElectronica")
+        self.assertEqual(len(root.xpath("//*[local-name()='LineaDetalle']")), 3)
+
+    def test_byte_limit(self):
+        document = _document(padding=1000)
+        with self.assertRaises(safe_xml.XMLLimitError) as error:
+            safe_xml.parse(document, max_bytes=len(document) - 1)
+        self.assertEqual(error.exception.limit, "bytes")
+        self.assertIsNotNone(safe_xml.parse(document, max_bytes=len(document)))
+
+    def test_depth_limit(self):
+        with self.assertRaises(safe_xml.XMLLimitError) as error:
+            safe_xml.parse(_document(depth=10), max_depth=12)
+        self.assertEqual(error.exception.limit, "depth")
+        self.assertIsNotNone(safe_xml.parse(_document(depth=10), max_depth=13))
+
+    def test_line_limit(self):
+        with self.assertRaises(safe_xml.XMLLimitError) as error:
+            safe_xml.parse(_document(lines=3), max_lines=2)
+        self.assertEqual(error.exception.limit, "lines")
+        self.assertIsNotNone(safe_xml.parse(_document(lines=3), max_lines=0), "0 disables the limit.")
+
+    def test_doctype_is_rejected(self):
+        document = (
+            b'<!DOCTYPE FacturaElectronica [<!ENTITY x "y">]>'
+            b"<FacturaElectronica><Clave>&x;</Clave></FacturaElectronica>"
+        )
+        with self.assertRaises(safe_xml.XMLLimitError) as error:
+            safe_xml.parse(document)
+        self.assertEqual(error.exception.limit, "doctype")
+
+    def test_external_entities_are_not_resolved(self):
+        document = (
+            b'<!DOCTYPE r [<!ENTITY e SYSTEM "file:///etc/passwd">]>'
+            b"<FacturaElectronica><Clave>&e;</Clave></FacturaElectronica>"
+        )
+        with self.assertRaises((safe_xml.XMLLimitError, etree.XMLSyntaxError)):
+            safe_xml.parse(document)
+
+    def test_parser_is_reusable_after_an_error(self):
+        with self.assertRaises(etree.XMLSyntaxError):
+            safe_xml.parse(b"<FacturaElectronica><Clave>")
+        with self.assertRaises(safe_xml.XMLLimitError):
+            safe_xml.parse(_document(lines=3), max_lines=1)
+        self.assertEqual(len(safe_xml.parse(_document(lines=2)).xpath("//*[local-name()='LineaDetalle']")), 2)
+
+    def test_large_document_is_parsed_in_chunks(self):
+        lines = safe_xml.CHUNK_SIZE // 20
+        root = safe_xml.parse(_document(lines=lines), max_lines=lines)
+        self.assertEqual(len(root.xpath("//*[local-name()='LineaDetalle']")), lines)
+
+    def test_root_name(self):
+        self.assertEqual(safe_xml.root_name(_document()), "FacturaElectronica")
+        self.assertEqual(safe_xml.root_name(b'<fe:NotaCreditoElectronica xmlns:fe="x">'), "NotaCreditoElectronica")
+        self.assertIsNone(safe_xml.root_name(b"no es XML"))
+        self.assertEqual(safe_xml.root_name(_document()), "FacturaElectronica", "The sniffing parser is reset.")
+
+    def test_one_parser_per_thread(self):
+        parsers = []
+        thread = threading.Thread(target=lambda: parsers.append(safe_xml._parser(("start", "end"))))
+        thread.start()
+        thread.join()
+        self.assertIsNot(parsers[0], safe_xml._parser(("start", "end")))
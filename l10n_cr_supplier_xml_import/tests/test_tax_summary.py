@@ -0,0 +1,45 @@
+from odoo.tests import tagged
+
+from .common import SupplierXMLCommon, supplier_xml
+
+LINES = [
+    {"quantity": 2, "price": 100.0, "rate": 13.0},
+    {"quantity": 1, "price": 50.0, "rate": 13.0, "exonerated": 6.5},
+    {"quantity": 1, "price": 30.0, "rate": None},
+]
+
+
+@tagged("post_install", "-at_install")
+class TestSupplierXMLTaxSummary(SupplierXMLCommon):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.xml_currency = cls.env["res.currency"].create({"name": "XTS", "symbol": "T", "rounding": 0.01})
+        cls.env["res.currency.rate"].create(
+            {"currency_id": cls.xml_currency.id, "name": "2024-01-01", "rate": 4.0, "company_id": False}
+        )
+
+    def _summary(self, move):
+        return {
+            (row.tax_code or "", row.rate): (row.base_amount, row.tax_amount, row.exonerated_amount)
+            for row in move.supplier_xml_tax_summary_ids
+        }
+
+    def test_invoice_in_company_currency(self):
+        move = self.import_xml(supplier_xml(lines=LINES))
+        self.assertEqual(move.move_type, "in_invoice")
+        self.assertEqual(move.supplier_xml_tax_summary_ids.currency_id, self.company.currency_id)
+        self.assertEqual(self._summary(move), {("01", 13.0): (250.0, 26.0, 6.5), ("", 0.0): (30.0, 0.0, 0.0)})
+
+    def test_foreign_currency_invoice_is_converted(self):
+        move = self.import_xml(supplier_xml(lines=LINES, currency="XTS", date="2024-07-01"))
+        self.assertEqual(move.currency_id, self.xml_currency)
+        self.assertEqual(move.supplier_xml_tax_summary_ids.currency_id, self.company.currency_id)
+        self.assertEqual(self._summary(move), {("01", 13.0): (62.5, 6.5, 1.63), ("", 0.0): (7.5, 0.0, 0.0)})
+
+    def test_refund_amounts_are_negated(self):
+        move = self.import_xml(supplier_xml(root="NotaCreditoElectronica", lines=LINES, currency="XTS"))
+        self.assertEqual(move.move_type, "in_refund")
+        self.assertEqual(
+            self._summary(move), {("01", 13.0): (-62.5, -6.5, -1.63), ("", 0.0): (-7.5, 0.0, 0.0)}
+        )
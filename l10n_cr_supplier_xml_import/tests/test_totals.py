@@ -0,0 +1,37 @@
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+
+from .common import SupplierXMLCommon, supplier_xml
+
+
+@tagged("post_install", "-at_install")
+class TestSupplierXMLTotals(SupplierXMLCommon):
+    def test_matching_document(self):
+        move = self.import_xml(supplier_xml())
+        self.assertEqual(move.supplier_xml_totals_state, "matched")
+        self.assertTrue(move.supplier_xml_taxes_mapped)
+
+    def test_exonerated_document_matches(self):
+        move = self.import_xml(supplier_xml(lines=[{"quantity": 2, "price": 50.0, "rate": 13.0, "exonerated": 6.5}]))
+        self.assertEqual(move.supplier_xml_totals_state, "matched", move.supplier_xml_totals_message)
+
+    def test_difference_within_tolerance(self):
+        move = self.import_xml(supplier_xml(number=1, total_tax=13.5))
+        self.assertEqual(move.supplier_xml_totals_state, "matched")
+
+        self.set_param("totals_tolerance", "0.1")
+        move = self.import_xml(supplier_xml(number=2, total_tax=13.5))
+        self.assertEqual(move.supplier_xml_totals_state, "mismatch")
+        self.assertIn("TotalImpuesto", move.supplier_xml_totals_message)
+
+    def test_reject_policy(self):
+        self.set_param("totals_policy", "reject")
+        with self.assertRaisesRegex(UserError, "no cuadran") as error:
+            self.import_xml(supplier_xml(total_tax=20.0))
+        self.assertEqual(error.exception.reason, "totals_mismatch")
+        self.assertFalse(self.env["account.move"].search([("supplier_xml_key", "!=", False)]))
+
+    def test_accept_policy_skips_the_check(self):
+        self.set_param("totals_policy", "accept")
+        move = self.import_xml(supplier_xml(total_tax=20.0))
+        self.assertFalse(move.supplier_xml_totals_state)
@@ -0,0 +1,165 @@
+import base64
+import hashlib
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+from cryptography.hazmat.primitives.serialization import Encoding
+from cryptography.x509.oid import NameOID
+from lxml import etree
+
+from odoo.tests import tagged
+from odoo.tests.common import BaseCase
+
+from ..tools import xades
+
+DS = xades.DS_NS
+C14N = "http://www.w3.org/TR/2001/REC-xml-c14n-20010315"
+DOCUMENT = (
+    b'<FacturaElectronica xmlns="https://cdn.comprobanteselectronicos.go.cr/xml-schemas/v4.4/facturaElectronica">'
+    b'<Clave>50601012400310112345600100001010000000001100000001</Clave>'
+    b'<Emisor><Identificacion><Tipo>02</Tipo><Numero>3101123456</Numero></Identificacion></Emisor>'
+    b'<ResumenFactura Id="summary"><TotalComprobante>113.00</TotalComprobante></ResumenFactura>'
+    b"</FacturaElectronica>"
+)
+
+
+def _key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def _certificate(common_name, key, issuer=None, issuer_key=None, ca=False, serial_number=None):
+    """Self-signed when ``issuer`` is omitted; ``ca`` sets BasicConstraints and keyCertSign."""
+    attributes = [x509.NameAttribute(NameOID.COMMON_NAME, common_name)]
+    if serial_number:
+        attributes.append(x509.NameAttribute(NameOID.SERIAL_NUMBER, serial_number))
+    subject = x509.Name(attributes)
+    now = datetime.now(timezone.utc)
+    return (
+        x509.CertificateBuilder()
+        .subject_name(subject)
+        .issuer_name(issuer.subject if issuer else subject)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - timedelta(days=1))
+        .not_valid_after(now + timedelta(days=1))
+        .add_extension(x509.BasicConstraints(ca=ca, path_length=None), critical=True)
+        .add_extension(
+            x509.KeyUsage(
+                digital_signature=True,
+                content_commitment=not ca,
+                key_encipherment=False,
+                data_encipherment=False,
+                key_agreement=False,
+                key_cert_sign=ca,
+                crl_sign=ca,
+                encipher_only=False,
+                decipher_only=False,
+            ),
+            critical=True,
+        )
+        .sign(issuer_key or key, hashes.SHA256())
+    )
+
+
+def _sign(document, key, certificates, uri=""):
+    """Return ``document`` with an enveloped RSA-SHA256 signature over ``uri`` by ``key``."""
+    root = etree.fromstring(document)
+    target = root if uri == "" else root.xpath("//*[@Id=$value]", value=uri[1:])[0]
+    digest = base64.b64encode(hashlib.sha256(etree.tostring(target, method="c14n")).digest()).decode()
+
+    signature = etree.SubElement(root, "{%s}Signature" % DS, nsmap={"ds": DS})
+    signed_info = etree.SubElement(signature, "{%s}SignedInfo" % DS)
+    etree.SubElement(signed_info, "{%s}CanonicalizationMethod" % DS, Algorithm=C14N)
+    etree.SubElement(
+        signed_info, "{%s}SignatureMethod" % DS, Algorithm="http://www.w3.org/2001/04/xmldsig-more#rsa-sha256"
+    )
+    reference = etree.SubElement(signed_info, "{%s}Reference" % DS, URI=uri)
+    transforms = etree.SubElement(reference, "{%s}Transforms" % DS)
+    if uri == "":
+        etree.SubElement(transforms, "{%s}Transform" % DS, Algorithm=xades.ENVELOPED_TRANSFORM)
+    etree.SubElement(transforms, "{%s}Transform" % DS, Algorithm=C14N)
+    etree.SubElement(reference, "{%s}DigestMethod" % DS, Algorithm="http://www.w3.org/2001/04/xmlenc#sha256")
+    etree.SubElement(reference, "{%s}DigestValue" % DS).text = digest
+    signature_value = etree.SubElement(signature, "{%s}SignatureValue" % DS)
+    x509_data = etree.SubElement(etree.SubElement(signature, "{%s}KeyInfo" % DS), "{%s}X509Data" % DS)
+    for certificate in certificates:
+        etree.SubElement(x509_data, "{%s}X509Certificate" % DS).text = base64.b64encode(
+            certificate.public_bytes(Encoding.DER)
+        ).decode()
+    signed_content = etree.tostring(signed_info, method="c14n")
+    signature_value.text = base64.b64encode(
+        key.sign(signed_content, padding.PKCS1v15(), hashes.SHA256())
+    ).decode()
+    return root
+
+
+@tagged("post_install", "-at_install")
+class TestXadesVerification(BaseCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.ca_key = _key()
+        cls.ca = _certificate("CA de prueba", cls.ca_key, ca=True)
+        cls.leaf_key = _key()
+        cls.leaf = _certificate(
+            "Proveedor X", cls.leaf_key, issuer=cls.ca, issuer_key=cls.ca_key, serial_number="CPJ-3-101-123456"
+        )
+        cls.anchors = {xades.fingerprint(cls.ca.public_bytes(Encoding.DER)): cls.ca}
+
+    def _verify(self, root, identification="3101123456"):
+        return xades.verify(root, self.anchors, identification=identification)
+
+    def test_valid_signature(self):
+        result = self._verify(_sign(DOCUMENT, self.leaf_key, [self.leaf]))
+        self.assertEqual(result["state"], "valid", result["message"])
+        self.assertIn("Proveedor X", result["subject"])
+
+    def test_unsigned_document(self):
+        self.assertEqual(self._verify(etree.fromstring(DOCUMENT))["state"], "unsigned")
+
+    def test_tampered_document_is_invalid(self):
+        root = _sign(DOCUMENT, self.leaf_key, [self.leaf])
+        root.xpath("//*[local-name()='TotalComprobante']")[0].text = "1.00"
+        self.assertEqual(self._verify(root)["state"], "invalid")
+
+    def test_partial_reference_is_invalid(self):
+        root = _sign(DOCUMENT, self.leaf_key, [self.leaf], uri="#summary")
+        self.assertEqual(self._verify(root)["state"], "invalid")
+
+    def test_other_taxpayer_is_invalid(self):
+        root = _sign(DOCUMENT, self.leaf_key, [self.leaf])
+        self.assertEqual(self._verify(root, identification="3101999999")["state"], "invalid")
+
+    def test_unknown_ca_is_untrusted(self):
+        other_key = _key()
+        other_ca = _certificate("Otra CA", other_key, ca=True)
+        leaf = _certificate(
+            "Proveedor X", self.leaf_key, issuer=other_ca, issuer_key=other_key, serial_number="CPJ-3-101-123456"
+        )
+        self.assertEqual(self._verify(_sign(DOCUMENT, self.leaf_key, [leaf, other_ca]))["state"], "untrusted")
+
+    def test_leaf_cannot_issue_certificates(self):
+        forged_key = _key()
+        forged = _certificate(
+            "Proveedor X (forged)",
+            forged_key,
+            issuer=self.leaf,
+            issuer_key=self.leaf_key,
+            serial_number="CPJ-3-101-123456",
+        )
+        result = self._verify(_sign(DOCUMENT, forged_key, [forged, self.leaf]))
+        self.assertEqual(result["state"], "untrusted", result["message"])
+
+    def test_trust_store_skips_malformed_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, "ca.pem"), "wb") as ca_file:
+                ca_file.write(self.ca.public_bytes(Encoding.PEM))
+            with open(os.path.join(directory, "broken.crt"), "wb") as broken_file:
+                broken_file.write(b"not a certificate")
+            with self.assertLogs(xades._logger.name, level="WARNING"):
+                anchors = xades.load_trust_store(directory)
+        self.assertEqual(list(anchors), list(self.anchors))
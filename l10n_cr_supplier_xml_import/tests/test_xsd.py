@@ -0,0 +1,92 @@
+import os
+import tempfile
+
+from lxml import etree
+
+from odoo.tests import tagged
+from odoo.tests.common import BaseCase
+
+from ..models.account_move import SupplierXMLRejected
+from ..tools import xsd
+from .common import NAMESPACE, SupplierXMLCommon, supplier_xml
+
+INVOICE_NS = NAMESPACE % "facturaElectronica"
+SCHEMA = """<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema" xmlns:c="urn:supplier-xml:test"
+    targetNamespace="%s" elementFormDefault="qualified">
+    <xs:import namespace="urn:supplier-xml:test" schemaLocation="https://cdn.example.invalid/xsd/Comun.xsd"/>
+    <xs:element name="FacturaElectronica">
+        <xs:complexType>
+            <xs:sequence>
+                <xs:element name="Clave" type="c:Clave"/>
+                <xs:any namespace="##targetNamespace" processContents="skip" minOccurs="0" maxOccurs="unbounded"/>
+            </xs:sequence>
+        </xs:complexType>
+    </xs:element>
+</xs:schema>""" % INVOICE_NS
+COMMON_SCHEMA = """<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema" targetNamespace="urn:supplier-xml:test">
+    <xs:simpleType name="Clave">
+        <xs:restriction base="xs:string"><xs:pattern value="\\d{50}"/></xs:restriction>
+    </xs:simpleType>
+</xs:schema>"""
+
+
+def _write_schemas(directory):
+    for filename, content in (("FacturaElectronica_V4.4.xsd", SCHEMA), ("Comun.xsd", COMMON_SCHEMA)):
+        with open(os.path.join(directory, filename), "w", encoding="utf-8") as schema_file:
+            schema_file.write(content)
+
+
+def _document(key, namespace=INVOICE_NS):
+    return etree.fromstring(
+        '<FacturaElectronica xmlns="%s"><Clave>%s</Clave><NumeroConsecutivo>1</NumeroConsecutivo>'
+        "</FacturaElectronica>" % (namespace, key)
+    )
+
+
+@tagged("post_install", "-at_install")
+class TestXSD(BaseCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        schema_directory = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(schema_directory.cleanup)
+        cls.directory = schema_directory.name
+        _write_schemas(cls.directory)
+
+    def test_document_version(self):
+        self.assertEqual(xsd.document_version(_document("1")), "4.4")
+        self.assertFalse(xsd.document_version(_document("1", namespace="urn:sin-version")))
+
+    def test_valid_document(self):
+        self.assertEqual(xsd.validate(_document("5" * 50), directory=self.directory), ("4.4", []))
+
+    def test_invalid_document_reports_the_line(self):
+        version, errors = xsd.validate(_document("123"), directory=self.directory)
+        self.assertEqual(version, "4.4")
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(errors[0].startswith("línea 1:"))
+
+    def test_missing_schema(self):
+        with self.assertRaises(LookupError):
+            xsd.validate(
+                _document("1", namespace=NAMESPACE.replace("4.4", "4.3") % "facturaElectronica"),
+                directory=self.directory,
+            )
+
+    def test_compiled_schema_is_cached(self):
+        cached = xsd.get_schema("FacturaElectronica", "4.4", directory=self.directory)
+        self.assertIs(xsd.get_schema("FacturaElectronica", "4.4", directory=self.directory), cached)
+
+
+@tagged("post_install", "-at_install")
+class TestXSDStrictMode(SupplierXMLCommon):
+    def test_strict_mode(self):
+        self.set_param("xsd_strict_mode", "True")
+        with tempfile.TemporaryDirectory() as directory:
+            self.set_param("xsd_directory", directory)
+            with self.assertRaises(SupplierXMLRejected) as missing:
+                self.import_xml(supplier_xml(number=1))
+            self.assertEqual(missing.exception.reason, "schema_missing")
+
+            _write_schemas(directory)
+            self.assertTrue(self.import_xml(supplier_xml(number=2)))
@@ -0,0 +1,7 @@
+from . import cache_version
+from . import imap
+from . import lru
+from . import metrics
+from . import safe_xml
+from . import xsd
+from . import xades
@@ -0,0 +1,43 @@
+"""Per-database versions of the in-memory import caches, kept in a table so they follow transactions.
+
+A worker reads a version in its own snapshot and puts it in its cache keys. Changing the cached data
+bumps the version in the same transaction, so other workers see the new version together with the new
+rows. Until it commits, a transaction that bumped a version must not cache what it reads: ``get``
+returns ``None`` for it.
+"""
+
+TABLE = "supplier_xml_cache_version"
+
+
+def create_table(cr):
+    cr.execute(
+        """
+        CREATE TABLE IF NOT EXISTS %s (
+            name varchar PRIMARY KEY,
+            version bigint NOT NULL DEFAULT 0
+        )
+        """ % TABLE
+    )
+
+
+def get(cr, name):
+    """Version of cache ``name`` in the current snapshot, or ``None`` if this transaction changed it."""
+    if cr.postcommit.data.get((TABLE, name)):
+        return None
+    cr.execute("SELECT version FROM %s WHERE name = %%s" % TABLE, [name])
+    row = cr.fetchone()
+    return row[0] if row else 0
+
+
+def bump(cr, name):
+    """Bump the version of cache ``name`` once per transaction."""
+    if cr.postcommit.data.get((TABLE, name)):
+        return
+    cr.execute(
+        """
+        INSERT INTO {table} (name, version) VALUES (%s, 1)
+        ON CONFLICT (name) DO UPDATE SET version = {table}.version + 1
+        """.format(table=TABLE),
+        [name],
+    )
+    cr.postcommit.data[(TABLE, name)] = True
@@ -0,0 +1,421 @@
+"""Incremental IMAP helpers: UID search, BODYSTRUCTURE parsing and partial part downloads.
+
+Only works on an ``imaplib.IMAP4``-like connection, so a local stand-in
+exposing ``select``, ``response`` and ``uid`` can be used instead of a server.
+Messages are read with ``BODY.PEEK`` and their flags are left untouched.
+Authenticated sessions are kept in a per-process ``ConnectionPool`` and can
+wait for new mail with ``IDLE``.
+"""
+import base64
+import binascii
+import contextlib
+import itertools
+import quopri
+import re
+import select
+import ssl
+import threading
+import time
+
+XML_MIMETYPES = {"text/xml", "application/xml"}
+ZIP_MIMETYPES = {"application/zip", "application/x-zip-compressed"}
+MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+_LITERAL_SUFFIX = re.compile(rb"\{\d+\}\s*$")
+_TOKEN = re.compile(rb'\(|\)|"(?:[^"\\]|\\.)*"|[^\s()"]+')
+_IDLE_TAGS = itertools.count(1)
+
+
+class IMAPError(Exception):
+    """Raised when the server answers a command with something other than OK."""
+
+
+class IMAPUnavailable(IMAPError):
+    """Raised when a server is backing off after failures or has no free connection slot."""
+
+
+def imap_date(value):
+    """Format a date for ``SEARCH SINCE/BEFORE`` independently of the process locale."""
+    return "%02d-%s-%04d" % (value.day, MONTHS[value.month - 1], value.year)
+
+
+def _check(result, command):
+    status, data = result
+    if status != "OK":
+        raise IMAPError("%s: %s" % (command, data))
+    return data
+
+
+def _tokens(chunk):
+    for match in _TOKEN.finditer(chunk):
+        token = match.group()
+        if token == b"(" or token == b")":
+            yield token
+        elif token.startswith(b'"'):
+            yield re.sub(rb"\\(.)", rb"\1", token[1:-1]).decode("utf-8", "replace")
+        elif token.upper() == b"NIL":
+            yield None
+        else:
+            yield token.decode("ascii", "replace")
+
+
+def parse_fetch_response(data):
+    """Parse the ``data`` list returned by ``uid("FETCH", ...)`` into nested lists.
+
+    Parenthesized lists become lists, quoted strings and atoms become ``str``,
+    ``NIL`` becomes ``None`` and literals are kept as ``bytes``.
+    """
+    tokens = []
+    for item in data or []:
+        if isinstance(item, tuple):
+            tokens.extend(_tokens(_LITERAL_SUFFIX.sub(b"", item[0])))
+            tokens.append(item[1])
+        elif item:
+            tokens.extend(_tokens(item))
+
+    root = []
+    stack = [root]
+    for token in tokens:
+        if token == b"(":
+            stack.append([])
+        elif token == b")":
+            if len(stack) > 1:
+                child = stack.pop()
+                stack[-1].append(child)
+        else:
+            stack[-1].append(token)
+    return root
+
+
+def fetch_item(parsed, name):
+    """Return the value of ``name`` (e.g. ``BODYSTRUCTURE`` or ``BODY[2]``) in a parsed FETCH response."""
+    for element in parsed:
+        if not isinstance(element, list):
+            continue
+        for index in range(0, len(element) - 1, 2):
+            key = element[index]
+            if isinstance(key, str) and key.upper() == name.upper():
+                return element[index + 1]
+    return None
+
+
+def _params(value):
+    if not isinstance(value, list):
+        return {}
+    return {
+        str(value[index]).lower(): value[index + 1]
+        for index in range(0, len(value) - 1, 2)
+        if isinstance(value[index], str)
+    }
+
+
+def _text(value):
+    if isinstance(value, bytes):
+        return value.decode("utf-8", "replace")
+    return value
+
+
+def bodystructure_parts(structure, section=""):
+    """Flatten a parsed ``BODYSTRUCTURE`` into leaf parts with their IMAP section numbers.
+
+    Each part is a dict with ``section``, ``mimetype``, ``filename``, ``encoding`` and ``size``.
+    Messages attached as ``message/rfc822`` are walked as well.
+    """
+    if not isinstance(structure, list) or not structure:
+        return []
+    if isinstance(structure[0], list):
+        parts = []
+        children = []
+        for child in structure:
+            if not isinstance(child, list):
+                break
+            children.append(child)
+        for index, child in enumerate(children, start=1):
+            parts.extend(bodystructure_parts(child, "%s.%d" % (section, index) if section else str(index)))
+        return parts
+
+    main_type = (_text(structure[0]) or "").lower()
+    sub_type = (_text(structure[1]) or "").lower() if len(structure) > 1 else ""
+    own_section = section or "1"
+    if main_type == "message" and sub_type == "rfc822" and len(structure) > 8 and isinstance(structure[8], list):
+        nested = structure[8]
+        if nested and isinstance(nested[0], list):
+            return bodystructure_parts(nested, own_section)
+        return bodystructure_parts(nested, own_section + ".1")
+
+    if main_type == "text":
+        disposition_index = 9
+    elif main_type == "message" and sub_type == "rfc822":
+        disposition_index = 11
+    else:
+        disposition_index = 8
+    disposition = structure[disposition_index] if len(structure) > disposition_index else None
+    disposition_params = _params(disposition[1]) if isinstance(disposition, list) and len(disposition) > 1 else {}
+    filename = _text(disposition_params.get("filename")) or _text(_params(structure[2]).get("name"))
+    size = structure[6] if len(structure) > 6 else None
+    return [
+        {
+            "section": own_section,
+            "mimetype": "%s/%s" % (main_type, sub_type),
+            "filename": filename or False,
+            "encoding": (_text(structure[5]) or "").lower() if len(structure) > 5 else "",
+            "size": int(size) if isinstance(size, str) and size.isdigit() else 0,
+        }
+    ]
+
+
+def is_candidate_part(part):
+    """Whether a part may hold supplier XML (an XML or ZIP attachment)."""
+    filename = (part["filename"] or "").lower()
+    return (
+        part["mimetype"] in XML_MIMETYPES
+        or part["mimetype"] in ZIP_MIMETYPES
+        or filename.endswith(".xml")
+        or filename.endswith(".zip")
+    )
+
+
+def decode_part(payload, encoding):
+    if isinstance(payload, str):
+        payload = payload.encode()
+    payload = payload or b""
+    if encoding == "base64":
+        try:
+            return base64.b64decode(payload)
+        except (binascii.Error, ValueError):
+            return b""
+    if encoding == "quoted-printable":
+        return quopri.decodestring(payload)
+    return payload
+
+
+def select_folder(connection, folder):
+    """Open ``folder`` read-only and return its ``UIDVALIDITY``."""
+    if " " in folder and not folder.startswith('"'):
+        folder = '"%s"' % folder
+    _check(connection.select(folder, readonly=True), "SELECT")
+    _name, values = connection.response("UIDVALIDITY")
+    values = [value for value in values or [] if value]
+    if not values:
+        raise IMAPError("SELECT: the server did not report UIDVALIDITY")
+    value = values[-1]
+    return int(value.decode() if isinstance(value, bytes) else value)
+
+
+def search_new_uids(connection, last_uid, since=None, before=None):
+    """Return the UIDs above ``last_uid``, in ascending order, filtered on the server by date."""
+    criteria = ["UID", "%d:*" % (last_uid + 1)]
+    if since:
+        criteria += ["SINCE", imap_date(since)]
+    if before:
+        criteria += ["BEFORE", imap_date(before)]
+    data = _check(connection.uid("SEARCH", None, *criteria), "SEARCH")
+    uids = {int(uid) for chunk in data if chunk for uid in chunk.split()}
+    return sorted(uid for uid in uids if uid > last_uid)
+
+
+def fetch_message(connection, uid):
+    """Return ``(header_bytes, attachments)`` for ``uid`` downloading only the XML/ZIP parts.
+
+    ``attachments`` holds ``(filename, payload, {"mimetype": ...})`` tuples like incoming mail attachments.
+    """
+    uid = str(uid)
+    structure = fetch_item(
+        parse_fetch_response(_check(connection.uid("FETCH", uid, "(UID BODYSTRUCTURE)"), "FETCH")),
+        "BODYSTRUCTURE",
+    )
+    header = fetch_item(
+        parse_fetch_response(_check(connection.uid("FETCH", uid, "(UID BODY.PEEK[HEADER])"), "FETCH")),
+        "BODY[HEADER]",
+    )
+    attachments = []
+    for part in bodystructure_parts(structure):
+        if not is_candidate_part(part):
+            continue
+        item = "BODY[%s]" % part["section"]
+        data = _check(connection.uid("FETCH", uid, "(UID BODY.PEEK[%s])" % part["section"]), "FETCH")
+        payload = decode_part(fetch_item(parse_fetch_response(data), item), part["encoding"])
+        if payload:
+            filename = part["filename"] or "%s-%s.xml" % (uid, part["section"])
+            attachments.append((filename, payload, {"mimetype": part["mimetype"]}))
+    if isinstance(header, str):
+        header = header.encode()
+    return header or b"", attachments
+
+
+def _quiet_logout(connection):
+    try:
+        connection.logout()
+    except Exception:  # noqa: BLE001 - the connection is being dropped anyway
+        pass
+
+
+@contextlib.contextmanager
+def single_session(connect):
+    """Open a connection with ``connect`` for one use and log out afterwards."""
+    connection = connect()
+    try:
+        yield connection
+    finally:
+        _quiet_logout(connection)
+
+
+class ConnectionPool:
+    """Authenticated IMAP sessions reused across polls within one process.
+
+    At most ``max_per_server`` connections (in use or idle) are open per
+    ``(host, port)``. Idle sessions are checked with ``NOOP`` before reuse and
+    closed after ``max_idle_seconds``. Failed connects put the session key in
+    exponential backoff, capped at ``max_backoff`` seconds.
+    """
+
+    def __init__(self, max_per_server=4, max_idle_seconds=600, max_backoff=300):
+        self.max_per_server = max_per_server
+        self.max_idle_seconds = max_idle_seconds
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._open = {}
+        self._failures = {}
+
+    @contextlib.contextmanager
+    def session(self, key, server, connect):
+        """Yield an authenticated connection for ``key`` on ``server``; ``connect()`` opens a new one.
+
+        A connection is returned to the pool after a clean use and dropped if the body raised.
+        """
+        connection = self._checkout(key, server, connect)
+        try:
+            yield connection
+        except BaseException:
+            self._discard(server, connection)
+            raise
+        self._checkin(key, server, connection)
+
+    def _checkout(self, key, server, connect):
+        while True:
+            with self._lock:
+                failures, retry_at = self._failures.get(key, (0, 0.0))
+                if retry_at > time.monotonic():
+                    raise IMAPUnavailable("backing off after %d failed connections" % failures)
+                idle = self._idle.get(key)
+                entry = idle.pop() if idle else None
+                if entry is None:
+                    if self._open.get(server, 0) >= self.max_per_server and not self._close_idle_on(server):
+                        raise IMAPUnavailable("no free connection slot for %s:%s" % server)
+                    self._open[server] = self._open.get(server, 0) + 1
+                    break
+            connection, last_used, _server = entry
+            if time.monotonic() - last_used < self.max_idle_seconds:
+                try:
+                    if connection.noop()[0] == "OK":
+                        return connection
+                except Exception:  # noqa: BLE001 - a dead session is simply replaced
+                    pass
+            self._discard(server, connection)
+
+        try:
+            connection = connect()
+        except BaseException:
+            with self._lock:
+                self._open[server] -= 1
+                failures = self._failures.get(key, (0, 0.0))[0] + 1
+                self._failures[key] = (failures, time.monotonic() + min(self.max_backoff, 2 ** failures))
+            raise
+        with self._lock:
+            self._failures.pop(key, None)
+        return connection
+
+    def _checkin(self, key, server, connection):
+        with self._lock:
+            self._idle.setdefault(key, []).append((connection, time.monotonic(), server))
+
+    def _discard(self, server, connection):
+        _quiet_logout(connection)
+        with self._lock:
+            self._open[server] = max(0, self._open.get(server, 0) - 1)
+
+    def _close_idle_on(self, server):
+        """Close one idle session on ``server`` to free a slot; the lock is held."""
+        for idle in self._idle.values():
+            for index, (connection, _last_used, idle_server) in enumerate(idle):
+                if idle_server == server:
+                    del idle[index]
+                    _quiet_logout(connection)
+                    self._open[server] -= 1
+                    return True
+        return False
+
+
+def _socket(connection):
+    return getattr(connection, "sock", None)
+
+
+def _idle_tag():
+    """Tag for an ``IDLE`` command; the prefix never clashes with the tags imaplib generates."""
+    return b"CRIDLE%d" % next(_IDLE_TAGS)
+
+
+def _readable(connection):
+    """Whether ``connection`` has a response to read, already buffered in ``connection.file`` or on the socket.
+
+    The buffer is peeked with the socket in non-blocking mode so an empty one returns at once.
+    """
+    sock = _socket(connection)
+    timeout = sock.gettimeout()
+    sock.settimeout(0)
+    try:
+        return bool(connection.file.peek(1))
+    except (BlockingIOError, ssl.SSLWantReadError):
+        return False
+    finally:
+        sock.settimeout(timeout)
+
+
+def idle_wait(connections, timeout):
+    """Put every connection in ``IDLE`` and wait until some mailbox reports new mail or ``timeout`` elapses.
+
+    ``connections`` maps a key to a connection with a selected folder. Returns the keys whose mailbox
+    changed (``EXISTS``). Every connection leaves ``IDLE`` before returning.
+    """
+    idling = {}
+    for key, connection in connections.items():
+        tag = _idle_tag()
+        connection.send(tag + b" IDLE\r\n")
+        if not connection.readline().startswith(b"+"):
+            raise IMAPError("IDLE is not supported by the server")
+        idling[key] = (connection, tag)
+
+    changed = set()
+    deadline = time.monotonic() + timeout
+    try:
+        while idling and not changed:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            ready = [key for key, (connection, _tag) in idling.items() if _readable(connection)]
+            if not ready:
+                sockets = {_socket(connection): key for key, (connection, _tag) in idling.items()}
+                selected, _write, _error = select.select(list(sockets), [], [], remaining)
+                ready = [sockets[sock] for sock in selected]
+            for key in ready:
+                line = idling[key][0].readline()
+                if not line:
+                    raise IMAPError("connection closed during IDLE")
+                if line.startswith(b"*") and line.rstrip().upper().endswith(b"EXISTS"):
+                    changed.add(key)
+    finally:
+        for connection, tag in idling.values():
+            connection.send(b"DONE\r\n")
+        for key, (connection, tag) in idling.items():
+            while True:
+                line = connection.readline()
+                if not line:
+                    raise IMAPError("connection closed while leaving IDLE")
+                if line.startswith(b"*") and line.rstrip().upper().endswith(b"EXISTS"):
+                    changed.add(key)
+                if line.startswith(tag):
+                    if not line[len(tag):].strip().upper().startswith(b"OK"):
+                        raise IMAPError(line.decode("ascii", "replace"))
+                    break
+    return changed
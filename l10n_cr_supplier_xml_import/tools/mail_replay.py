@@ -0,0 +1,294 @@
+"""Replay a corpus of ``.eml`` files through the mail gateway to measure end-to-end throughput.
+
+Generate a synthetic corpus addressed to a gateway alias::
+
+    python -m odoo.addons.l10n_cr_supplier_xml_import.tools.mail_replay generate \
+        --output /tmp/corpus --count 500 --to facturas@example.com --receiver-vat 3101123456
+
+Replay it against a local database (``--`` separates the Odoo server options)::
+
+    python -m odoo.addons.l10n_cr_supplier_xml_import.tools.mail_replay replay \
+        --corpus /tmp/corpus --rate 20 --concurrency 4 -- -c odoo.conf -d loadtest
+
+Each email goes through ``mail.thread.message_process`` in its own cursor, as
+the mail gateway does. The report gives emails/sec, p50/p95/p99 latency,
+queries per email, errors and the number of sessions waiting on locks sampled
+from ``pg_stat_activity``. Never run it against a production database.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from email.utils import format_datetime, make_msgid
+
+LOCK_SAMPLE_INTERVAL = 0.1
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of ``values`` (``fraction`` between 0 and 1)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _clave(issue_date, emitter_vat, consecutive, rng=random):
+    return "506%s%012d%s1%08d" % (
+        issue_date.strftime("%d%m%y"),
+        int(emitter_vat),
+        consecutive,
+        rng.randrange(10**8),
+    )
+
+
+def synthetic_invoice_xml(clave, consecutive, issue_date, emitter_vat, receiver_vat, lines=3):
+    """Return a FacturaElectronica 4.4 document whose totals reconcile."""
+    detail = []
+    total_sale = total_tax = 0.0
+    for number in range(1, lines + 1):
+        quantity, price = number, 1000.0 * number
+        amount = quantity * price
+        tax = round(amount * 0.13, 2)
+        total_sale += amount
+        total_tax += tax
+        detail.append(
+            "<LineaDetalle><NumeroLinea>%d</NumeroLinea><CodigoCABYS>4321000000100</CodigoCABYS>"
+            "<Cantidad>%d</Cantidad><UnidadMedida>Unid</UnidadMedida><Detalle>Articulo %d</Detalle>"
+            "<PrecioUnitario>%.2f</PrecioUnitario><MontoTotal>%.2f</MontoTotal><SubTotal>%.2f</SubTotal>"
+            "<Impuesto><Codigo>01</Codigo><CodigoTarifaIVA>08</CodigoTarifaIVA><Tarifa>13</Tarifa>"
+            "<Monto>%.2f</Monto></Impuesto><ImpuestoNeto>%.2f</ImpuestoNeto>"
+            "<MontoTotalLinea>%.2f</MontoTotalLinea></LineaDetalle>"
+            % (number, quantity, number, price, amount, amount, tax, tax, amount + tax)
+        )
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>'
+        '<FacturaElectronica xmlns="https://cdn.comprobanteselectronicos.go.cr/xml-schemas/v4.4/facturaElectronica">'
+        "<Clave>%(clave)s</Clave><NumeroConsecutivo>%(consecutive)s</NumeroConsecutivo>"
+        "<FechaEmision>%(date)s</FechaEmision>"
+        "<Emisor><Nombre>Proveedor %(emitter)s</Nombre><Identificacion><Tipo>02</Tipo>"
+        "<Numero>%(emitter)s</Numero></Identificacion></Emisor>"
+        "<Receptor><Nombre>Receptor</Nombre><Identificacion><Tipo>02</Tipo>"
+        "<Numero>%(receiver)s</Numero></Identificacion></Receptor>"
+        "<CondicionVenta>01</CondicionVenta><DetalleServicio>%(detail)s</DetalleServicio>"
+        "<ResumenFactura><CodigoTipoMoneda><CodigoMoneda>CRC</CodigoMoneda><TipoCambio>1</TipoCambio>"
+        "</CodigoTipoMoneda><TotalVenta>%(sale).2f</TotalVenta><TotalDescuentos>0.00</TotalDescuentos>"
+        "<TotalVentaNeta>%(sale).2f</TotalVentaNeta><TotalImpuesto>%(tax).2f</TotalImpuesto>"
+        "<TotalComprobante>%(total).2f</TotalComprobante></ResumenFactura></FacturaElectronica>"
+        % {
+            "clave": clave,
+            "consecutive": consecutive,
+            "date": issue_date.strftime("%Y-%m-%dT%H:%M:%S-06:00"),
+            "emitter": emitter_vat,
+            "receiver": receiver_vat,
+            "detail": "".join(detail),
+            "sale": total_sale,
+            "tax": total_tax,
+            "total": total_sale + total_tax,
+        }
+    ).encode()
+
+
+def generate_corpus(output, count, to, receiver_vat, emitters=50, lines=3, pdf_kb=200, seed=None):
+    """Write ``count`` synthetic supplier emails (XML invoice plus a filler PDF) to ``output``."""
+    rng = random.Random(seed)
+    os.makedirs(output, exist_ok=True)
+    start = datetime.now() - timedelta(days=1)
+    pdf = b"%PDF-1.4\n" + os.urandom(pdf_kb * 1024)
+    for index in range(count):
+        emitter_vat = "3101%06d" % rng.randrange(emitters)
+        issue_date = start + timedelta(seconds=index)
+        consecutive = "00100001010%09d" % (index + 1)
+        clave = _clave(issue_date, emitter_vat, consecutive, rng=rng)
+        message = EmailMessage()
+        message["From"] = "facturacion@proveedor%s.example.com" % emitter_vat
+        message["To"] = to
+        message["Subject"] = "Factura electronica %s" % consecutive
+        message["Date"] = format_datetime(issue_date.astimezone())
+        message["Message-ID"] = make_msgid(domain="replay.example.com")
+        message.set_content("Adjuntamos la factura electronica %s." % consecutive)
+        message.add_attachment(
+            synthetic_invoice_xml(clave, consecutive, issue_date, emitter_vat, receiver_vat, lines=lines),
+            maintype="application",
+            subtype="xml",
+            filename="%s.xml" % clave,
+        )
+        message.add_attachment(pdf, maintype="application", subtype="pdf", filename="%s.pdf" % clave)
+        with open(os.path.join(output, "%06d.eml" % index), "wb") as eml_file:
+            eml_file.write(bytes(message))
+    return count
+
+
+class LockSampler(threading.Thread):
+    """Sample ``pg_stat_activity`` for sessions of the database waiting on a lock."""
+
+    def __init__(self, registry):
+        super().__init__(daemon=True)
+        self.registry = registry
+        self.samples = []
+        self._stop_event = threading.Event()
+
+    def run(self):
+        with self.registry.cursor() as cr:
+            while not self._stop_event.is_set():
+                cr.execute(
+                    """
+                    SELECT count(*)
+                      FROM pg_stat_activity
+                     WHERE datname = current_database()
+                       AND wait_event_type = 'Lock'
+                    """
+                )
+                self.samples.append(cr.fetchone()[0])
+                cr.rollback()
+                self._stop_event.wait(LOCK_SAMPLE_INTERVAL)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def replay(registry, paths, rate=0.0, concurrency=1, rollback=False):
+    """Process each ``.eml`` of ``paths`` with ``message_process`` and return the measurements."""
+    from odoo import SUPERUSER_ID, api
+
+    results = []
+    results_lock = threading.Lock()
+    started_at = time.monotonic()
+
+    def process(index, path):
+        if rate:
+            delay = started_at + index / rate - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        with open(path, "rb") as eml_file:
+            message = eml_file.read()
+        threading.current_thread().dbname = registry.db_name
+        error = False
+        begin = time.perf_counter()
+        with registry.cursor() as cr:
+            queries_before = cr.sql_log_count
+            try:
+                api.Environment(cr, SUPERUSER_ID, {})["mail.thread"].message_process(False, message)
+            except Exception as exc:  # noqa: BLE001 - every failure is reported, not raised
+                error = "%s: %s" % (type(exc).__name__, exc)
+                cr.rollback()
+            queries = cr.sql_log_count - queries_before
+            if rollback:
+                cr.rollback()
+        with results_lock:
+            results.append(
+                {"path": path, "seconds": time.perf_counter() - begin, "queries": queries, "error": error}
+            )
+
+    sampler = LockSampler(registry)
+    sampler.start()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(process, range(len(paths)), paths))
+    finally:
+        sampler.stop()
+    elapsed = time.monotonic() - started_at
+    return summarize(results, elapsed, sampler.samples)
+
+
+def summarize(results, elapsed, lock_samples):
+    latencies = [result["seconds"] for result in results]
+    queries = [result["queries"] for result in results]
+    errors = [result for result in results if result["error"]]
+    return {
+        "emails": len(results),
+        "errors": len(errors),
+        "first_errors": [result["error"] for result in errors[:5]],
+        "elapsed_seconds": round(elapsed, 3),
+        "emails_per_second": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        "latency_p50": round(percentile(latencies, 0.50), 4),
+        "latency_p95": round(percentile(latencies, 0.95), 4),
+        "latency_p99": round(percentile(latencies, 0.99), 4),
+        "latency_max": round(max(latencies), 4) if latencies else 0.0,
+        "queries_per_email_mean": round(statistics.fmean(queries), 1) if queries else 0.0,
+        "queries_per_email_max": max(queries) if queries else 0,
+        "lock_waiting_sessions_max": max(lock_samples) if lock_samples else 0,
+        "lock_waiting_sessions_mean": round(statistics.fmean(lock_samples), 2) if lock_samples else 0.0,
+        "lock_samples_with_waits": sum(1 for sample in lock_samples if sample),
+        "lock_samples": len(lock_samples),
+    }
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="Write a synthetic .eml corpus.")
+    generate.add_argument("--output", required=True)
+    generate.add_argument("--count", type=int, default=100)
+    generate.add_argument("--to", required=True, help="Gateway alias address.")
+    generate.add_argument("--receiver-vat", required=True, help="Company VAT used as Receptor.")
+    generate.add_argument("--emitters", type=int, default=50)
+    generate.add_argument("--lines", type=int, default=3)
+    generate.add_argument("--pdf-kb", type=int, default=200)
+    generate.add_argument("--seed", type=int)
+
+    run = commands.add_parser("replay", help="Replay a corpus through message_process.")
+    run.add_argument("--corpus", required=True, help="Directory of .eml files.")
+    run.add_argument("--rate", type=float, default=0.0, help="Emails per second; 0 replays as fast as possible.")
+    run.add_argument("--concurrency", type=int, default=1)
+    run.add_argument("--limit", type=int, default=0)
+    run.add_argument("--rollback", action="store_true", help="Roll back every email instead of committing.")
+    run.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    run.add_argument("odoo_args", nargs=argparse.REMAINDER, help="Odoo server options after --.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    if args.command == "generate":
+        count = generate_corpus(
+            args.output,
+            args.count,
+            args.to,
+            args.receiver_vat,
+            emitters=args.emitters,
+            lines=args.lines,
+            pdf_kb=args.pdf_kb,
+            seed=args.seed,
+        )
+        print("%d emails written to %s" % (count, args.output))
+        return
+
+    import odoo
+    from odoo.modules.registry import Registry
+    from odoo.tools import config
+
+    odoo_args = [arg for arg in args.odoo_args if arg != "--"]
+    config.parse_config(odoo_args)
+    db_name = config["db_name"]
+    if isinstance(db_name, (list, tuple)):
+        db_name = db_name[0]
+    if not db_name:
+        raise SystemExit("Pass the database with -d after --.")
+    odoo.tools.config["workers"] = 0
+    registry = Registry(db_name)
+
+    paths = sorted(
+        os.path.join(args.corpus, name) for name in os.listdir(args.corpus) if name.lower().endswith(".eml")
+    )
+    if args.limit:
+        paths = paths[: args.limit]
+    report = replay(registry, paths, rate=args.rate, concurrency=args.concurrency, rollback=args.rollback)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for key, value in report.items():
+        print("%-28s %s" % (key, value))
+
+
+if __name__ == "__main__":
+    main()
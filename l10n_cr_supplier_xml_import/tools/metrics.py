@@ -0,0 +1,93 @@
+"""In-process counters and latency histograms for the supplier XML import pipeline.
+
+Values are accumulated per database in memory and drained periodically into the
+shared ``supplier_xml_metric`` table, which aggregates them across workers.
+"""
+import threading
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRICS = {
+    "supplier_xml_documents_imported_total": ("counter", "Documentos XML importados."),
+    "supplier_xml_documents_duplicate_total": ("counter", "Documentos o correos omitidos por duplicados."),
+    "supplier_xml_documents_rejected_total": ("counter", "Documentos XML rechazados por motivo."),
+    "supplier_xml_emails_ignored_date_total": ("counter", "Correos ignorados por el rango de fechas configurado."),
+    "supplier_xml_parse_seconds": ("histogram", "Tiempo de lectura del XML por buzón."),
+    "supplier_xml_create_seconds": ("histogram", "Tiempo de creación de la factura por buzón."),
+}
+
+_lock = threading.Lock()
+_pending = {}
+
+
+def _labels_key(labels):
+    return ",".join('%s="%s"' % (key, str(value).replace('"', "'")) for key, value in sorted(labels.items()))
+
+
+def _add(dbname, name, labels_key, value):
+    key = (dbname, name, labels_key)
+    _pending[key] = _pending.get(key, 0.0) + value
+
+
+def inc(dbname, name, value=1.0, **labels):
+    with _lock:
+        _add(dbname, name, _labels_key(labels), value)
+
+
+def observe(dbname, name, seconds, **labels):
+    base_labels = _labels_key(labels)
+    with _lock:
+        for bucket in LATENCY_BUCKETS:
+            _add(dbname, name + "_bucket", _labels_key(dict(labels, le=bucket)), 1.0 if seconds <= bucket else 0.0)
+        _add(dbname, name + "_bucket", _labels_key(dict(labels, le="+Inf")), 1.0)
+        _add(dbname, name + "_sum", base_labels, seconds)
+        _add(dbname, name + "_count", base_labels, 1.0)
+
+
+def drain(dbname):
+    """Return and reset the pending ``(name, labels, value)`` deltas of ``dbname``."""
+    with _lock:
+        keys = [key for key in _pending if key[0] == dbname]
+        return [(name, labels, _pending.pop((db, name, labels))) for db, name, labels in keys]
+
+
+def restore(dbname, deltas):
+    """Put back deltas that could not be flushed so they are not lost."""
+    with _lock:
+        for name, labels, value in deltas:
+            _add(dbname, name, labels, value)
+
+
+def _base_name(name):
+    for suffix in ("_bucket", "_sum", "_count"):
+        if name.endswith(suffix) and name[: -len(suffix)] in METRICS:
+            return name[: -len(suffix)]
+    return name
+
+
+def _sort_key(row):
+    name, labels, _value = row
+    le = float("inf")
+    other_labels = []
+    for label in labels.split(",") if labels else []:
+        if label.startswith("le="):
+            le = float(label[4:-1])
+        else:
+            other_labels.append(label)
+    return _base_name(name), name, other_labels, le
+
+
+def render(rows):
+    """Render ``(name, labels, value)`` rows in the Prometheus text exposition format."""
+    lines = []
+    described = set()
+    for name, labels, value in sorted(rows, key=_sort_key):
+        base_name = _base_name(name)
+        if base_name not in described and base_name in METRICS:
+            metric_type, metric_help = METRICS[base_name]
+            lines.append("# HELP %s %s" % (base_name, metric_help))
+            lines.append("# TYPE %s %s" % (base_name, metric_type))
+            described.add(base_name)
+        series = "%s{%s}" % (name, labels) if labels else name
+        lines.append("%s %s" % (series, repr(float(value))))
+    return "\n".join(lines) + "\n"
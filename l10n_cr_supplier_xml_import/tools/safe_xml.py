@@ -0,0 +1,117 @@
+"""Hardened lxml parsing of supplier documents, with one reusable parser per thread.
+
+Parsers never resolve entities, load DTDs or touch the network. Documents are fed in chunks so that
+the depth and ``LineaDetalle`` limits stop the parse as soon as they are exceeded, and documents
+larger than the byte limit are rejected before any tree is built. Hacienda documents have no
+``DOCTYPE``, so documents declaring one are rejected as well.
+"""
+import threading
+
+from lxml import etree
+
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_MAX_DEPTH = 64
+DEFAULT_MAX_LINES = 1000
+LINE_TAG = "LineaDetalle"
+CHUNK_SIZE = 64 * 1024
+SNIFF_CHUNK_SIZE = 4096
+PARSER_OPTIONS = {
+    "resolve_entities": False,
+    "no_network": True,
+    "load_dtd": False,
+    "dtd_validation": False,
+    "huge_tree": False,
+}
+
+_local = threading.local()
+
+
+class XMLLimitError(Exception):
+    """The document exceeds one of the parse limits; ``limit`` is ``bytes``, ``depth``, ``lines`` or ``doctype``."""
+
+    def __init__(self, limit, message):
+        super().__init__(message)
+        self.limit = limit
+
+
+def _parser(events):
+    parsers = getattr(_local, "parsers", None)
+    if parsers is None:
+        parsers = _local.parsers = {}
+    parser = parsers.get(events)
+    if parser is None:
+        parser = parsers[events] = etree.XMLPullParser(events=events, **PARSER_OPTIONS)
+    return parser
+
+
+def _reset(parser):
+    """Drop the partial tree and pending events of an interrupted parse so the parser can be reused."""
+    try:
+        parser.close()
+    except etree.XMLSyntaxError:
+        pass
+    for _event in parser.read_events():
+        pass
+
+
+def _chunks(payload, size):
+    for offset in range(0, len(payload), size):
+        yield payload[offset:offset + size]
+
+
+def _check_doctype(element):
+    if element.getroottree().docinfo.doctype:
+        raise XMLLimitError("doctype", "El XML declara un DOCTYPE, que no se admite en comprobantes electrónicos.")
+
+
+def parse(payload, max_bytes=DEFAULT_MAX_BYTES, max_depth=DEFAULT_MAX_DEPTH, max_lines=DEFAULT_MAX_LINES):
+    """Parse ``payload`` (bytes) and return its root element.
+
+    Raises ``XMLLimitError`` when a limit (``0`` or ``None`` disables it) is exceeded and
+    ``etree.XMLSyntaxError`` for malformed documents.
+    """
+    if isinstance(payload, str):
+        payload = payload.encode()
+    if max_bytes and len(payload) > max_bytes:
+        raise XMLLimitError("bytes", "El XML supera el tamaño máximo permitido de %s bytes." % max_bytes)
+    parser = _parser(("start", "end"))
+    depth = lines = 0
+    try:
+        for chunk in _chunks(payload, CHUNK_SIZE):
+            parser.feed(chunk)
+            for event, element in parser.read_events():
+                if event == "end":
+                    depth -= 1
+                    continue
+                depth += 1
+                if depth == 1:
+                    _check_doctype(element)
+                if max_depth and depth > max_depth:
+                    raise XMLLimitError("depth", "El XML supera la profundidad máxima de %s niveles." % max_depth)
+                if element.tag.rpartition("}")[2] == LINE_TAG:
+                    lines += 1
+                    if max_lines and lines > max_lines:
+                        raise XMLLimitError(
+                            "lines", "El XML supera el máximo de %s líneas de detalle." % max_lines
+                        )
+        return parser.close()
+    except BaseException:
+        _reset(parser)
+        raise
+
+
+def root_name(payload):
+    """Return the local name of the root element, reading only up to its start tag, or ``None``."""
+    if isinstance(payload, str):
+        payload = payload.encode()
+    parser = _parser(("start",))
+    try:
+        for chunk in _chunks(payload, SNIFF_CHUNK_SIZE):
+            parser.feed(chunk)
+            for _event, element in parser.read_events():
+                return etree.QName(element).localname
+    except etree.XMLSyntaxError:
+        return None
+    finally:
+        _reset(parser)
+    return None
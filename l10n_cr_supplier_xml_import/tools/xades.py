@@ -0,0 +1,377 @@
+"""Offline verification of the XAdES-EPES signature embedded in Hacienda documents.
+
+Certificates are parsed once and cached by SHA-256 fingerprint, and the chain
+built for a signing certificate against a given trust store is cached as well,
+so the thousands of documents signed by the same supplier certificate only pay
+for the digest and signature checks.
+"""
+import base64
+import copy
+import hashlib
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from cryptography import x509
+from cryptography.exceptions import InvalidSignature
+from cryptography.x509.oid import NameOID
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ec, padding, rsa
+from cryptography.hazmat.primitives.asymmetric.utils import encode_dss_signature
+from cryptography.hazmat.primitives.serialization import Encoding
+from lxml import etree
+
+DS_NS = "http://www.w3.org/2000/09/xmldsig#"
+XADES_NS = "http://uri.etsi.org/01903/v1.3.2#"
+ENVELOPED_TRANSFORM = "http://www.w3.org/2000/09/xmldsig#enveloped-signature"
+
+C14N_METHODS = {
+    "http://www.w3.org/TR/2001/REC-xml-c14n-20010315": (False, False),
+    "http://www.w3.org/TR/2001/REC-xml-c14n-20010315#WithComments": (False, True),
+    "http://www.w3.org/2001/10/xml-exc-c14n#": (True, False),
+    "http://www.w3.org/2001/10/xml-exc-c14n#WithComments": (True, True),
+}
+DIGEST_METHODS = {
+    "http://www.w3.org/2000/09/xmldsig#sha1": "sha1",
+    "http://www.w3.org/2001/04/xmlenc#sha256": "sha256",
+    "http://www.w3.org/2001/04/xmldsig-more#sha384": "sha384",
+    "http://www.w3.org/2001/04/xmlenc#sha512": "sha512",
+}
+SIGNATURE_METHODS = {
+    "http://www.w3.org/2000/09/xmldsig#rsa-sha1": ("rsa", hashes.SHA1),
+    "http://www.w3.org/2001/04/xmldsig-more#rsa-sha256": ("rsa", hashes.SHA256),
+    "http://www.w3.org/2001/04/xmldsig-more#rsa-sha384": ("rsa", hashes.SHA384),
+    "http://www.w3.org/2001/04/xmldsig-more#rsa-sha512": ("rsa", hashes.SHA512),
+    "http://www.w3.org/2001/04/xmldsig-more#ecdsa-sha256": ("ecdsa", hashes.SHA256),
+    "http://www.w3.org/2001/04/xmldsig-more#ecdsa-sha384": ("ecdsa", hashes.SHA384),
+    "http://www.w3.org/2001/04/xmldsig-more#ecdsa-sha512": ("ecdsa", hashes.SHA512),
+}
+TRUST_STORE_EXTENSIONS = (".pem", ".crt", ".cer", ".der")
+MAX_CHAIN_LENGTH = 10
+CACHE_SIZE = 2048
+
+_logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_certificates = OrderedDict()
+_chains = OrderedDict()
+_trust_stores = {}
+
+
+class SignatureError(Exception):
+    """The signature is malformed or does not match the signed content."""
+
+
+class UntrustedSignatureError(Exception):
+    """The signature is correct but its certificate cannot be trusted."""
+
+
+def _cache_get(cache, key):
+    with _lock:
+        if key not in cache:
+            return None
+        cache.move_to_end(key)
+        return cache[key]
+
+
+def _cache_set(cache, key, value):
+    with _lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > CACHE_SIZE:
+            cache.popitem(last=False)
+
+
+def fingerprint(der_bytes):
+    return hashlib.sha256(der_bytes).hexdigest()
+
+
+def load_certificate(data):
+    """Return ``(fingerprint, certificate)`` for PEM or DER bytes, using the fingerprint cache."""
+    if b"-----BEGIN CERTIFICATE-----" in data:
+        der_bytes = x509.load_pem_x509_certificate(data).public_bytes(Encoding.DER)
+    else:
+        der_bytes = data
+    cert_fingerprint = fingerprint(der_bytes)
+    certificate = _cache_get(_certificates, cert_fingerprint)
+    if certificate is None:
+        certificate = x509.load_der_x509_certificate(der_bytes)
+        _cache_set(_certificates, cert_fingerprint, certificate)
+    return cert_fingerprint, certificate
+
+
+def load_trust_store(directory):
+    """Load the CA certificates of ``directory``; reloaded only when its files change."""
+    if not directory or not os.path.isdir(directory):
+        return {}
+    paths = sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.lower().endswith(TRUST_STORE_EXTENSIONS)
+    )
+    snapshot = tuple((path, os.path.getmtime(path)) for path in paths)
+    cached = _trust_stores.get(directory)
+    if cached and cached[0] == snapshot:
+        return cached[1]
+    anchors = {}
+    for path in paths:
+        with open(path, "rb") as cert_file:
+            content = cert_file.read()
+        blocks = [
+            b"-----BEGIN CERTIFICATE-----" + block
+            for block in content.split(b"-----BEGIN CERTIFICATE-----")[1:]
+        ] or [content]
+        for block in blocks:
+            try:
+                cert_fingerprint, certificate = load_certificate(block)
+            except ValueError as error:
+                _logger.warning("Ignoring unreadable certificate in trust store %s: %s", path, error)
+                continue
+            anchors[cert_fingerprint] = certificate
+    with _lock:
+        _trust_stores[directory] = (snapshot, anchors)
+    return anchors
+
+
+def _c14n(node, algorithm):
+    exclusive, with_comments = C14N_METHODS.get(algorithm, (False, False))
+    return etree.tostring(node, method="c14n", exclusive=exclusive, with_comments=with_comments)
+
+
+def _find_by_id(root, reference_id):
+    for attribute in ("Id", "ID", "id"):
+        found = root.xpath("//*[@%s=$value]" % attribute, value=reference_id)
+        if found:
+            return found[0]
+    raise SignatureError("No se encontró el elemento referenciado #%s." % reference_id)
+
+
+def _reference_digest(root, signature, reference):
+    uri = reference.get("URI")
+    transforms = [node.get("Algorithm") for node in reference.findall("{%s}Transforms/{%s}Transform" % (DS_NS, DS_NS))]
+    if uri in (None, ""):
+        target = copy.deepcopy(root)
+        if ENVELOPED_TRANSFORM in transforms:
+            for node in target.iter("{%s}Signature" % DS_NS):
+                if node.get("Id") == signature.get("Id"):
+                    node.getparent().remove(node)
+                    break
+    elif uri.startswith("#"):
+        target = _find_by_id(root, uri[1:])
+    else:
+        raise SignatureError("Referencia externa no soportada: %s." % uri)
+
+    c14n_algorithm = next((algorithm for algorithm in transforms if algorithm in C14N_METHODS), None)
+    content = _c14n(target, c14n_algorithm)
+
+    digest_method = reference.find("{%s}DigestMethod" % DS_NS)
+    hash_name = DIGEST_METHODS.get(digest_method.get("Algorithm") if digest_method is not None else None)
+    if not hash_name:
+        raise SignatureError("Algoritmo de resumen no soportado.")
+    expected = "".join((reference.findtext("{%s}DigestValue" % DS_NS) or "").split())
+    actual = base64.b64encode(hashlib.new(hash_name, content).digest()).decode()
+    if actual != expected:
+        raise SignatureError("El resumen de la referencia '%s' no coincide." % (uri or ""))
+
+
+def _verify_signature_value(certificate, method, signature_value, signed_content):
+    key_type, hash_class = method
+    public_key = certificate.public_key()
+    try:
+        if key_type == "rsa" and isinstance(public_key, rsa.RSAPublicKey):
+            public_key.verify(signature_value, signed_content, padding.PKCS1v15(), hash_class())
+        elif key_type == "ecdsa" and isinstance(public_key, ec.EllipticCurvePublicKey):
+            half = len(signature_value) // 2
+            der_signature = encode_dss_signature(
+                int.from_bytes(signature_value[:half], "big"), int.from_bytes(signature_value[half:], "big")
+            )
+            public_key.verify(der_signature, signed_content, ec.ECDSA(hash_class()))
+        else:
+            raise SignatureError("El tipo de llave del certificado no corresponde al algoritmo de firma.")
+    except InvalidSignature as error:
+        raise SignatureError("El valor de la firma no es válido.") from error
+
+
+def _extension_value(certificate, extension_class):
+    try:
+        return certificate.extensions.get_extension_for_class(extension_class).value
+    except x509.ExtensionNotFound:
+        return None
+
+
+def _can_issue(issuer, issued_below):
+    """Whether ``issuer`` is a CA allowed to sign certificates with ``issued_below`` CAs under it."""
+    constraints = _extension_value(issuer, x509.BasicConstraints)
+    key_usage = _extension_value(issuer, x509.KeyUsage)
+    if constraints is None or not constraints.ca or key_usage is None or not key_usage.key_cert_sign:
+        return False
+    return constraints.path_length is None or constraints.path_length >= issued_below
+
+
+def _is_issued_by(certificate, issuer):
+    if certificate.issuer != issuer.subject:
+        return False
+    try:
+        certificate.verify_directly_issued_by(issuer)
+    except (ValueError, TypeError, InvalidSignature):
+        return False
+    return True
+
+
+def _build_chain(leaf_fingerprint, leaf, intermediates, anchors):
+    """Return the fingerprints from the leaf up to a trust anchor, or raise ``UntrustedSignatureError``.
+
+    Every issuer in the chain must be a CA (``BasicConstraints`` CA and ``keyCertSign`` usage) within
+    its path length constraint.
+    """
+    chain = [leaf_fingerprint]
+    current = leaf
+    for _step in range(MAX_CHAIN_LENGTH):
+        if chain[-1] in anchors:
+            return tuple(chain)
+        issuer = next(
+            (
+                (issuer_fingerprint, issuer)
+                for issuer_fingerprint, issuer in anchors.items()
+                if _can_issue(issuer, len(chain) - 1) and _is_issued_by(current, issuer)
+            ),
+            None,
+        ) or next(
+            (
+                (issuer_fingerprint, issuer)
+                for issuer_fingerprint, issuer in intermediates.items()
+                if issuer_fingerprint not in chain
+                and _can_issue(issuer, len(chain) - 1)
+                and _is_issued_by(current, issuer)
+            ),
+            None,
+        )
+        if not issuer:
+            break
+        chain.append(issuer[0])
+        current = issuer[1]
+        if issuer[0] in anchors:
+            return tuple(chain)
+    raise UntrustedSignatureError("El certificado del firmante no pertenece a una CA de confianza.")
+
+
+def _certificate_validity(certificate):
+    not_before = getattr(certificate, "not_valid_before_utc", None)
+    not_after = getattr(certificate, "not_valid_after_utc", None)
+    if not_before is None:
+        not_before = certificate.not_valid_before.replace(tzinfo=timezone.utc)
+        not_after = certificate.not_valid_after.replace(tzinfo=timezone.utc)
+    return not_before, not_after
+
+
+def _signing_time(signature):
+    value = signature.findtext(".//{%s}SigningTime" % XADES_NS)
+    if value:
+        try:
+            parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+        except ValueError:
+            parsed = None
+        if parsed:
+            return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    return datetime.now(timezone.utc)
+
+
+def signer_identification(certificate):
+    """Digits of the ``serialNumber`` subject attribute (e.g. ``CPJ-3-101-123456``) without leading zeros."""
+    attributes = certificate.subject.get_attributes_for_oid(NameOID.SERIAL_NUMBER)
+    return re.sub(r"\D", "", attributes[0].value).lstrip("0") if attributes else ""
+
+
+def _is_enveloped_document_reference(reference):
+    transforms = [node.get("Algorithm") for node in reference.findall("{%s}Transforms/{%s}Transform" % (DS_NS, DS_NS))]
+    return reference.get("URI") == "" and ENVELOPED_TRANSFORM in transforms
+
+
+def verify(root, anchors, identification=None):
+    """Verify the enveloped signature of ``root`` against the ``anchors`` trust store.
+
+    The signature must include an enveloped reference (``URI=""``) over the whole document and, when
+    ``identification`` (the issuer's ``Identificacion/Numero``) is given, the signing certificate must
+    belong to that taxpayer.
+
+    Returns a dict with ``state`` (``unsigned``, ``valid``, ``untrusted`` or
+    ``invalid``), a human readable ``message`` and the signer ``subject``.
+    """
+    signature = root.find("{%s}Signature" % DS_NS)
+    if signature is None:
+        signature = next(iter(root.iter("{%s}Signature" % DS_NS)), None)
+    if signature is None:
+        return {"state": "unsigned", "message": "El documento no tiene firma digital.", "subject": False}
+
+    subject = False
+    try:
+        signed_info = signature.find("{%s}SignedInfo" % DS_NS)
+        if signed_info is None:
+            raise SignatureError("La firma no contiene SignedInfo.")
+        references = signed_info.findall("{%s}Reference" % DS_NS)
+        if not any(_is_enveloped_document_reference(reference) for reference in references):
+            raise SignatureError("La firma no cubre el documento completo (falta la referencia URI=\"\").")
+        for reference in references:
+            _reference_digest(root, signature, reference)
+
+        certificates = OrderedDict()
+        for cert_node in signature.iterfind(".//{%s}X509Certificate" % DS_NS):
+            cert_fingerprint, certificate = load_certificate(base64.b64decode("".join((cert_node.text or "").split())))
+            certificates[cert_fingerprint] = certificate
+        if not certificates:
+            raise SignatureError("La firma no incluye el certificado del firmante.")
+
+        method_node = signed_info.find("{%s}SignatureMethod" % DS_NS)
+        method = SIGNATURE_METHODS.get(method_node.get("Algorithm") if method_node is not None else None)
+        if not method:
+            raise SignatureError("Algoritmo de firma no soportado.")
+        c14n_node = signed_info.find("{%s}CanonicalizationMethod" % DS_NS)
+        signed_content = _c14n(signed_info, c14n_node.get("Algorithm") if c14n_node is not None else None)
+        signature_value = base64.b64decode("".join((signature.findtext("{%s}SignatureValue" % DS_NS) or "").split()))
+
+        leaf_fingerprint, leaf = None, None
+        for cert_fingerprint, certificate in certificates.items():
+            try:
+                _verify_signature_value(certificate, method, signature_value, signed_content)
+            except SignatureError:
+                continue
+            leaf_fingerprint, leaf = cert_fingerprint, certificate
+            break
+        if leaf is None:
+            raise SignatureError("El valor de la firma no corresponde a ningún certificado incluido.")
+        subject = leaf.subject.rfc4514_string()
+        expected_identification = re.sub(r"\D", "", identification or "").lstrip("0")
+        if identification is not None and signer_identification(leaf) != expected_identification:
+            raise SignatureError(
+                "El certificado firmante (%s) no corresponde a la identificación del emisor %s."
+                % (subject, identification or "")
+            )
+
+        intermediates = {key: value for key, value in certificates.items() if key != leaf_fingerprint}
+        chain_key = (leaf_fingerprint, tuple(sorted(intermediates)), tuple(sorted(anchors)))
+        chain = _cache_get(_chains, chain_key)
+        if chain is None:
+            try:
+                chain = _build_chain(leaf_fingerprint, leaf, intermediates, anchors)
+            except UntrustedSignatureError as error:
+                chain = str(error)
+            _cache_set(_chains, chain_key, chain)
+        if isinstance(chain, str):
+            raise UntrustedSignatureError(chain)
+
+        signing_time = _signing_time(signature)
+        for cert_fingerprint in chain:
+            certificate = anchors.get(cert_fingerprint) or certificates.get(cert_fingerprint)
+            not_before, not_after = _certificate_validity(certificate)
+            if not not_before <= signing_time <= not_after:
+                raise UntrustedSignatureError(
+                    "El certificado %s no estaba vigente en la fecha de firma." % certificate.subject.rfc4514_string()
+                )
+    except UntrustedSignatureError as error:
+        return {"state": "untrusted", "message": str(error), "subject": subject}
+    except (SignatureError, ValueError, TypeError, etree.Error) as error:
+        return {"state": "invalid", "message": str(error), "subject": subject}
+    return {"state": "valid", "message": "Firma válida.", "subject": subject}
@@ -0,0 +1,80 @@
+"""Compiled Hacienda XSD schemas, cached per process, document type and version.
+
+The official schemas are looked up by file name in ``data/xsd`` (or in a
+configured directory), e.g. ``FacturaElectronica_V4.4.xsd``.  Imported schemas
+such as ``xmldsig-core-schema.xsd`` are resolved from the same directory so
+validation never touches the network.
+"""
+import os
+import re
+import threading
+
+from lxml import etree
+
+XSD_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "xsd")
+VERSION_PATTERN = re.compile(r"/v(\d+\.\d+)/")
+MAX_REPORTED_ERRORS = 5
+
+_lock = threading.Lock()
+_schemas = {}
+
+
+class _LocalSchemaResolver(etree.Resolver):
+    def __init__(self, directory):
+        super().__init__()
+        self.directory = directory
+
+    def resolve(self, url, pubid, context):
+        path = os.path.join(self.directory, os.path.basename(url or ""))
+        if os.path.isfile(path):
+            return self.resolve_filename(path, context)
+        return None
+
+
+def document_version(root):
+    """Return the schema version (``"4.3"``, ``"4.4"``) declared by the root namespace."""
+    match = VERSION_PATTERN.search(etree.QName(root).namespace or "")
+    return match.group(1) if match else False
+
+
+def schema_path(local_name, version, directory=None):
+    return os.path.join(directory or XSD_DIR, "%s_V%s.xsd" % (local_name, version))
+
+
+def get_schema(local_name, version, directory=None):
+    """Return ``(schema, lock)`` for the document type and version, or ``None`` if no XSD is available."""
+    path = schema_path(local_name, version, directory=directory)
+    cached = _schemas.get(path)
+    if cached:
+        return cached
+    if not os.path.isfile(path):
+        return None
+    with _lock:
+        cached = _schemas.get(path)
+        if not cached:
+            parser = etree.XMLParser(no_network=True, resolve_entities=False)
+            parser.resolvers.add(_LocalSchemaResolver(os.path.dirname(path)))
+            schema = etree.XMLSchema(etree.parse(path, parser))
+            cached = _schemas[path] = (schema, threading.Lock())
+    return cached
+
+
+def validate(root, directory=None):
+    """Validate an already parsed document.
+
+    Returns ``(version, errors)`` where ``errors`` is a list of messages; raises
+    ``LookupError`` when no schema is available for the document version.
+    """
+    local_name = etree.QName(root).localname
+    version = document_version(root)
+    cached = get_schema(local_name, version, directory=directory) if version else None
+    if not cached:
+        raise LookupError(schema_path(local_name, version or "?", directory=directory))
+    schema, schema_lock = cached
+    with schema_lock:
+        if schema.validate(root):
+            return version, []
+        errors = [
+            "línea %s: %s" % (entry.line, entry.message) for entry in list(schema.error_log)[:MAX_REPORTED_ERRORS]
+        ]
+    return version, errors